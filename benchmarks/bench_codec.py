@@ -0,0 +1,82 @@
+"""
+Encode/decode throughput of the JSON codecs available to the RPC client.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codec
+"""
+import time
+
+from plugin.core.rpc import JsonCodec, OrjsonCodec, UjsonCodec, format_request, orjson, ujson
+
+REPEAT = 20
+
+
+def completion_response(count: int) -> dict:
+    items = []
+    for i in range(count):
+        items.append({
+            "label": "completion_item_{}".format(i),
+            "kind": i % 25 + 1,
+            "detail": "def completion_item_{}(self, value: int) -> str".format(i),
+            "sortText": "{:08d}".format(i),
+            "filterText": "completion_item_{}".format(i),
+            "insertTextFormat": 2,
+            "textEdit": {
+                "range": {"start": {"line": 120, "character": 8}, "end": {"line": 120, "character": 12}},
+                "newText": "completion_item_{}(${{1:value}})".format(i)
+            }
+        })
+    return {"jsonrpc": "2.0", "id": 42, "result": {"isIncomplete": False, "items": items}}
+
+
+def diagnostics_notification(count: int) -> dict:
+    diagnostics = []
+    for i in range(count):
+        diagnostics.append({
+            "range": {"start": {"line": i, "character": 4}, "end": {"line": i, "character": 20}},
+            "severity": i % 4 + 1,
+            "code": "E{}".format(i % 999),
+            "source": "linter",
+            "message": "Line {} is not formatted according to the project's style guide".format(i)
+        })
+    return {
+        "jsonrpc": "2.0",
+        "method": "textDocument/publishDiagnostics",
+        "params": {"uri": "file:///project/src/module.py", "diagnostics": diagnostics}
+    }
+
+
+def measure(function, argument) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function(argument)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    codecs = [JsonCodec()]
+    if orjson:
+        codecs.append(OrjsonCodec())
+    if ujson:
+        codecs.append(UjsonCodec())
+    payloads = [
+        ("completion x1000", completion_response(1000)),
+        ("completion x10000", completion_response(10000)),
+        ("diagnostics x500", diagnostics_notification(500)),
+        ("diagnostics x5000", diagnostics_notification(5000)),
+    ]
+    print("{:<20} {:<8} {:>10} {:>12} {:>12}".format("payload", "codec", "size KB", "encode MB/s", "decode MB/s"))
+    for name, payload in payloads:
+        for codec in codecs:
+            frame = format_request(payload, codec)
+            content = codec.encode(payload)
+            megabytes = len(content) / (1024 * 1024)
+            encode_time = measure(lambda p: format_request(p, codec), payload)
+            decode_time = measure(codec.decode, bytearray(content))
+            print("{:<20} {:<8} {:>10.1f} {:>12.1f} {:>12.1f}".format(
+                name, codec.name, len(frame) / 1024, megabytes / encode_time, megabytes / decode_time))
+
+
+if __name__ == '__main__':
+    main()
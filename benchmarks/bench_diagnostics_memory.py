@@ -0,0 +1,95 @@
+"""
+Memory held by the diagnostics of a large project, as parsed from
+publishDiagnostics notifications.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_diagnostics_memory
+"""
+import json
+import time
+import tracemalloc
+
+from plugin.core.protocol import Diagnostic, DiagnosticSeverity
+
+DIAGNOSTIC_COUNT = 100000
+
+
+class LegacyPoint(object):
+    def __init__(self, row, col):
+        self.row = int(row)
+        self.col = int(col)
+
+    @classmethod
+    def from_lsp(cls, point):
+        return LegacyPoint(point['line'], point['character'])
+
+
+class LegacyRange(object):
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_lsp(cls, range):
+        return LegacyRange(LegacyPoint.from_lsp(range['start']), LegacyPoint.from_lsp(range['end']))
+
+
+class LegacyDiagnostic(object):
+    # kept the whole LSP diagnostic around for to_lsp()
+    def __init__(self, message, range, severity, source, lsp_diagnostic):
+        self.message = message
+        self.range = range
+        self.severity = severity
+        self.source = source
+        self._lsp_diagnostic = lsp_diagnostic
+
+    @classmethod
+    def from_lsp(cls, lsp_diagnostic):
+        return LegacyDiagnostic(
+            lsp_diagnostic['message'],
+            LegacyRange.from_lsp(lsp_diagnostic['range']),
+            lsp_diagnostic.get('severity', DiagnosticSeverity.Error),
+            lsp_diagnostic.get('source'),
+            lsp_diagnostic
+        )
+
+
+def make_payload(count: int) -> bytes:
+    # what the server sends, decoded for each measurement like the client does
+    diagnostics = []
+    for i in range(count):
+        diagnostic = {
+            'message': 'line too long ({} > 79 characters)'.format(80 + i % 40),
+            'range': {'start': {'line': i, 'character': 79}, 'end': {'line': i, 'character': 80 + i % 40}},
+            'severity': DiagnosticSeverity.Warning,
+            'source': 'pycodestyle',
+        }
+        if i % 2:
+            diagnostic['code'] = 'E501'
+        diagnostics.append(diagnostic)
+    return json.dumps(diagnostics).encode('UTF-8')
+
+
+def measure(from_lsp, payload: bytes) -> 'tuple':
+    tracemalloc.start()
+    start = time.perf_counter()
+    diagnostics = [from_lsp(diagnostic) for diagnostic in json.loads(payload.decode('UTF-8'))]
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(diagnostics) == DIAGNOSTIC_COUNT
+    return size, peak, elapsed
+
+
+def main():
+    payload = make_payload(DIAGNOSTIC_COUNT)
+    print("{} diagnostics".format(DIAGNOSTIC_COUNT))
+    print("{:<10} {:>12} {:>12} {:>10}".format("model", "held MB", "peak MB", "load ms"))
+    for name, from_lsp in (("legacy", LegacyDiagnostic.from_lsp), ("slotted", Diagnostic.from_lsp)):
+        size, peak, elapsed = measure(from_lsp, payload)
+        print("{:<10} {:>12.1f} {:>12.1f} {:>10.0f}".format(name, size / 2 ** 20, peak / 2 ** 20, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
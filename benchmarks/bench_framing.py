@@ -0,0 +1,116 @@
+"""
+Microbenchmark of the LSP frame decoder used by the transports.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_framing
+"""
+import re
+import time
+
+from plugin.core.transports import FrameDecoder
+
+CONTENT_LENGTH_RE = re.compile(br'Content-Length:\s*(\d+)', re.IGNORECASE)
+PIPE_READ_SIZE = 64 * 1024
+SIZES = [1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+LEGACY_MAX_SIZE = 1024 * 1024
+
+
+def make_stream(size: int, count: int) -> bytes:
+    content = b'{"jsonrpc": "2.0", "id": 1, "result": "' + b'x' * max(0, size - 42) + b'"}'
+    message = b"Content-Length: " + str(len(content)).encode() + b"\r\n\r\n" + content
+    return message * count
+
+
+class PipeReader(object):
+    """Hands out at most max_read bytes per read, like a pipe or socket would"""
+    def __init__(self, data: bytes, max_read: int) -> None:
+        self.data = memoryview(data)
+        self.pos = 0
+        self.max_read = max_read
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self.max_read, len(self.data) - self.pos)
+        buffer[:count] = self.data[self.pos:self.pos + count]
+        self.pos += count
+        return count
+
+    def recv(self, size: int) -> bytes:
+        count = min(size, self.max_read, len(self.data) - self.pos)
+        data = self.data[self.pos:self.pos + count].tobytes()
+        self.pos += count
+        return data
+
+
+def decode(stream: bytes) -> int:
+    reader = PipeReader(stream, PIPE_READ_SIZE)
+    decoder = FrameDecoder()
+    received = 0
+    while decoder.read_from(reader.readinto):
+        for content in decoder.messages():
+            received += 1
+    return received
+
+
+def decode_legacy(stream: bytes) -> int:
+    """The previous TCPTransport.read_socket loop: 4 KiB reads, concatenating and slicing"""
+    reader = PipeReader(stream, PIPE_READ_SIZE)
+    remaining_data = b""
+    in_content = False
+    content_length = 0
+    received = 0
+    while True:
+        received_data = reader.recv(4096)
+        if not received_data:
+            break
+        data = remaining_data + received_data
+        remaining_data = b""
+        is_incomplete = False
+        while len(data) > 0 and not is_incomplete:
+            if not in_content:
+                headers, _sep, rest = data.partition(b"\r\n\r\n")
+                if len(_sep) < 1:
+                    is_incomplete = True
+                    remaining_data = data
+                else:
+                    for header in headers.split(b"\r\n"):
+                        match = CONTENT_LENGTH_RE.match(header)
+                        if match:
+                            content_length = int(match.group(1))
+                            in_content = True
+                    data = rest
+            if in_content:
+                if len(data) >= content_length:
+                    received += 1
+                    data = data[content_length:]
+                    in_content = False
+                else:
+                    is_incomplete = True
+                    remaining_data = data
+    return received
+
+
+def measure(function, stream: bytes, count: int) -> float:
+    start = time.perf_counter()
+    received = function(stream)
+    elapsed = time.perf_counter() - start
+    assert received == count, (received, count)
+    return elapsed
+
+
+def main():
+    print("{:>10} {:>6} {:>12} {:>12}".format("size", "count", "decoder MB/s", "legacy MB/s"))
+    for size in SIZES:
+        count = max(1, (64 * 1024 * 1024) // size)
+        stream = make_stream(size, count)
+        megabytes = len(stream) / (1024 * 1024)
+        decoder_rate = megabytes / measure(decode, stream, count)
+        if size <= LEGACY_MAX_SIZE:
+            legacy_rate = "{:12.1f}".format(megabytes / measure(decode_legacy, stream, count))
+        else:
+            legacy_rate = "{:>12}".format("(skipped)")
+        print("{:>10} {:>6} {:12.1f} {}".format(size, count, decoder_rate, legacy_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Time to rank completion lists of 1k, 10k and 50k items (think TypeScript
+globals) while a word is typed, keeping the best 200.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fuzzy
+"""
+import random
+import time
+
+from plugin.core.completions import CompletionCache
+
+SIZES = (1000, 10000, 50000)
+LIMIT = 200
+TYPED = "getElem"
+PARTS = ("get", "set", "element", "by", "id", "name", "html", "node", "list", "value", "time", "out",
+         "request", "animation", "frame", "event", "listener", "add", "remove", "child", "document")
+
+
+def make_items(count: int) -> 'list':
+    generator = random.Random(count)
+    items = []
+    for i in range(count):
+        words = generator.sample(PARTS, generator.randint(1, 4))
+        label = words[0] + "".join(word.capitalize() for word in words[1:]) + str(i)
+        items.append({"label": label, "sortText": "{:06}".format(i)})
+    return items
+
+
+def main():
+    prefixes = list(TYPED[:length] for length in range(1, len(TYPED) + 1))
+    print("{:>8} {:>10} {}".format("items", "build ms", " ".join("{:>8}".format(repr(p)) for p in prefixes)))
+    for size in SIZES:
+        items = make_items(size)
+        start = time.perf_counter()
+        cache = CompletionCache(0, items, lambda item: (item["label"], item["label"]))
+        build_time = time.perf_counter() - start
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            cache.filter(prefix, LIMIT)
+            timings.append(time.perf_counter() - start)
+        print("{:>8} {:>10.1f} {}".format(size, build_time * 1000,
+                                          " ".join("{:>8.1f}".format(timing * 1000) for timing in timings)))
+    print("ms per keystroke, each narrowing down the matches of the previous one")
+
+
+if __name__ == '__main__':
+    main()
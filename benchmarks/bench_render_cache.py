@@ -0,0 +1,60 @@
+"""
+Cost of rendering hover contents, hovering back and forth over the same
+few symbols, with and without the rendered HTML cache.
+
+Hovers are rendered by mdpopups with python-markdown and pygments, which
+this benchmark uses directly. Both need to be installed (pip install
+markdown pygments). Run from the repository root:
+
+    python -m benchmarks.bench_render_cache
+"""
+import time
+
+import markdown
+
+from plugin.core.popups import render_cached, rendered_html
+
+SYMBOL_COUNT = 20
+HOVER_COUNT = 1000
+
+
+def make_contents(count: int) -> 'list':
+    contents = []
+    for i in range(count):
+        contents.append("\n".join((
+            "```python",
+            "def handle_request_{0}(self, request: Request, timeout: float = {0}.0) -> Optional[Response]".format(i),
+            "```",
+            "Handles a request for the symbol number {}, with **markdown** and `code`.".format(i),
+            "",
+            "* *request*: what the client asked for",
+            "* *timeout*: seconds to wait for the answer",
+        )))
+    return contents
+
+
+def md2html(content: str) -> str:
+    return markdown.markdown(content, extensions=["fenced_code", "codehilite"])
+
+
+def measure(render, contents) -> float:
+    start = time.perf_counter()
+    for i in range(HOVER_COUNT):
+        render(contents[i % len(contents)])
+    return time.perf_counter() - start
+
+
+def main():
+    contents = make_contents(SYMBOL_COUNT)
+    uncached_time = measure(md2html, contents)
+    rendered_html.clear()
+    cached_time = measure(lambda content: render_cached(md2html, content, "hover"), contents)
+
+    print("{} hovers over {} symbols".format(HOVER_COUNT, SYMBOL_COUNT))
+    print("{:<10} {:>14}".format("render", "us per hover"))
+    print("{:<10} {:>14.1f}".format("md2html", uncached_time / HOVER_COUNT * 1e6))
+    print("{:<10} {:>14.1f}".format("cached", cached_time / HOVER_COUNT * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Cost of the is_applicable checks Sublime runs for every view it creates,
+with 50 configured servers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_syntax
+"""
+import re
+import time
+
+from plugin.core.syntaxes import SyntaxMatcher
+from plugin.core.types import ClientConfig
+
+CONFIG_COUNT = 50
+VIEW_COUNT = 2000
+# CompletionHandler, HoverHandler, DocumentHighlightListener, SignatureHelpListener,
+# DiagnosticsCursorListener and DocumentSyncListener
+LISTENER_COUNT = 6
+
+
+def make_configs(count: int) -> 'list':
+    configs = []
+    for i in range(count):
+        name = "language{}".format(i)
+        languages = {name: {"scopes": ["source." + name], "syntaxes": ["Packages/{0}/{0}.sublime-syntax".format(name)]}}
+        configs.append(ClientConfig(name, ["server"], None, languages))
+    return configs
+
+
+def make_syntaxes(count: int) -> 'list':
+    # a mix of supported syntaxes and plain text, as in a typical session
+    syntaxes = []
+    for i in range(count):
+        if i % 3 == 0:
+            syntaxes.append("Packages/Text/Plain text.tmLanguage")
+        else:
+            name = "language{}".format(i % CONFIG_COUNT)
+            syntaxes.append("Packages/{0}/{0}.sublime-syntax".format(name))
+    return syntaxes
+
+
+def legacy_is_supported_syntax(configs, syntax: str) -> bool:
+    for config in configs:
+        if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in config.syntaxes), syntax, re.IGNORECASE):
+            return True
+    return False
+
+
+def measure(check, syntaxes) -> float:
+    start = time.perf_counter()
+    for syntax in syntaxes:
+        for _ in range(LISTENER_COUNT):
+            check(syntax)
+    return time.perf_counter() - start
+
+
+def main():
+    configs = make_configs(CONFIG_COUNT)
+    syntaxes = make_syntaxes(VIEW_COUNT)
+
+    legacy_time = measure(lambda syntax: legacy_is_supported_syntax(configs, syntax), syntaxes)
+
+    start = time.perf_counter()
+    matcher = SyntaxMatcher(configs)
+    build_time = time.perf_counter() - start
+    matcher_time = measure(matcher.matches, syntaxes)
+
+    print("{} configs, {} views, {} checks per view".format(CONFIG_COUNT, VIEW_COUNT, LISTENER_COUNT))
+    print("{:<10} {:>14}".format("matcher", "us per view"))
+    print("{:<10} {:>14.2f}".format("legacy", legacy_time / VIEW_COUNT * 1e6))
+    print("{:<10} {:>14.2f}".format("compiled", matcher_time / VIEW_COUNT * 1e6))
+    print("matcher built in {:.2f} ms".format(build_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,13 +8,18 @@ except ImportError:
     pass
 
 from .core.protocol import Request
+from .core.rpc import RequestHandle
 from .core.settings import settings
 from .core.logging import debug, exception_log
-from .core.protocol import CompletionItemKind, Range
+from .core.protocol import CompletionItemKind
+from .core.completions import CompletionCache, CompletionItemIndex, sort_key
+from .core.events import Events
 from .core.clients import session_for_view, client_for_view
 from .core.configurations import is_supported_syntax
 from .core.documents import get_document_position, purge_did_change
 
+assert RequestHandle
+
 
 NO_COMPLETION_SCOPES = 'comment'
 completion_item_kind_names = {v: k for k, v in CompletionItemKind.__dict__.items()}
@@ -48,20 +53,35 @@ completion_item_kind_icons = {
     25: "🏷",  # TypeParameter
 }
 
+# what goes before the label of each kind, with the default for unknown kinds under None
+completion_item_kind_labels = dict((kind, icon + " ") for kind, icon in completion_item_kind_icons.items())
+
 
 class CompletionState(object):
     IDLE = 0
     REQUESTING = 1
     APPLYING = 2
-    CANCELLING = 3
 
 
-resolvable_completion_items = []  # type: List[Any]
+# seconds the items of a response can be resolved after it arrived
+COMPLETION_ITEMS_LIFETIME = 60
+
+completion_item_indexes = {}  # type: Dict[int, CompletionItemIndex]
+
+
+def get_completion_item_index(view: sublime.View) -> 'Optional[CompletionItemIndex]':
+    index = completion_item_indexes.get(view.id())
+    if index and index.is_expired():
+        del completion_item_indexes[view.id()]
+        return None
+    return index
+
+
+def forget_completion_items(view: sublime.View):
+    completion_item_indexes.pop(view.id(), None)
 
 
-def find_completion_item(label: str) -> 'Optional[Any]':
-    matches = list(filter(lambda i: i.get("label") == label, resolvable_completion_items))
-    return matches[0] if matches else None
+Events.subscribe("view.on_close", forget_completion_items)
 
 
 class CompletionContext(object):
@@ -97,7 +117,8 @@ class CompletionSnippetHandler(sublime_plugin.EventListener):
     def on_query_completions(self, view, prefix, locations):
         global current_completion
         if settings.resolve_completion_for_snippets and has_resolvable_completions(view):
-            current_completion = CompletionContext(view.sel()[0].begin())
+            # committing replaces the prefix, the whole inserted text starts where it does
+            current_completion = CompletionContext(locations[0] - len(prefix))
 
     def on_text_command(self, view, command_name, args):
         if settings.resolve_completion_for_snippets and current_completion:
@@ -110,9 +131,15 @@ class CompletionSnippetHandler(sublime_plugin.EventListener):
             if current_completion and current_completion.committing:
                 current_completion.committed_at(view.sel()[0].end())
                 inserted = view.substr(current_completion.region)
-                item = find_completion_item(inserted)
-                if item:
-                    self.resolve_completion(item, view)
+                index = get_completion_item_index(view)
+                item = index.find(inserted) if index else None
+                if index and item:
+                    resolved = index.get_resolved(item)
+                    if resolved:
+                        # resolved while the list was shown, no need to wait for the server
+                        sublime.set_timeout(lambda: self.handle_resolve_response(resolved, view), 0)
+                    else:
+                        self.resolve_completion(item, view)
                 else:
                     current_completion = None
 
@@ -156,12 +183,16 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         self.enabled = False
         self.trigger_chars = []  # type: List[str]
         self.resolve = False
+        self.has_resolve_provider = False
         self.resolve_details = []  # type: List[Tuple[str, str]]
         self.state = CompletionState.IDLE
-        self.completions = []  # type: List[Any]
-        self.next_request = None  # type: Optional[int]
+        self.cache = None  # type: Optional[CompletionCache]
+        self.request = None  # type: Optional[RequestHandle]
         self.last_prefix = ""
         self.last_pos = 0
+        self.last_start_rowcol = (0, 0)
+        self.show_detail = True
+        self.kind_hints = completion_item_kind_names
 
     @classmethod
     def is_applicable(cls, settings):
@@ -188,6 +219,9 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             prev_char = self.view.substr(location - 1)
             return prev_char in self.trigger_chars
 
+    def is_word_character(self, char: str) -> bool:
+        return char.isalnum() or char == '_'
+
     def on_modified_async(self):
         if not self.initialized:
             self.initialize()
@@ -211,7 +245,7 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
                 self.view.run_command("hide_auto_complete")
             # cancel current completion if the previous input is an space
             if self.state == CompletionState.REQUESTING and prev_char.isspace():
-                self.state = CompletionState.CANCELLING
+                self.cancel_request()
 
             command_history = getattr(self.view, 'command_history', None)
             if command_history:
@@ -238,37 +272,91 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
                 if self.state == CompletionState.APPLYING:
                     self.state = CompletionState.IDLE
 
+                if self.state == CompletionState.REQUESTING:
+                    # supersede the request the server is still working on.
+                    self.cancel_request()
+
                 if self.state == CompletionState.IDLE:
                     self.do_request(pos)
-                    self.completions = []
+        elif self.is_word_character(prev_char):
+            self.complete_word(pos)
+
+    def complete_word(self, pos: int):
+        """
+        The last list is filtered while typing the word it was requested
+        for, the server is only asked again for a new word or when the list
+        it sent was incomplete.
+        """
+        word_start = self.view.word(pos - 1).begin()
+        if self.cache and self.cache.start == word_start:
+            if not self.cache.is_incomplete:
+                return
+        elif not settings.complete_all_chars:
+            return
+
+        if self.state == CompletionState.APPLYING:
+            self.state = CompletionState.IDLE
 
-                elif self.state in (CompletionState.REQUESTING, CompletionState.CANCELLING):
-                    self.next_request = pos
-                    self.state = CompletionState.CANCELLING
+        if self.state == CompletionState.REQUESTING:
+            # supersede the request the server is still working on.
+            self.cancel_request()
+
+        if self.state == CompletionState.IDLE:
+            self.do_request(pos, word_start)
 
     def on_query_completions(self, prefix, locations):
-        if self.completions:
+        # the list is only offered for the word it was requested for
+        if not self.cache or self.cache.start != locations[0] - len(prefix):
+            return None
+        indexes = self.cache.matches(prefix, settings.max_completion_items)
+        if indexes:
+            self.resolve_ahead(indexes[0])
             return (
-                self.completions,
+                self.cache.completions(indexes),
                 0 if not settings.only_show_lsp_completions
                 else sublime.INHIBIT_WORD_COMPLETIONS | sublime.INHIBIT_EXPLICIT_COMPLETIONS
             )
 
-    def do_request(self, pos: int):
+    def resolve_ahead(self, item_index: int):
+        """
+        Resolves the item shown first, the likeliest to be committed, so its
+        snippet is at hand if it is. Sublime doesn't tell which item is
+        highlighted.
+        """
+        if not self.cache or not settings.resolve_completion_for_snippets or not self.has_resolve_provider:
+            return
+        index = get_completion_item_index(self.view)
+        item = self.cache.items[item_index]
+        if index and index.request_resolve(item):
+            client = client_for_view(self.view)
+            if client:
+                client.send_request(
+                    Request.resolveCompletionItem(item),
+                    lambda response: index.set_resolved(item, response))
+
+    def cancel_request(self):
+        if self.request:
+            self.request.cancel()
+            self.request = None
+        self.state = CompletionState.IDLE
+
+    def do_request(self, pos: int, word_start: 'Optional[int]' = None):
         self.last_pos = pos
-        self.next_request = None
         view = self.view
+        self.last_prefix = view.substr(sublime.Region(word_start, pos)) if word_start is not None else ""
+        if self.cache and self.cache.start != pos - len(self.last_prefix):
+            self.cache = None
 
         # don't store client so we can handle restarts
         client = client_for_view(view)
         if not client:
             return
 
-        if settings.complete_all_chars or self.is_after_trigger_character(pos):
+        if word_start is not None or settings.complete_all_chars or self.is_after_trigger_character(pos):
             purge_did_change(view.buffer_id())
             document_position = get_document_position(view, pos)
             if document_position:
-                client.send_request(
+                self.request = client.send_request(
                     Request.complete(document_position),
                     self.handle_response,
                     self.handle_error)
@@ -278,25 +366,17 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         # Sublime handles snippets automatically, so we don't have to care about insertTextFormat.
         label = item["label"]
         kind = item.get("kind")
-        icon = completion_item_kind_icons.get(kind) or completion_item_kind_icons[None]
+        trigger = (completion_item_kind_labels.get(kind) or completion_item_kind_labels[None]) + label
         # choose hint based on availability and user preference
-        hint = None
-        if settings.completion_hint_type == "auto":
-            hint = item.get("detail")
-            if not hint:
-                if kind:
-                    hint = completion_item_kind_names[kind]
-        elif settings.completion_hint_type == "detail":
-            hint = item.get("detail")
-        elif settings.completion_hint_type == "kind":
-            if kind:
-                hint = completion_item_kind_names.get(kind)
+        hint = item.get("detail") if self.show_detail else None
+        if not hint and kind:
+            hint = self.kind_hints.get(kind)
         # label is an alternative for insertText if neither textEdit nor insertText is provided
         insert_text = self.text_edit_text(item) or item.get("insertText") or label
         if len(insert_text) > 0 and insert_text[0] == '$':  # sublime needs leading '$' escaped.
             insert_text = '\\$' + insert_text[1:]
         # only return label with a hint if available
-        return "\t  ".join((icon + " " + label, hint)) if hint else icon + " " + label, insert_text
+        return trigger + "\t  " + hint if hint else trigger, insert_text
 
     def text_edit_text(self, item) -> 'Optional[str]':
         # try to handle textEdit if present
@@ -304,47 +384,66 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         if text_edit:
             edit_range, edit_text = text_edit.get("range"), text_edit.get("newText")
             if edit_range and edit_text:
-                edit_range = Range.from_lsp(edit_range)
-                last_start = self.last_pos - len(self.last_prefix)
-                last_row, last_col = self.view.rowcol(last_start)
-                if last_row == edit_range.start.row == edit_range.end.row and edit_range.start.col <= last_col:
+                start, end = edit_range["start"], edit_range["end"]
+                last_row, last_col = self.last_start_rowcol
+                if last_row == start["line"] == end["line"] and start["character"] <= last_col:
                     # sublime does not support explicit replacement with completion
                     # at given range, but we try to trim the textEdit range and text
                     # to the start location of the completion
-                    return edit_text[last_col - edit_range.start.col:]
+                    return edit_text[last_col - start["character"]:]
         return None
 
     def handle_response(self, response: 'Optional[Dict]'):
-        global resolvable_completion_items
-
+        self.request = None
         if self.state == CompletionState.REQUESTING:
-            items = []  # type: List[Dict]
-            if isinstance(response, dict):
-                items = response["items"]
-            elif isinstance(response, list):
-                items = response
-            items = sorted(items, key=lambda item: item.get("sortText", item["label"]))
-            self.completions = list(self.format_completion(item) for item in items)
-
-            if self.has_resolve_provider:
-                resolvable_completion_items = items
-
-            # if insert_best_completion was just ran, undo it before presenting new completions.
-            prev_char = self.view.substr(self.view.sel()[0].begin() - 1)
-            if prev_char.isspace():
-                if last_text_command == "insert_best_completion":
-                    self.view.run_command("undo")
-
-            self.state = CompletionState.APPLYING
-            self.view.run_command("hide_auto_complete")
-            self.run_auto_complete()
-        elif self.state == CompletionState.CANCELLING:
-            if self.next_request:
-                self.do_request(self.next_request)
+            # the handler may run on the main thread, the list is prepared on the worker
+            sublime.set_timeout_async(lambda: self.prepare_completions(response), 0)
         else:
             debug('Got unexpected response while in state {}'.format(self.state))
 
+    def prepare_completions(self, response: 'Optional[Dict]'):
+        if self.state != CompletionState.REQUESTING or self.request:
+            # cancelled or superseded in the meantime
+            return
+        items = []  # type: List[Dict]
+        is_incomplete = False
+        if isinstance(response, dict):
+            items = response["items"]
+            is_incomplete = response.get("isIncomplete", False)
+        elif isinstance(response, list):
+            items = response
+        items = sorted(items, key=sort_key)
+
+        start = self.last_pos - len(self.last_prefix)
+        self.last_start_rowcol = self.view.rowcol(start)
+        hint_type = settings.completion_hint_type
+        self.show_detail = hint_type in ("auto", "detail")
+        self.kind_hints = completion_item_kind_names if hint_type in ("auto", "kind") else {}
+        self.cache = CompletionCache(start, items, self.format_completion, is_incomplete)
+        if self.has_resolve_provider:
+            completion_item_indexes[self.view.id()] = CompletionItemIndex(items, COMPLETION_ITEMS_LIFETIME)
+        if not len(self.view.sel()):
+            # the view was closed or its selection cleared in the meantime
+            self.state = CompletionState.IDLE
+            return
+        # the items shown for what is typed now are ranked and formatted here
+        # rather than on the main thread, more only as the prefix changes
+        prefix_end = self.view.sel()[0].begin()
+        if prefix_end >= start:
+            self.cache.filter(self.view.substr(sublime.Region(start, prefix_end)), settings.max_completion_items)
+
+        # if insert_best_completion was just ran, undo it before presenting new completions.
+        prev_char = self.view.substr(prefix_end - 1)
+        if prev_char.isspace():
+            if last_text_command == "insert_best_completion":
+                self.view.run_command("undo")
+
+        self.state = CompletionState.APPLYING
+        self.view.run_command("hide_auto_complete")
+        self.run_auto_complete()
+
     def handle_error(self, error: dict):
+        self.request = None
         sublime.status_message('Completion error: ' + str(error.get('message')))
         self.state = CompletionState.IDLE
 
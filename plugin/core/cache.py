@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+try:
+    from typing import Any, Callable, Dict, Hashable
+    assert Any and Callable and Dict and Hashable
+except ImportError:
+    pass
+
+
+class LRUCache(object):
+    """
+    A mapping of at most max_size entries, evicting the least recently used
+    one to make room. It can be used from several threads.
+    """
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: 'Hashable') -> bool:
+        return key in self._entries
+
+    def get(self, key: 'Hashable', default: 'Any' = None) -> 'Any':
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: 'Hashable', value: 'Any') -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = value
+            while len(self._entries) > max(self.max_size, 0):
+                self._entries.popitem(last=False)
+
+    def discard_if(self, predicate: 'Callable[[Any], bool]') -> None:
+        """Removes the entries whose key matches"""
+        with self._lock:
+            for key in list(key for key in self._entries if predicate(key)):
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# tells responses that were cached apart from those that weren't
+MISSING = object()
+
+
+class ResponseCache(object):
+    """
+    Responses to requests about a position in a document, by method, server,
+    document, document version and position. Once a document has a new
+    version, its older responses are never found again and age out.
+    """
+    def __init__(self) -> None:
+        self._caches = {}  # type: Dict[str, LRUCache]
+
+    def get(self, method: str, server: 'Hashable', uri: str, version: int,
+            position: 'Hashable') -> 'Any':
+        """The cached response, or MISSING"""
+        cache = self._caches.get(method)
+        if cache is None:
+            return MISSING
+        return cache.get((server, uri, version, position), MISSING)
+
+    def put(self, method: str, server: 'Hashable', uri: str, version: int, position: 'Hashable',
+            response: 'Any', max_size: int) -> None:
+        cache = self._caches.get(method)
+        if cache is None:
+            cache = self._caches[method] = LRUCache(max_size)
+        cache.max_size = max_size
+        cache.put((server, uri, version, position), response)
+
+    def invalidate(self, uri: str) -> None:
+        """Forgets the responses about a document, e.g. once closed, as its versions start over"""
+        for cache in list(self._caches.values()):
+            cache.discard_if(lambda key: key[1] == uri)
@@ -2,15 +2,18 @@ import sublime
 import sublime_plugin
 import os
 
-from .logging import debug, printf
+from .logging import debug, debug_enabled, printf
 from .configurations import config_for_scope, is_supported_view
 from .workspace import get_project_path
 from .types import ClientStates
-from .sessions import create_session, Session
+from .sessions import create_session, Session, SessionIndex, SessionPool
+from .dispatch import WorkerPool
+from .document_states import document_states
+from .events import Events
 
 # typing only
 from .rpc import Client
-from .settings import ClientConfig, settings
+from .settings import ClientConfig, client_configs, settings
 assert Client and ClientConfig
 
 
@@ -23,6 +26,9 @@ except ImportError:
 
 
 clients_by_window = {}  # type: Dict[int, Dict[str, Session]]
+session_pool = SessionPool()
+
+sessions_by_view = SessionIndex()
 
 
 class CodeIntelTextCommand(sublime_plugin.TextCommand):
@@ -82,24 +88,75 @@ def get_window_env(window: sublime.Window, config: ClientConfig):
     return expanded_args, env
 
 
+worker_pool = None  # type: Optional[WorkerPool]
+
+
+def run_async(function: 'Callable[[], None]') -> None:
+    sublime.set_timeout_async(function, 0)
+
+
+def run_on_main_thread(function: 'Callable[[], None]') -> None:
+    sublime.set_timeout(function, 0)
+
+
+def get_handler_executor() -> 'Callable[[Callable[[], None]], None]':
+    global worker_pool
+    if settings.handler_executor == "main":
+        return run_on_main_thread
+    elif settings.handler_executor == "worker":
+        if not worker_pool:
+            worker_pool = WorkerPool()
+        return worker_pool
+    else:
+        return run_async
+
+
 def start_window_config(window: sublime.Window, project_path: str, config: ClientConfig,
-                        on_created: 'Callable'):
-    args, env = get_window_env(window, config)
-    config.binary_args = args
-    session = create_session(config, project_path, env, settings,
-                             on_created=on_created,
-                             on_ended=lambda: on_session_ended(window, config.name))
+                        on_created: 'Callable', on_window_ready: 'Callable'):
+    """
+    Starts a session for the window, or shares the one another window has
+    for the same config and project. on_created is called once per session,
+    on_window_ready for every window using it once it is initialized.
+    """
+    def start(on_pool_created, on_pool_ended):
+        args, env = get_window_env(window, config)
+        config.binary_args = args
+
+        def on_session_created(session):
+            on_created(session)
+            on_pool_created(session)
+
+        return create_session(config, project_path, env, settings,
+                              on_created=on_session_created,
+                              on_ended=on_pool_ended,
+                              executor=get_handler_executor())
+
+    def on_ready(session):
+        clients_by_window.setdefault(window.id(), {})[config.name] = session
+        on_window_ready(session)
+
+    session = session_pool.acquire(config.name, project_path, window.id(), start, on_ready,
+                                   lambda session, window_ids: on_session_ended(session, window_ids, config.name))
     clients_by_window.setdefault(window.id(), {})[config.name] = session
     debug("{} client registered for window {}".format(config.name, window.id()))
 
 
-def on_session_ended(window: sublime.Window, config_name: str):
-    configs = window_configs(window)
-    del configs[config_name]
-    if not configs:
-        debug("all clients unloaded")
-        if clients_unloaded_handler:
-            clients_unloaded_handler(window.id())
+def windows_for_session(session: Session) -> 'List[sublime.Window]':
+    window_ids = session_pool.window_ids(session)
+    return list(window for window in sublime.windows() if window.id() in window_ids)
+
+
+def on_session_ended(session: Session, window_ids: 'List[int]', config_name: str):
+    forget_sessions([session])
+    document_states.forget_session(session)
+    for window_id in window_ids:
+        configs = clients_by_window.get(window_id)
+        if configs and configs.get(config_name) is session:
+            del configs[config_name]
+        if not configs:
+            debug("all clients unloaded")
+            if clients_unloaded_handler:
+                clients_unloaded_handler(window_id)
 
 
 def set_config_stopping(window: sublime.Window, config_name: str):
@@ -110,6 +167,10 @@ def client_for_closed_view(view: sublime.View) -> 'Optional[Client]':
     return _client_for_view_and_window(view, sublime.active_window())
 
 
+def session_for_closed_view(view: sublime.View) -> 'Optional[Session]':
+    return _session_for_view_and_window(view, sublime.active_window())
+
+
 def client_for_view(view: sublime.View) -> 'Optional[Client]':
     return _client_for_view_and_window(view, view.window())
 
@@ -119,30 +180,51 @@ def session_for_view(view: sublime.View) -> 'Optional[Session]':
 
 
 def _session_for_view_and_window(view: sublime.View, window: 'Optional[sublime.Window]') -> 'Optional[Session]':
+    syntax = view.settings().get("syntax")
+    revision = client_configs.revision
+    # the server is chosen by the scope at the cursor, e.g. for the scripts in an HTML view
+    sel = view.sel()
+    scope = view.scope_name(sel[0].begin()) if len(sel) else ""
+    found, session = sessions_by_view.get(view.id(), scope, syntax, revision, window.id() if window else None,
+                                          view.size())
+    if found:
+        return session
+
     if not window:
-        debug("no window for view", view.file_name())
+        if debug_enabled():
+            debug("no window for view", view.file_name())
         return None
 
-    if view.size() > 1000000:
-        printf("file is too big, ignoring!")
-        return False
-
     config = config_for_scope(view)
     if not config:
-        debug("config not available for view", view.file_name())
+        if debug_enabled():
+            debug("config not available for view", view.file_name())
         return None
 
-    window_config_states = window_configs(window)
-    if config.name not in window_config_states:
-        debug(config.name, "not available for view",
-              view.file_name(), "in window", window.id())
+    max_file_size = config.get_max_file_size(settings.max_file_size)
+    if view.size() > max_file_size:
+        printf("file is too big for {}, ignoring!".format(config.name))
+        sessions_by_view.put(view.id(), scope, syntax, revision, window.id(), max_file_size, None)
         return None
-    else:
-        session = window_config_states[config.name]
-        if session.state == ClientStates.READY:
-            return session
-        else:
-            return None
+
+    session = window_configs(window).get(config.name)
+    if not session:
+        if debug_enabled():
+            debug(config.name, "not available for view", view.file_name(), "in window", window.id())
+        return None
+    if session.state != ClientStates.READY:
+        return None
+    sessions_by_view.put(view.id(), scope, syntax, revision, window.id(), max_file_size, session)
+    return session
+
+
+def forget_view_session(view: sublime.View):
+    sessions_by_view.forget(view.id())
+
+
+def forget_sessions(sessions: 'List[Session]'):
+    """Drops the sessions from the view index, e.g. when they end"""
+    sessions_by_view.forget_sessions(sessions)
 
 
 def _client_for_view_and_window(view: sublime.View, window: 'Optional[sublime.Window]') -> 'Optional[Client]':
@@ -152,8 +234,8 @@ def _client_for_view_and_window(view: sublime.View, window: 'Optional[sublime.Wi
         if session.client:
             return session.client
         else:
-            debug(session.config.name, "in state", session.state, " for view",
-                  view.file_name())
+            if debug_enabled():
+                debug(session.config.name, "in state", session.state, " for view", view.file_name())
             return None
     else:
         debug('no session found')
@@ -190,6 +272,7 @@ def check_window_unloaded():
             if id not in closing_window_ids:
                 closing_window_ids.add(id)
                 debug("window closed", id)
+                Events.publish("window.on_close", id)
     for closed_window_id in closing_window_ids:
         unload_window_sessions(closed_window_id)
     closing_window_ids.clear()
@@ -197,20 +280,32 @@ def check_window_unloaded():
 
 def unload_window_sessions(window_id: int):
     window_configs = clients_by_window.pop(window_id, {})
+    forget_sessions(list(window_configs.values()))
+    ending = False
     for config_name, session in window_configs.items():
-        window_configs[config_name].state = ClientStates.STOPPING
-        debug("unloading session", config_name)
-        session.end()
+        if session_pool.release(session, window_id):
+            session.state = ClientStates.STOPPING
+            debug("unloading session", config_name)
+            session.end()
+            ending = True
+        else:
+            debug("session", config_name, "still used by other windows")
+    # otherwise the handler is called once the sessions have ended
+    if window_configs and not ending and clients_unloaded_handler:
+        clients_unloaded_handler(window_id)
 
 
 def unload_old_clients(window: sublime.Window):
     project_path = get_project_path(window)
     configs = window_configs(window)
-    for config_name, session in configs.items():
+    for config_name, session in list(configs.items()):
         if session.client and session.state == ClientStates.READY and session.project_path != project_path:
             debug('unload', config_name, 'project path changed from',
                   session.project_path, 'to', project_path)
-            session.end()
+            del configs[config_name]
+            forget_sessions([session])
+            if session_pool.release(session, window.id()):
+                session.end()
 
 
 clients_unloaded_handler = None  # type: Optional[Callable]
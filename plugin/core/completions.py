@@ -0,0 +1,135 @@
+import heapq
+import time
+from .fuzzy import FuzzyMatcher
+
+try:
+    from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+    assert Callable and Dict and List and Optional and Sequence and Set and Tuple
+except ImportError:
+    pass
+
+
+def sort_key(item: dict) -> str:
+    return item.get("sortText") or item["label"]
+
+
+def filter_text(item: dict) -> str:
+    return item.get("filterText") or item["label"]
+
+
+class CompletionCache(object):
+    """
+    The completion list a server returned for the word starting at `start`.
+
+    While that word is being typed, the list is filtered and ranked here
+    with a fuzzy match of the prefix against the filter text of the items,
+    instead of asking the server again, unless it said the list is
+    incomplete. Equal scores keep the server's order, after a preselected
+    item.
+
+    Items are only formatted for Sublime when they are among the ones
+    returned, most of a long list never is.
+    """
+    def __init__(self, start: int, items: 'List[dict]', format: 'Callable[[dict], Tuple[str, str]]',
+                 is_incomplete: bool = False) -> None:
+        self.start = start
+        self.items = items
+        self.is_incomplete = is_incomplete
+        self._format = format
+        self._completions = [None] * len(items)  # type: List[Optional[Tuple[str, str]]]
+        self._matcher = FuzzyMatcher(list(filter_text(item) for item in items))
+        self._preselected = set(index for index, item in enumerate(items) if item.get("preselect"))
+        # the items matching the last prefix, to narrow down as it grows
+        self._last_prefix = ""
+        self._last_matches = list(range(len(items)))  # type: Sequence[int]
+        self._last_ranked = None  # type: Optional[Tuple[str, Optional[int], List[int]]]
+
+    def filter(self, prefix: str, limit: 'Optional[int]' = None) -> 'List[Tuple[str, str]]':
+        return self.completions(self.matches(prefix, limit))
+
+    def completions(self, indexes: 'List[int]') -> 'List[Tuple[str, str]]':
+        """The items at the indexes formatted for Sublime, formatting those that weren't yet"""
+        completions = []
+        for index in indexes:
+            completion = self._completions[index]
+            if completion is None:
+                completion = self._completions[index] = self._format(self.items[index])
+            completions.append(completion)
+        return completions
+
+    def matches(self, prefix: str, limit: 'Optional[int]' = None) -> 'List[int]':
+        """The indexes of the best items matching the prefix, ranked"""
+        prefix = prefix.lower()
+        if self._last_ranked and self._last_ranked[:2] == (prefix, limit):
+            return self._last_ranked[2]
+        if prefix.startswith(self._last_prefix):
+            candidates = self._last_matches
+        else:
+            candidates = range(len(self.items))
+        scored = self._matcher.scores(prefix, candidates)
+        self._last_prefix = prefix
+        self._last_matches = list(index for _, index in scored)
+
+        def rank(match: 'Tuple[int, int]') -> 'Tuple[int, bool, int]':
+            score, index = match
+            return -score, index not in self._preselected, index
+
+        if limit is not None and limit < len(scored):
+            ranked = heapq.nsmallest(limit, scored, key=rank)
+        else:
+            ranked = sorted(scored, key=rank)
+        indexes = list(index for _, index in ranked)
+        self._last_ranked = (prefix, limit, indexes)
+        return indexes
+
+
+def inserted_texts(item: dict) -> 'List[str]':
+    """The texts committing the item can insert"""
+    texts = [item["label"]]
+    insert_text = item.get("insertText")
+    if insert_text:
+        texts.append(insert_text)
+    text_edit = item.get("textEdit")
+    if text_edit and text_edit.get("newText"):
+        texts.append(text_edit["newText"])
+    return texts
+
+
+class CompletionItemIndex(object):
+    """
+    The items of one completion response by the texts they insert, to find
+    the one a commit inserted and resolve it, with what was resolved ahead
+    of the commit. A commit comes soon after the response, so the index is
+    only valid for `lifetime` seconds.
+    """
+    def __init__(self, items: 'List[dict]', lifetime: float, now: 'Optional[float]' = None) -> None:
+        self._items = items
+        self._by_text = None  # type: Optional[Dict[str, dict]]
+        self._resolved = {}  # type: Dict[int, dict]
+        self._requested = set()  # type: Set[int]
+        self.expires = (time.time() if now is None else now) + lifetime
+
+    def is_expired(self, now: 'Optional[float]' = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires
+
+    def find(self, text: str) -> 'Optional[dict]':
+        if self._by_text is None:
+            # built on the first commit only, most lists are never committed from
+            self._by_text = {}
+            for item in self._items:
+                for inserted in inserted_texts(item):
+                    self._by_text.setdefault(inserted, item)
+        return self._by_text.get(text)
+
+    def request_resolve(self, item: dict) -> bool:
+        """Whether the item still needs resolving, it is only requested once"""
+        if id(item) in self._requested:
+            return False
+        self._requested.add(id(item))
+        return True
+
+    def set_resolved(self, item: dict, resolved: dict) -> None:
+        self._resolved[id(item)] = resolved
+
+    def get_resolved(self, item: dict) -> 'Optional[dict]':
+        return self._resolved.get(id(item))
@@ -1,4 +1,3 @@
-import re
 import sublime
 
 from .settings import ClientConfig, client_configs
@@ -16,6 +15,10 @@ except ImportError:
 
 window_client_configs = dict()  # type: Dict[int, List[ClientConfig]]
 
+# configs resolved by config_for_scope, by view id: the syntax and config
+# revision they were resolved for, and the config by scope name at the cursor
+view_client_configs = dict()  # type: Dict[int, Tuple[Optional[str], int, Dict[str, Optional[ClientConfig]]]]
+
 
 def _get_scope_client_config(view: 'sublime.View', configs: 'List[ClientConfig]') -> 'Tuple[Optional[ClientConfig], int]':
     # When there are multiple server configurations, all of which are for
@@ -63,8 +66,29 @@ def get_window_client_config(view: sublime.View) -> 'Optional[ClientConfig]':
 
 
 def config_for_scope(view: sublime.View) -> 'Optional[ClientConfig]':
-    # check window_client_config first
     window = view.window()
+    sel = view.sel()
+    if not window or len(sel) == 0:
+        return _config_for_scope(view, window)
+
+    syntax = view.settings().get("syntax")
+    revision = client_configs.revision
+    cached = view_client_configs.get(view.id())
+    if cached and cached[0] == syntax and cached[1] == revision:
+        configs_by_scope = cached[2]
+    else:
+        configs_by_scope = {}
+        view_client_configs[view.id()] = (syntax, revision, configs_by_scope)
+    scope = view.scope_name(sel[0].begin())
+    if scope in configs_by_scope:
+        return configs_by_scope[scope]
+    config = _config_for_scope(view, window)
+    configs_by_scope[scope] = config
+    return config
+
+
+def _config_for_scope(view: sublime.View, window: 'Optional[sublime.Window]') -> 'Optional[ClientConfig]':
+    # check window_client_config first
     if window:
         configs_for_window = window_client_configs.get(window.id(), [])
         window_client_config, window_score = _get_scope_client_config(view, configs_for_window)
@@ -84,6 +108,18 @@ def config_for_scope(view: sublime.View) -> 'Optional[ClientConfig]':
     return window_client_config
 
 
+def config_for_name(window: 'sublime.Window', config_name: str) -> 'Optional[ClientConfig]':
+    for config in window_client_configs.get(window.id(), []):
+        if config.name == config_name:
+            return config
+    for config in client_configs.all:
+        if config.name == config_name:
+            window_client_config = apply_project_settings(config, window)
+            add_window_client_config(window, window_client_config)
+            return window_client_config
+    return None
+
+
 def add_window_client_config(window: 'sublime.Window', config: 'ClientConfig'):
     global window_client_configs
     window_client_configs.setdefault(window.id(), []).append(config)
@@ -93,43 +129,51 @@ def clear_window_client_configs(window: 'sublime.Window'):
     global window_client_configs
     if window.id() in window_client_configs:
         del window_client_configs[window.id()]
+    # project settings changed, views may resolve to other configs
+    view_client_configs.clear()
+
+
+def clear_view_client_config(view: 'sublime.View'):
+    view_client_configs.pop(view.id(), None)
 
 
 def apply_window_settings(client_config: 'ClientConfig', view: 'sublime.View') -> 'ClientConfig':
     window = view.window()
     if window:
-        window_config = get_project_config(window)
-
-        if client_config.name in window_config:
-            overrides = window_config[client_config.name]
-            debug('window has override for', client_config.name, overrides)
-            return ClientConfig(
-                client_config.name,
-                overrides.get("command", client_config.binary_args),
-                overrides.get("tcp_port", client_config.tcp_port),
-                overrides.get("languages", client_config.languages),
-                overrides.get("enabled", client_config.enabled),
-                overrides.get("initializationOptions", client_config.init_options),
-                overrides.get("settings", client_config.settings),
-                overrides.get("env", client_config.env)
-            )
+        return apply_project_settings(client_config, window)
+
+    return client_config
+
+
+def apply_project_settings(client_config: 'ClientConfig', window: 'sublime.Window') -> 'ClientConfig':
+    window_config = get_project_config(window)
+
+    if client_config.name in window_config:
+        overrides = window_config[client_config.name]
+        debug('window has override for', client_config.name, overrides)
+        return ClientConfig(
+            client_config.name,
+            overrides.get("command", client_config.binary_args),
+            overrides.get("tcp_port", client_config.tcp_port),
+            overrides.get("languages", client_config.languages),
+            overrides.get("enabled", client_config.enabled),
+            overrides.get("initializationOptions", client_config.init_options),
+            overrides.get("settings", client_config.settings),
+            overrides.get("env", client_config.env),
+            overrides.get("transport_engine", client_config.transport_engine),
+            overrides.get("max_file_size", client_config.max_file_size)
+        )
 
     return client_config
 
 
 def is_supportable_syntax(syntax: str) -> bool:
     # TODO: filter out configs disabled by the user.
-    for config in client_configs.defaults:
-        if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in config.syntaxes), syntax, re.IGNORECASE):
-            return True
-    return False
+    return client_configs.supportable_syntaxes.matches(syntax)
 
 
 def is_supported_syntax(syntax: str) -> bool:
-    for config in client_configs.all:
-        if re.search(r'|'.join(r'\b%s\b' % re.escape(s) for s in config.syntaxes), syntax, re.IGNORECASE):
-            return True
-    return False
+    return client_configs.supported_syntaxes.matches(syntax)
 
 
 def is_supported_view(view: sublime.View) -> bool:
@@ -5,8 +5,11 @@ from .url import uri_to_filename
 from .protocol import Diagnostic
 from .events import Events
 from .views import range_to_region
+from .diagnostics_store import DiagnosticsStore, FileDiagnostics
+from .dispatch import Coalescer
+from .settings import settings
 
-assert Diagnostic
+assert Diagnostic and FileDiagnostics
 
 try:
     from typing import Any, List, Dict, Tuple, Callable, Optional
@@ -15,23 +18,12 @@ except ImportError:
     pass
 
 
-window_file_diagnostics = dict(
-)  # type: Dict[int, Dict[str, Dict[str, List[Diagnostic]]]]
+diagnostics_store = DiagnosticsStore()
 
 
 def update_file_diagnostics(window: sublime.Window, file_path: str, source: str,
                             diagnostics: 'List[Diagnostic]'):
-    if diagnostics:
-        window_file_diagnostics.setdefault(window.id(), dict()).setdefault(
-            file_path, dict())[source] = diagnostics
-    else:
-        if window.id() in window_file_diagnostics:
-            file_diagnostics = window_file_diagnostics[window.id()]
-            if file_path in file_diagnostics:
-                if source in file_diagnostics[file_path]:
-                    del file_diagnostics[file_path][source]
-                if not file_diagnostics[file_path]:
-                    del file_diagnostics[file_path]
+    diagnostics_store.update(window.id(), file_path, source, diagnostics)
 
 
 class DiagnosticsUpdate(object):
@@ -43,16 +35,29 @@ class DiagnosticsUpdate(object):
         self.diagnostics = diagnostics
 
 
-def handle_client_diagnostics(window: sublime.Window, client_name: str, update: dict):
-    maybe_file_uri = update.get('uri')
-    if maybe_file_uri is not None:
-        file_path = uri_to_filename(maybe_file_uri)
+def apply_client_diagnostics(updates: 'List[Tuple[sublime.Window, str, dict]]'):
+    diagnostics_updates = []
+    for window, client_name, update in updates:
+        file_path = uri_to_filename(update['uri'])
 
         diagnostics = list(
             Diagnostic.from_lsp(item) for item in update.get('diagnostics', []))
 
         update_file_diagnostics(window, file_path, client_name, diagnostics)
-        Events.publish("document.diagnostics", DiagnosticsUpdate(window, client_name, file_path, diagnostics))
+        diagnostics_updates.append(DiagnosticsUpdate(window, client_name, file_path, diagnostics))
+    Events.publish("document.diagnostics", diagnostics_updates)
+
+
+# servers publish diagnostics for a file many times in a row while building,
+# only the latest ones within the delay are converted and shown
+diagnostics_coalescer = Coalescer(apply_client_diagnostics, sublime.set_timeout_async, settings.diagnostics_delay_ms)
+
+
+def handle_client_diagnostics(window: sublime.Window, client_name: str, update: dict):
+    maybe_file_uri = update.get('uri')
+    if maybe_file_uri is not None:
+        diagnostics_coalescer.delay = settings.diagnostics_delay_ms
+        diagnostics_coalescer.put((window.id(), client_name, maybe_file_uri), (window, client_name, update))
     else:
         debug('missing uri in diagnostics update')
 # TODO: expose updates to features
@@ -67,40 +72,46 @@ def remove_diagnostics(view: sublime.View, client_name: str):
     if file_path:
         if not window.find_open_file(file_path):
             update_file_diagnostics(window, file_path, client_name, [])
-            Events.publish("document.diagnostics", DiagnosticsUpdate(window, client_name, file_path, []))
+            Events.publish("document.diagnostics", [DiagnosticsUpdate(window, client_name, file_path, [])])
         else:
             debug('file still open?')
 
 
 def get_line_diagnostics(view, point):
+    file_diagnostics = get_file_diagnostics_for_view(view)
+    if not file_diagnostics:
+        return ()
     row, _ = view.rowcol(point)
-    diagnostics = get_diagnostics_for_view(view)
-    return tuple(
-        diagnostic for diagnostic in diagnostics
-        if diagnostic.range.start.row <= row <= diagnostic.range.end.row
-    )
+    return tuple(file_diagnostics.line_diagnostics(row))
 
 
 def get_point_diagnostics(view, point):
-    diagnostics = get_diagnostics_for_view(view)
+    file_diagnostics = get_file_diagnostics_for_view(view)
+    if not file_diagnostics:
+        return ()
+    row, _ = view.rowcol(point)
     return tuple(
-        diagnostic for diagnostic in diagnostics
+        diagnostic for diagnostic in file_diagnostics.line_diagnostics(row)
         if range_to_region(diagnostic.range, view).contains(point)
     )
 
 
-def get_window_diagnostics(window: sublime.Window) -> 'Optional[Dict[str, Dict[str, List[Diagnostic]]]]':
-    return window_file_diagnostics.get(window.id())
+def get_window_diagnostics(window: sublime.Window) -> 'Optional[Dict[str, FileDiagnostics]]':
+    return diagnostics_store.get_files(window.id())
 
 
-def get_diagnostics_for_view(view: sublime.View) -> 'List[Diagnostic]':
-    view_diagnostics = []
+def get_window_diagnostics_count(window: sublime.Window, severity: int) -> int:
+    return diagnostics_store.count(window.id(), severity)
+
+
+def get_file_diagnostics_for_view(view: sublime.View) -> 'Optional[FileDiagnostics]':
     window = view.window()
     file_path = view.file_name()
     if file_path and window:
-        if window.id() in window_file_diagnostics:
-            file_diagnostics = window_file_diagnostics[window.id()]
-            if file_path in file_diagnostics:
-                for origin in file_diagnostics[file_path]:
-                    view_diagnostics.extend(file_diagnostics[file_path][origin])
-    return view_diagnostics
+        return diagnostics_store.get_file(window.id(), file_path)
+    return None
+
+
+def get_diagnostics_for_view(view: sublime.View) -> 'List[Diagnostic]':
+    file_diagnostics = get_file_diagnostics_for_view(view)
+    return list(file_diagnostics) if file_diagnostics else []
@@ -0,0 +1,146 @@
+import threading
+from .protocol import Diagnostic, DiagnosticSeverity
+
+try:
+    from typing import Dict, Iterator, List, Optional, Set
+    assert Dict and Iterator and List and Optional and Set
+except ImportError:
+    pass
+
+
+# diagnostics spanning more rows than this are kept in a list that is
+# scanned, instead of being added to the index for each of their rows
+MAX_INDEXED_ROWS = 64
+
+SEVERITY_COUNT = DiagnosticSeverity.Hint + 1
+
+
+class FileDiagnostics(object):
+    """
+    The diagnostics of one file by source, with counts by severity and an
+    index of the diagnostics covering each row.
+
+    Updates arrive on the async thread while views are drawn from the main
+    thread, so the index is only used under the lock, and by_source is
+    replaced rather than changed, to be iterated without it.
+    """
+    def __init__(self, lock: 'Optional[threading.RLock]' = None) -> None:
+        self.by_source = {}  # type: Dict[str, List[Diagnostic]]
+        self.counts = [0] * SEVERITY_COUNT
+        self._rows = {}  # type: Dict[int, List[Diagnostic]]
+        self._wide = []  # type: List[Diagnostic]
+        self._lock = lock or threading.RLock()
+
+    def __bool__(self) -> bool:
+        return bool(self.by_source)
+
+    def __iter__(self) -> 'Iterator[Diagnostic]':
+        for diagnostics in self.by_source.values():
+            for diagnostic in diagnostics:
+                yield diagnostic
+
+    def update(self, source: str, diagnostics: 'List[Diagnostic]') -> 'List[int]':
+        """Replaces the diagnostics of a source, returns the change of the counts by severity"""
+        delta = [0] * SEVERITY_COUNT
+        with self._lock:
+            by_source = dict(self.by_source)
+            for diagnostic in by_source.pop(source, []):
+                self._remove(diagnostic)
+                delta[diagnostic.severity] -= 1
+            if diagnostics:
+                by_source[source] = diagnostics
+                for diagnostic in diagnostics:
+                    self._add(diagnostic)
+                    delta[diagnostic.severity] += 1
+            self.by_source = by_source
+            self.counts = list(count + change for count, change in zip(self.counts, delta))
+        return delta
+
+    def line_diagnostics(self, row: int) -> 'List[Diagnostic]':
+        """The diagnostics whose range covers the row"""
+        with self._lock:
+            diagnostics = list(self._rows.get(row, []))
+            for diagnostic in self._wide:
+                if diagnostic.range.start.row <= row <= diagnostic.range.end.row:
+                    diagnostics.append(diagnostic)
+        return diagnostics
+
+    def rows_diagnostics(self, first_row: int, last_row: int) -> 'List[Diagnostic]':
+        """The diagnostics whose range overlaps the rows, each once"""
+        with self._lock:
+            if last_row - first_row >= len(self._rows):
+                rows = sorted(row for row in self._rows if first_row <= row <= last_row)
+            else:
+                rows = [row for row in range(first_row, last_row + 1) if row in self._rows]
+            seen = set()  # type: Set[int]
+            diagnostics = []
+            for row in rows:
+                for diagnostic in self._rows[row]:
+                    if id(diagnostic) not in seen:
+                        seen.add(id(diagnostic))
+                        diagnostics.append(diagnostic)
+            for diagnostic in self._wide:
+                if diagnostic.range.start.row <= last_row and diagnostic.range.end.row >= first_row:
+                    diagnostics.append(diagnostic)
+        return diagnostics
+
+    def _add(self, diagnostic: Diagnostic) -> None:
+        start, end = diagnostic.range.start.row, diagnostic.range.end.row
+        if end - start >= MAX_INDEXED_ROWS:
+            self._wide.append(diagnostic)
+            return
+        for row in range(start, end + 1):
+            self._rows.setdefault(row, []).append(diagnostic)
+
+    def _remove(self, diagnostic: Diagnostic) -> None:
+        start, end = diagnostic.range.start.row, diagnostic.range.end.row
+        if end - start >= MAX_INDEXED_ROWS:
+            self._wide.remove(diagnostic)
+            return
+        for row in range(start, end + 1):
+            row_diagnostics = self._rows[row]
+            row_diagnostics.remove(diagnostic)
+            if not row_diagnostics:
+                del self._rows[row]
+
+
+class DiagnosticsStore(object):
+    """
+    Diagnostics by window and file, keeping the counts by severity of each
+    window up to date as files are updated. Safe to update from several
+    threads while others read, the files of a window are given as a copy.
+    """
+    def __init__(self) -> None:
+        self._files = {}  # type: Dict[int, Dict[str, FileDiagnostics]]
+        self._counts = {}  # type: Dict[int, List[int]]
+        # shared with the files, so one update of a file and its window is seen at once
+        self._lock = threading.RLock()
+
+    def update(self, window_id: int, file_path: str, source: str, diagnostics: 'List[Diagnostic]') -> None:
+        with self._lock:
+            files = self._files.setdefault(window_id, {})
+            file_diagnostics = files.get(file_path)
+            if file_diagnostics is None:
+                if not diagnostics:
+                    return
+                file_diagnostics = files[file_path] = FileDiagnostics(self._lock)
+            delta = file_diagnostics.update(source, diagnostics)
+            counts = self._counts.setdefault(window_id, [0] * SEVERITY_COUNT)
+            for severity, change in enumerate(delta):
+                counts[severity] += change
+            if not file_diagnostics:
+                del files[file_path]
+
+    def get_file(self, window_id: int, file_path: str) -> 'Optional[FileDiagnostics]':
+        with self._lock:
+            return self._files.get(window_id, {}).get(file_path)
+
+    def get_files(self, window_id: int) -> 'Optional[Dict[str, FileDiagnostics]]':
+        with self._lock:
+            files = self._files.get(window_id)
+            return dict(files) if files is not None else None
+
+    def count(self, window_id: int, severity: int) -> int:
+        with self._lock:
+            counts = self._counts.get(window_id)
+            return counts[severity] if counts else 0
@@ -0,0 +1,57 @@
+from .protocol import Point, Range
+
+try:
+    from typing import Any, Dict, Optional
+    assert Any and Dict and Optional
+except ImportError:
+    pass
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix, found by bisecting on slice comparisons"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix_length(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix, never reaching into the first `limit` characters"""
+    len_a, len_b = len(a), len(b)
+    lo, hi = 0, min(len_a, len_b) - limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len_a - mid:len_a - lo] == b[len_b - mid:len_b - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def offset_to_text_point(text: str, offset: int) -> Point:
+    row = text.count('\n', 0, offset)
+    col = offset - (text.rfind('\n', 0, offset) + 1)
+    return Point(row, col)
+
+
+def text_change(old: str, new: str) -> 'Optional[Dict[str, Any]]':
+    """
+    Returns a single range-based content change that turns `old` into `new`,
+    or None when both texts are equal.
+    """
+    if old == new:
+        return None
+    prefix = common_prefix_length(old, new)
+    suffix = common_suffix_length(old, new, prefix)
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+    change_range = Range(offset_to_text_point(old, prefix), offset_to_text_point(old, old_end))
+    return {
+        "range": change_range.to_lsp(),
+        "rangeLength": old_end - prefix,
+        "text": new[prefix:new_end]
+    }
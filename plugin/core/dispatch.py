@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from queue import Queue
+import threading
+from .logging import debug, exception_log
+
+try:
+    from typing import Any, Callable, List, Optional
+    assert Any and Callable and List and Optional
+except ImportError:
+    pass
+
+
+WORKER_POOL_SIZE = 2
+
+
+def run_inline(function: 'Callable[[], None]') -> None:
+    function()
+
+
+class WorkerPool(object):
+    """
+    Runs functions on a fixed set of threads.
+
+    Unlike the Sublime Text threads, functions may run out of order.
+    """
+    def __init__(self, size: int = WORKER_POOL_SIZE) -> None:
+        self._queue = Queue()  # type: Queue
+        self._threads = list(threading.Thread(target=self._work) for _ in range(size))
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def __call__(self, function: 'Callable[[], None]') -> None:
+        self._queue.put(function)
+
+    def _work(self):
+        while True:
+            function = self._queue.get()
+            if function is None:
+                break
+            try:
+                function()
+            except Exception as err:
+                exception_log("Error in worker", err)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+
+
+class PayloadDispatcher(object):
+    """
+    Takes framed messages from a transport reader thread, decodes them on
+    its own thread and hands them to an executor, so slow handlers never
+    stop the reader from draining the server's output.
+    """
+    def __init__(self, decode: 'Callable[[Any], Any]', handle: 'Callable[[Any], None]',
+                 on_closed: 'Callable[[], None]', executor: 'Callable[[Callable[[], None]], None]') -> None:
+        self._decode = decode
+        self._handle = handle
+        self._on_closed = on_closed
+        self._executor = executor
+        self._queue = Queue()  # type: Queue
+        self._lock = threading.Lock()
+        self.max_queue_depth = 0
+        self.pending_handlers = 0
+        self.max_pending_handlers = 0
+        self._closed = False
+        # a client that is never shut down must not keep Sublime from exiting
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """Messages received but not decoded yet"""
+        return self._queue.qsize()
+
+    def put(self, message) -> None:
+        self._queue.put(message)
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def close(self) -> None:
+        # closing is queued too, so messages received before are still handled
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                self._submit(self._on_closed)
+                break
+            payload = self._decode(message)
+            if payload is not None:
+                self._submit(self._handle, payload)
+        debug("dispatcher thread ended.")
+
+    def _submit(self, function: 'Callable', *args) -> None:
+        with self._lock:
+            self.pending_handlers += 1
+            if self.pending_handlers > self.max_pending_handlers:
+                self.max_pending_handlers = self.pending_handlers
+
+        def run():
+            try:
+                function(*args)
+            finally:
+                with self._lock:
+                    self.pending_handlers -= 1
+
+        self._executor(run)
+
+
+class Coalescer(object):
+    """
+    Keeps only the latest value put for each key, and hands all of them to
+    flush() at once, a delay after the first one arrived.
+    """
+    def __init__(self, flush: 'Callable[[List[Any]], None]',
+                 schedule: 'Callable[[Callable[[], None], int], None]', delay: int) -> None:
+        self._flush = flush
+        self._schedule = schedule
+        self.delay = delay
+        self.coalesced_count = 0
+        self._pending = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def put(self, key, value) -> None:
+        if self.delay <= 0:
+            self._flush([value])
+            return
+        with self._lock:
+            first = not self._pending
+            if key in self._pending:
+                # the newer value replaces the older one, in its place
+                self.coalesced_count += 1
+            self._pending[key] = value
+        if first:
+            self._schedule(self.flush, self.delay)
+
+    def flush(self) -> None:
+        with self._lock:
+            values = list(self._pending.values())
+            self._pending.clear()
+        if values:
+            self._flush(values)
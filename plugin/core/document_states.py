@@ -0,0 +1,84 @@
+try:
+    from typing import Any, Dict, List, Optional, Set, Tuple
+    assert Any and Dict and List and Optional and Set and Tuple
+except ImportError:
+    pass
+
+
+class DocumentState:
+    """Stores version count for documents open in a language service"""
+    def __init__(self, path: str) -> 'None':
+        self.path = path
+        self.version = 0
+        self.languageId = None
+        # last text sent to the server, kept only for incremental sync
+        self.text = None  # type: Optional[str]
+        # the windows the document is open in
+        self.window_ids = set()  # type: Set[int]
+
+    def inc_version(self):
+        self.version += 1
+        return self.version
+
+
+class DocumentStates(object):
+    """
+    The documents open on each session, by session and path.
+
+    Windows can share a session, and the server only knows a document once:
+    the first window opening it opens it on the server, the last window
+    closing it closes it, and all of them share its version and the text
+    incremental changes are computed against.
+    """
+    def __init__(self) -> None:
+        self._states = {}  # type: Dict[Tuple[Any, str], DocumentState]
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, session: 'Any', path: str) -> 'Optional[DocumentState]':
+        return self._states.get((session, path))
+
+    def is_open(self, session: 'Any', path: str, window_id: int) -> bool:
+        state = self._states.get((session, path))
+        return state is not None and window_id in state.window_ids
+
+    def open(self, session: 'Any', path: str, window_id: int) -> 'Tuple[DocumentState, bool]':
+        """Opens the document in the window, returns its state and whether the server has to be told"""
+        state = self._states.get((session, path))
+        opened = state is None
+        if state is None:
+            state = self._states[(session, path)] = DocumentState(path)
+        state.window_ids.add(window_id)
+        return state, opened
+
+    def close(self, session: 'Any', path: str, window_id: int) -> 'Optional[DocumentState]':
+        """Closes the document in the window, returns its state if the server has to be told"""
+        state = self._states.get((session, path))
+        if state is None or window_id not in state.window_ids:
+            return None
+        state.window_ids.discard(window_id)
+        if state.window_ids:
+            return None
+        del self._states[(session, path)]
+        return state
+
+    def close_window(self, window_id: int) -> 'List[Tuple[Any, DocumentState]]':
+        """Closes every document of the window, returns the sessions and states no other window has open"""
+        closed = []  # type: List[Tuple[Any, DocumentState]]
+        for session, path in list(self._states):
+            state = self.close(session, path, window_id)
+            if state:
+                closed.append((session, state))
+        return closed
+
+    def forget_session(self, session: 'Any') -> 'List[DocumentState]':
+        """Drops the documents of a session, e.g. once it ended"""
+        forgotten = []  # type: List[DocumentState]
+        for key in list(self._states):
+            if key[0] is session:
+                forgotten.append(self._states.pop(key))
+        return forgotten
+
+
+document_states = DocumentStates()
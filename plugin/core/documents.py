@@ -1,35 +1,45 @@
 import sublime
 import sublime_plugin
 
-from collections import OrderedDict
-
 try:
     from typing import Any, List, Dict, Tuple, Callable, Optional
     assert Any and List and Dict and Tuple and Callable and Optional
 except ImportError:
     pass
 
+from .cache import ResponseCache, MISSING
 from .logging import debug
-from .protocol import Notification
+from .protocol import Notification, Request, TextDocumentSyncKindIncremental
+from .rpc import RequestHandle
 from .settings import settings
 from .url import filename_to_uri
-from .configurations import config_for_scope, is_supported_view, is_supported_syntax, is_supportable_syntax
-from .clients import client_for_view, client_for_closed_view, check_window_unloaded
+from .configurations import (
+    config_for_scope, is_supported_view, is_supported_syntax, is_supportable_syntax,
+    clear_view_client_config, clear_window_client_configs
+)
+from .clients import (
+    client_for_view, session_for_closed_view, session_for_view, check_window_unloaded, forget_view_session,
+    forget_sessions, window_configs
+)
+from .diff import text_change
+from .document_states import DocumentState, document_states
 from .events import Events
 from .views import offset_to_point
 
+assert RequestHandle and DocumentState
+
 SUBLIME_WORD_MASK = 515
 
 
-def get_document_position(view: sublime.View, point) -> 'Optional[OrderedDict]':
+def get_document_position(view: sublime.View, point) -> 'Optional[Dict[str, Any]]':
     file_name = view.file_name()
     if file_name:
         if not point:
             point = view.sel()[0].begin()
-        d = OrderedDict()  # type: OrderedDict[str, Any]
-        d['textDocument'] = {"uri": filename_to_uri(file_name)}
-        d['position'] = offset_to_point(view, point).to_lsp()
-        return d
+        return {
+            'textDocument': {"uri": filename_to_uri(file_name)},
+            'position': offset_to_point(view, point).to_lsp()
+        }
     else:
         return None
 
@@ -50,45 +60,56 @@ def is_at_word(view: sublime.View, event) -> bool:
         return False
 
 
-# TODO: this should be per-window ?
-document_states = {}  # type: Dict[int, Dict[str, DocumentState]]
+def get_document_state(session, path: str) -> 'Optional[DocumentState]':
+    return document_states.get(session, path)
 
 
-class DocumentState:
-    """Stores version count for documents open in a language service"""
-    def __init__(self, path: str) -> 'None':
-        self.path = path
-        self.version = 0
-        self.languageId = None
+def has_document_state(window: sublime.Window, session, path: str) -> bool:
+    return document_states.is_open(session, path, window.id())
 
-    def inc_version(self):
-        self.version += 1
-        return self.version
 
-
-def get_document_state(window: sublime.Window, path: str) -> DocumentState:
-    window_document_states = document_states.setdefault(window.id(), {})
-    if path not in window_document_states:
-        window_document_states[path] = DocumentState(path)
-    return window_document_states[path]
+def clear_document_states(window: sublime.Window):
+    """Forgets the documents the window had open, e.g. when its sessions are restarted"""
+    for _, state in document_states.close_window(window.id()):
+        response_cache.invalidate(filename_to_uri(state.path))
 
 
-def has_document_state(window: sublime.Window, path: str):
-    window_id = window.id()
-    if window_id not in document_states:
-        return False
-    return path in document_states[window_id]
+response_cache = ResponseCache()
 
 
-def clear_document_state(window: sublime.Window, path: str):
-    window_id = window.id()
-    if window_id in document_states:
-        del document_states[window_id][path]
+def send_cached_request(client, view: sublime.View, request: Request, position, handler: 'Callable',
+                        error_handler: 'Optional[Callable]' = None) -> 'Optional[RequestHandle]':
+    """
+    Sends a request about a position in the view, unless the server already
+    answered it for this version of the document, in which case the handler
+    gets that response right away. Only the methods given a size in the
+    response_cache_sizes setting are cached. The position is anything that
+    identifies what the request is about, e.g. the region of a word.
+    """
+    max_size = settings.response_cache_sizes.get(request.method)
+    file_name = view.file_name()
+    session = session_for_view(view)
+    if not max_size or not file_name or not session:
+        return client.send_request(request, handler, error_handler)
+
+    # the version must account for the changes not sent yet
+    purge_did_change(view.buffer_id())
+    ds = get_document_state(session, file_name)
+    if not ds:
+        return client.send_request(request, handler, error_handler)
+    uri = filename_to_uri(file_name)
+    version = ds.version
+    server = client.token
+    response = response_cache.get(request.method, server, uri, version, position)
+    if response is not MISSING:
+        handler(response)
+        return None
 
+    def cache_response(response):
+        response_cache.put(request.method, server, uri, version, position, response, max_size)
+        handler(response)
 
-def clear_document_states(window: sublime.Window):
-    if window.id() in document_states:
-        del document_states[window.id()]
+    return client.send_request(request, cache_response, error_handler)
 
 
 pending_buffer_changes = dict()  # type: Dict[int, Dict]
@@ -120,27 +141,43 @@ def purge_did_change(buffer_id: int, buffer_version=None):
 
     if pending_buffer:
         if buffer_version is None or buffer_version == pending_buffer["version"]:
-            notify_did_change(pending_buffer["view"])
+            view = pending_buffer["view"]
+            client = client_for_view(view)
+            if buffer_version is not None and client and client.is_congested():
+                # the server is behind, let more changes pile up in this buffer instead
+                sublime.set_timeout_async(
+                    lambda: purge_did_change(buffer_id, buffer_version), 500)
+                return
+            notify_did_change(view)
+
+
+def uses_incremental_sync(session) -> bool:
+    return session.get_text_document_sync_kind() == TextDocumentSyncKindIncremental
 
 
 def notify_did_open(view: sublime.View):
     config = config_for_scope(view)
-    client = client_for_view(view)
+    session = session_for_view(view)
+    client = session.client if session else None
     if client and config:
         view.settings().set("show_definitions", False)
         window = view.window()
         view_file = view.file_name()
-        if window and view_file:
-            if not has_document_state(window, view_file):
-                ds = get_document_state(window, view_file)
+        if window and view_file and not has_document_state(window, session, view_file):
+            # a window sharing the session may have opened the document on the server already
+            ds, opened = document_states.open(session, view_file, window.id())
+            if settings.show_view_status:
+                view.set_status("code_intel_clients", config.name)
+            if opened:
                 ds.languageId = config.get_language_id(view)
-                if settings.show_view_status:
-                    view.set_status("code_intel_clients", config.name)
+                text = view.substr(sublime.Region(0, view.size()))
+                if uses_incremental_sync(session):
+                    ds.text = text
                 params = {
                     "textDocument": {
                         "uri": filename_to_uri(view_file),
                         "languageId": ds.languageId,
-                        "text": view.substr(sublime.Region(0, view.size())),
+                        "text": text,
                         "version": ds.version
                     }
                 }
@@ -150,24 +187,25 @@ def notify_did_open(view: sublime.View):
 def notify_did_close(view: sublime.View):
     file_name = view.file_name()
     window = sublime.active_window()
-    if window and file_name:
-        if has_document_state(window, file_name):
-            clear_document_state(window, file_name)
-            client = client_for_closed_view(view)
-            if client:
+    session = session_for_closed_view(view)
+    if window and file_name and session:
+        # other windows sharing the session may still have the document open
+        if document_states.close(session, file_name, window.id()):
+            response_cache.invalidate(filename_to_uri(file_name))
+            if session.client:
                 params = {"textDocument": {"uri": filename_to_uri(file_name)}}
-                client.send_notification(Notification.didClose(params))
+                session.client.send_notification(Notification.didClose(params))
 
 
 def notify_did_save(view: sublime.View):
     file_name = view.file_name()
     window = view.window()
-    if window and file_name:
-        if has_document_state(window, file_name):
-            client = client_for_view(view)
-            if client:
+    session = session_for_view(view)
+    if window and file_name and session:
+        if has_document_state(window, session, file_name):
+            if session.client:
                 params = {"textDocument": {"uri": filename_to_uri(file_name)}}
-                client.send_notification(Notification.didSave(params))
+                session.client.send_notification(Notification.didSave(params))
         else:
             debug('document not tracked', file_name)
 
@@ -179,32 +217,44 @@ def notify_did_change(view: sublime.View):
         if view.buffer_id() in pending_buffer_changes:
             del pending_buffer_changes[view.buffer_id()]
         config = config_for_scope(view)
-        client = client_for_view(view)
+        session = session_for_view(view)
+        client = session.client if session else None
         if client and config:
             uri = filename_to_uri(file_name)
             languageId = config.get_language_id(view)
-            ds = get_document_state(window, file_name)
+            ds = get_document_state(session, file_name)
+            if not ds:
+                debug('document not tracked', file_name)
+                return
+            text = view.substr(sublime.Region(0, view.size()))
+            incremental = uses_incremental_sync(session)
             if ds.languageId == languageId:
+                if incremental and ds.text is not None:
+                    change = text_change(ds.text, text)
+                    if not change:
+                        return
+                else:
+                    change = {"text": text}
+                ds.text = text if incremental else None
                 params = {
                     "textDocument": {
                         "uri": uri,
                         "version": ds.inc_version(),
                     },
-                    "contentChanges": [{
-                        "text": view.substr(sublime.Region(0, view.size()))
-                    }]
+                    "contentChanges": [change]
                 }
                 client.send_notification(Notification.didChange(params))
             else:
                 # The languageId has changed, reopen file
                 ds.languageId = languageId
+                ds.text = text if incremental else None
                 params = {"textDocument": {"uri": uri}}
                 client.send_notification(Notification.didClose(params))
                 params = {
                     "textDocument": {
                         "uri": uri,
                         "languageId": ds.languageId,
-                        "text": view.substr(sublime.Region(0, view.size())),
+                        "text": text,
                         "version": ds.inc_version(),
                     }
                 }
@@ -218,11 +268,26 @@ class CloseListener(sublime_plugin.EventListener):
     def on_close(self, view):
         if is_supported_syntax(view.settings().get("syntax")):
             Events.publish("view.on_close", view)
+        clear_view_client_config(view)
+        forget_view_session(view)
         sublime.set_timeout_async(check_window_unloaded, 500)
 
 
+class WindowActivationListener(sublime_plugin.EventListener):
+    def on_activated_async(self, view):
+        window = view.window()
+        if window:
+            Events.publish("window.on_activated_async", window)
+
+
 class SaveListener(sublime_plugin.EventListener):
     def on_post_save_async(self, view):
+        file_name = view.file_name()
+        window = view.window()
+        if window and file_name and file_name == window.project_file_name():
+            # client overrides in the project settings may have changed
+            clear_window_client_configs(window)
+            forget_sessions(list(window_configs(window).values()))
         if is_supported_view(view):
             Events.publish("view.on_post_save_async", view)
 
@@ -0,0 +1,274 @@
+"""
+An alternative engine for the transports: one asyncio event loop, on its
+own thread, multiplexes the pipes and sockets of every server instead of
+each transport running its own reader and writer threads.
+"""
+import os
+import threading
+from abc import abstractmethod
+from .logging import debug, exception_log
+from .transports import Transport, OutboundQueue, FrameDecoder
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None  # type: ignore
+
+try:
+    from typing import Any, Callable, List, Optional
+    assert Any and Callable and List and Optional
+except ImportError:
+    pass
+
+
+def is_available() -> bool:
+    """
+    The engine needs asyncio (not in Python 3.3) and an event loop that can
+    watch subprocess pipes, which the Windows event loops can't do for Popen.
+    """
+    return asyncio is not None and hasattr(asyncio, 'ensure_future') and os.name != 'nt'
+
+
+class EventLoopThread(object):
+    """Runs an asyncio event loop on a daemon thread"""
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        debug("event loop thread ended.")
+
+    def call_soon(self, callback: 'Callable', *args) -> None:
+        """Schedules a callback on the loop, from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_event_loop = None  # type: Optional[EventLoopThread]
+_event_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> EventLoopThread:
+    """The loop shared by all transports of this engine, started on first use"""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = EventLoopThread()
+        return _event_loop
+
+
+class StreamProtocol(asyncio.Protocol if asyncio else object):  # type: ignore
+    """Forwards the events of a pipe or socket to callbacks, on the loop thread"""
+    def __init__(self, on_data: 'Optional[Callable[[bytes], None]]' = None,
+                 on_lost: 'Optional[Callable[[Optional[Exception]], None]]' = None,
+                 on_pause: 'Optional[Callable[[], None]]' = None,
+                 on_resume: 'Optional[Callable[[], None]]' = None) -> None:
+        self._on_data = on_data
+        self._on_lost = on_lost
+        self._on_pause = on_pause
+        self._on_resume = on_resume
+
+    def data_received(self, data):
+        if self._on_data:
+            self._on_data(data)
+
+    def connection_lost(self, exc):
+        if self._on_lost:
+            self._on_lost(exc)
+
+    def pause_writing(self):
+        if self._on_pause:
+            self._on_pause()
+
+    def resume_writing(self):
+        if self._on_resume:
+            self._on_resume()
+
+
+class LineLogger(object):
+    """Splits the output of a stream into lines for the server log"""
+    def __init__(self, server_log: 'Optional[Callable[[str], None]]') -> None:
+        self.server_log = server_log
+        self._pending = b""
+
+    def feed(self, data: bytes) -> None:
+        if not self.server_log:
+            return
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        for line in lines:
+            content = line.strip()
+            try:
+                decoded = content.decode("UTF-8")
+            except UnicodeDecodeError:
+                decoded = str(content)
+            self.server_log(decoded)
+
+
+def attach_logger(stream, server_log: 'Optional[Callable[[str], None]]' = None) -> None:
+    """
+    Drains an output stream of a server process on the event loop, so the
+    server never blocks on a full pipe, logging its lines if asked to.
+    """
+    event_loop = get_event_loop()
+    logger = LineLogger(server_log)
+
+    def connect():
+        protocol = StreamProtocol(logger.feed)
+        task = asyncio.ensure_future(event_loop.loop.connect_read_pipe(lambda: protocol, stream),
+                                     loop=event_loop.loop)
+        task.add_done_callback(check_connected)
+
+    def check_connected(task):
+        if task.exception():
+            exception_log("Failure reading stream", task.exception())
+
+    event_loop.call_soon(connect)
+
+
+class AsyncioTransport(Transport):
+    """
+    Sends and receives on the shared event loop.
+
+    Frames are queued like in the thread transports, so superseding and
+    pushing back on senders work the same, and are written in one batch
+    per loop iteration. While the asyncio write buffer is over its limit,
+    frames stay in the queue.
+    """
+    def __init__(self) -> None:
+        self.running = None  # type: Optional[bool]
+        self.queue = OutboundQueue()
+        self._lock = threading.Lock()
+        self._event_loop = get_event_loop()
+        self._streams = []  # type: List[Any]
+        self._writer = None  # type: Any
+        self._paused = False
+        self._flush_scheduled = False
+
+    def start(self, on_receive, on_closed):
+        self.running = True
+        self.on_receive = on_receive
+        self.on_closed = on_closed
+        self._decoder = FrameDecoder()
+        self._event_loop.call_soon(self.connect)
+
+    @abstractmethod
+    def connect(self) -> None:
+        """Opens the streams, on the loop thread"""
+        pass
+
+    def open_stream(self, connecting, on_opened: 'Optional[Callable[[Any], None]]' = None) -> None:
+        def opened(task):
+            if task.exception():
+                if self.running:
+                    exception_log("Failure connecting", task.exception())
+                    self.close()
+                return
+            stream, _ = task.result()
+            self._streams.append(stream)
+            if not self.running:
+                stream.close()
+            elif on_opened:
+                on_opened(stream)
+
+        asyncio.ensure_future(connecting, loop=self._event_loop.loop).add_done_callback(opened)
+
+    def set_writer(self, stream) -> None:
+        self._writer = stream
+        self.flush()
+
+    def data_received(self, data: bytes) -> None:
+        self._decoder.feed(data)
+        for content in self._decoder.messages():
+            self.on_receive(content)
+
+    def connection_lost(self, exc: 'Optional[Exception]') -> None:
+        if self.running:
+            if exc:
+                exception_log("Connection to server lost", exc)
+            else:
+                debug("connection to server closed")
+            self.close()
+
+    def pause_writing(self) -> None:
+        self._paused = True
+
+    def resume_writing(self) -> None:
+        self._paused = False
+        self.flush()
+
+    def send(self, message, uri=None, supersedable=False) -> bool:
+        if not self.queue.put(message, uri, supersedable, timeout=0):
+            return False
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._event_loop.call_soon(self.flush)
+        return True
+
+    def is_congested(self) -> bool:
+        return self.queue.congested
+
+    def flush(self) -> None:
+        self._flush_scheduled = False
+        if self._writer is None or self._paused:
+            return
+        frames, _ = self.queue.take_all(block=False)
+        if frames:
+            self._writer.write(b"".join(frames))
+        if len(self.queue) and not self._flush_scheduled:
+            # a batch at a time, letting the loop serve the other servers in between
+            self._flush_scheduled = True
+            self._event_loop.call_soon(self.flush)
+
+    def end(self):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            was_running = self.running
+            self.running = False
+        self.queue.close()
+        if was_running:
+            self._event_loop.call_soon(self.close_streams)
+            self.on_closed()
+
+    def close_streams(self) -> None:
+        # the last frames (e.g. the exit notification) are written before closing
+        while self._writer is not None and len(self.queue):
+            frames, _ = self.queue.take_all(block=False)
+            self._writer.write(b"".join(frames))
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+        self._writer = None
+        debug("transport streams closed.")
+
+
+class AsyncioStdioTransport(AsyncioTransport):
+    def __init__(self, process) -> None:
+        super().__init__()
+        self.process = process
+
+    def connect(self) -> None:
+        loop = self._event_loop.loop
+        reader = StreamProtocol(self.data_received, self.connection_lost)
+        writer = StreamProtocol(None, self.connection_lost, self.pause_writing, self.resume_writing)
+        self.open_stream(loop.connect_read_pipe(lambda: reader, self.process.stdout))
+        self.open_stream(loop.connect_write_pipe(lambda: writer, self.process.stdin), self.set_writer)
+
+
+class AsyncioTCPTransport(AsyncioTransport):
+    def __init__(self, socket) -> None:
+        super().__init__()
+        self.socket = socket
+
+    def connect(self) -> None:
+        loop = self._event_loop.loop
+        protocol = StreamProtocol(self.data_received, self.connection_lost, self.pause_writing, self.resume_writing)
+        self.open_stream(loop.create_connection(lambda: protocol, sock=self.socket), self.set_writer)
@@ -0,0 +1,109 @@
+"""
+Fuzzy matching of what was typed against completion items, to rank them
+before Sublime gets to see them.
+"""
+try:
+    from typing import Iterable, List, Optional, Tuple
+    assert Iterable and List and Optional and Tuple
+except ImportError:
+    pass
+
+MATCH_SCORE = 1
+CONSECUTIVE_SCORE = 4
+WORD_START_SCORE = 8
+# most characters skipped before the first match that are penalized
+MAX_LEADING_PENALTY = 3
+
+
+def word_starts(text: str) -> int:
+    """
+    A bit mask of the positions where words start in the text: its first
+    character, characters after a separator, camelCase humps (including
+    the last capital of an acronym, as in HTTPServer) and numbers.
+    """
+    mask = 0
+    previous = ''
+    for position, char in enumerate(text):
+        if char.isalnum() and (
+                not previous.isalnum() or
+                char.isupper() and (not previous.isupper() or text[position + 1:position + 2].islower()) or
+                char.isdigit() != previous.isdigit()):
+            mask |= 1 << position
+        previous = char
+    return mask
+
+
+def match_score(query: str, text: str, starts: int, prefer_word_starts: bool = True) -> 'Optional[int]':
+    """
+    Scores the characters of the lowercase query found in order in the
+    lowercase text, or returns None if they aren't all there. A character
+    that doesn't continue the previous match is looked for at a word start
+    first, so "gti" matches "get_time" as g, t, i and not g, t(get), i.
+    """
+    score = 0
+    position = 0
+    previous = -2
+    first = -1
+    for char in query:
+        found = text.find(char, position)
+        if found < 0:
+            return None
+        if prefer_word_starts and found != previous + 1 and not starts >> found & 1:
+            start = text.find(char, found + 1)
+            while start >= 0 and not starts >> start & 1:
+                start = text.find(char, start + 1)
+            if start >= 0:
+                found = start
+        score += MATCH_SCORE
+        if found == previous + 1:
+            score += CONSECUTIVE_SCORE
+        if starts >> found & 1:
+            score += WORD_START_SCORE
+        if first < 0:
+            first = found
+        previous = found
+        position = found + 1
+    if first < 0:
+        return score
+    return score - min(first, MAX_LEADING_PENALTY)
+
+
+class FuzzyMatcher(object):
+    """
+    Matches queries against a fixed list of texts. Their lowercase forms are
+    computed up front, and their word starts the first time they're needed,
+    since most texts of a long list never get past the first characters.
+    """
+    def __init__(self, texts: 'List[str]') -> None:
+        self._texts = texts
+        self._lowered = list(text.lower() for text in texts)
+        self._starts = [None] * len(texts)  # type: List[Optional[int]]
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def score(self, query: str, index: int) -> 'Optional[int]':
+        """The score of the text at index for the lowercase query, None if it doesn't match"""
+        text = self._lowered[index]
+        if not query:
+            return 0
+        if text.find(query[0]) < 0:
+            return None
+        starts = self._starts[index]
+        if starts is None:
+            starts = self._starts[index] = word_starts(self._texts[index])
+        score = match_score(query, text, starts)
+        if score is None:
+            # looking ahead for word starts can skip what later characters needed
+            score = match_score(query, text, starts, False)
+        return score
+
+    def scores(self, query: str, candidates: 'Iterable[int]') -> 'List[Tuple[int, int]]':
+        """The scores and indexes of the candidates matching the query, in the order of the candidates"""
+        query = query.lower()
+        scored = []  # type: List[Tuple[int, int]]
+        for index in candidates:
+            score = self.score(query, index)
+            if score is not None:
+                scored.append((score, index))
+        return scored
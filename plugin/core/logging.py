@@ -8,6 +8,10 @@ def set_debug_logging(logging_enabled):
     log_debug = logging_enabled
 
 
+def debug_enabled() -> bool:
+    return log_debug
+
+
 def debug(*args):
     """Print args to the console if the "debug" setting is True."""
     if log_debug:
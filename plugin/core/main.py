@@ -13,17 +13,18 @@ from .protocol import Notification
 from .settings import (
     ClientConfig, settings, load_settings, unload_settings
 )
+from .types import ClientStates
 from .handlers import LanguageHandler
 from .logging import debug, server_log, set_debug_logging
 from .rpc import attach_tcp_client, attach_stdio_client
 from .workspace import get_project_path
 from .configurations import (
-    config_for_scope, is_supported_view, register_client_config
+    config_for_scope, config_for_name, is_supported_view, register_client_config
 )
 from .clients import (
     start_window_config,
     can_start_config,
-    window_configs, is_ready_window_config,
+    window_configs, is_ready_window_config, windows_for_session,
     unload_old_clients, unload_window_sessions, unload_all_clients, register_clients_unloaded_handler
 )
 from .events import Events
@@ -41,9 +42,13 @@ def startup():
     load_handlers()
     Events.subscribe("view.on_load_async", initialize_on_open)
     Events.subscribe("view.on_activated_async", initialize_on_open)
+    Events.subscribe("window.on_activated_async", warm_start_window)
+    Events.subscribe("window.on_close", forget_warm_project)
     register_clients_unloaded_handler(handle_clients_unloaded)
     if settings.show_status_messages:
         sublime.status_message("💡 SublimeCodeIntel initialized")
+    for window in sublime.windows():
+        warm_start_window(window)
     start_active_views()
 
 
@@ -75,10 +80,6 @@ def start_active_views():
                     open_after_initialize_by_window.setdefault(window_id, []).append(view)
 
 
-TextDocumentSyncKindNone = 0
-TextDocumentSyncKindFull = 1
-TextDocumentSyncKindIncremental = 2
-
 open_after_initialize_by_window = dict()  # type: Dict[int, List[sublime.View]]
 unsubscribe_initialize_on_load = None
 unsubscribe_initialize_on_activated = None
@@ -107,6 +108,36 @@ def initialize_on_open(view: sublime.View):
             debug(config.name, 'is not enabled')
 
 
+warm_project_by_window = dict()  # type: Dict[int, str]
+
+
+def warm_start_window(window: sublime.Window):
+    """
+    Starts the clients in the warm_start_clients setting for the window's
+    project, so they are initialized by the time a file needs them.
+    """
+    if not settings.warm_start_clients:
+        return
+
+    project_path = get_project_path(window)
+    if project_path is None or warm_project_by_window.get(window.id()) == project_path:
+        return
+    warm_project_by_window[window.id()] = project_path
+
+    if window_configs(window):
+        unload_old_clients(window)
+
+    for config_name in settings.warm_start_clients:
+        config = config_for_name(window, config_name)
+        if config and config.enabled:
+            debug("warm start", config_name, "in", project_path)
+            start_window_client(None, window, config)
+
+
+def forget_warm_project(window_id: int):
+    warm_project_by_window.pop(window_id, None)
+
+
 client_start_listeners = {}  # type: Dict[str, Callable]
 client_initialization_listeners = {}  # type: Dict[str, Callable]
 
@@ -125,15 +156,26 @@ def register_language_handler(handler: LanguageHandler) -> None:
         client_initialization_listeners[handler.name] = handler.on_initialized
 
 
+def session_window(session, window: sublime.Window) -> sublime.Window:
+    """The window to show things in for a session, which other windows may share"""
+    windows = windows_for_session(session)
+    return window if window in windows or not windows else windows[0]
+
+
+def handle_session_diagnostics(session, window: sublime.Window, config_name: str, params: dict):
+    for session_window in windows_for_session(session) or [window]:
+        handle_client_diagnostics(session_window, config_name, params)
+
+
 def handle_session_started(session, window, project_path, config):
     client = session.client
-    client.set_crash_handler(lambda: handle_server_crash(window, config))
+    client.set_crash_handler(lambda: handle_server_crash(session, window, config))
     client.set_error_display_handler(lambda msg: sublime.status_message(msg))
 
     # handle server requests and notifications
     client.on_request(
         "workspace/applyEdit",
-        lambda params: apply_workspace_edit(window, params))
+        lambda params: apply_workspace_edit(session_window(session, window), params))
 
     client.on_request(
         "window/showMessageRequest",
@@ -141,7 +183,7 @@ def handle_session_started(session, window, project_path, config):
 
     client.on_notification(
         "textDocument/publishDiagnostics",
-        lambda params: handle_client_diagnostics(window, config.name, params))
+        lambda params: handle_session_diagnostics(session, window, config.name, params))
 
     client.on_notification(
         "window/showMessage",
@@ -171,6 +213,8 @@ def handle_session_started(session, window, project_path, config):
         }
         client.send_notification(Notification.didChangeConfiguration(configParams))
 
+
+def handle_window_ready(session, window, config):
     for view in open_after_initialize_by_window.pop(window.id(), []):
         notify_did_open(view)
 
@@ -223,7 +267,7 @@ def start_client(window: sublime.Window, project_path: str, config: ClientConfig
     return client
 
 
-def start_window_client(view: sublime.View, window: sublime.Window, config: ClientConfig):
+def start_window_client(view: 'Optional[sublime.View]', window: sublime.Window, config: ClientConfig):
     project_path = get_project_path(window)
     if project_path is None:
         debug('Cannot start without a project folder')
@@ -239,15 +283,20 @@ def start_window_client(view: sublime.View, window: sublime.Window, config: Clie
             window.status_message("Starting " + config.name + "...")
         debug("starting in", project_path)
         start_window_config(window, project_path, config,
-                            lambda session: handle_session_started(session, window, project_path, config))
+                            lambda session: handle_session_started(session, window, project_path, config),
+                            lambda session: handle_window_ready(session, window, config))
     else:
         debug('Already starting on this window:', config.name)
 
 
-def handle_server_crash(window: sublime.Window, config: ClientConfig):
+def handle_server_crash(session, window: sublime.Window, config: ClientConfig):
     msg = "Language server {} has crashed, do you want to restart it?".format(config.name)
     if sublime.ok_cancel_dialog(msg, ok_title="Restart"):
-        restart_window_clients(window)
+        windows = windows_for_session(session) or [window]
+        # so the restarted windows don't share the crashed session again
+        session.state = ClientStates.STOPPING
+        for session_window in windows:
+            restart_window_clients(session_window)
 
 
 restarting_window_ids = set()  # type: Set[int]
@@ -35,6 +35,17 @@ class CodeIntelClearPanelCommand(sublime_plugin.TextCommand):
         self.view.erase(edit, sublime.Region(0, self.view.size()))
 
 
+class CodeIntelPatchPanelCommand(sublime_plugin.TextCommand):
+    """
+    A patch_panel command to replace parts of the panel's text, given as
+    [begin, end, characters] patches ordered from the end of the panel.
+    """
+
+    def run(self, edit, patches):
+        for begin, end, characters in patches:
+            self.view.replace(edit, sublime.Region(begin, end), characters)
+
+
 class CodeIntelUpdatePanelCommand(sublime_plugin.TextCommand):
     """
     A update_panel command to update the error panel with new text.
@@ -1,3 +1,12 @@
+import hashlib
+from .cache import LRUCache
+
+try:
+    from typing import Callable, Hashable
+    assert Callable and Hashable
+except ImportError:
+    pass
+
 popup_class = "code_intel_popup"
 
 popup_css = '''
@@ -32,3 +41,21 @@ popup_css = '''
     }
 
 '''
+
+# rendered popup and phantom HTML, shared by all views
+RENDERED_HTML_CACHE_SIZE = 200
+rendered_html = LRUCache(RENDERED_HTML_CACHE_SIZE)
+
+
+def render_cached(render: 'Callable[[str], str]', content: str, variant: 'Hashable' = None) -> str:
+    """
+    The HTML of the content (e.g. markdown), rendered only the first time.
+    The variant tells apart renderings of the same content, like the kind of
+    popup or the color scheme code blocks are highlighted with.
+    """
+    key = (variant, hashlib.sha1(content.encode("UTF-8")).digest())
+    html = rendered_html.get(key)
+    if html is None:
+        html = render(content)
+        rendered_html.put(key, html)
+    return html
@@ -4,8 +4,6 @@ try:
 except ImportError:
     pass
 
-from collections import OrderedDict
-
 
 class DiagnosticSeverity(object):
     Error = 1
@@ -63,6 +61,24 @@ class CompletionItemKind(object):
     TypeParameter = 25
 
 
+class ErrorCode(object):
+    ParseError = -32700
+    InvalidRequest = -32600
+    MethodNotFound = -32601
+    InvalidParams = -32602
+    InternalError = -32603
+    ServerNotInitialized = -32002
+    UnknownErrorCode = -32001
+    RequestCancelled = -32800
+    # never sent by servers, reported for requests that got no response in time
+    RequestTimedOut = -32900
+
+
+TextDocumentSyncKindNone = 0
+TextDocumentSyncKindFull = 1
+TextDocumentSyncKindIncremental = 2
+
+
 class DocumentHighlightKind(object):
     Unknown = 0
     Text = 1
@@ -140,15 +156,12 @@ class Request:
         return self.method + " " + str(self.params)
 
     def to_payload(self, id):
-        r = OrderedDict()  # type: OrderedDict[str, Any]
-        r["jsonrpc"] = "2.0"
-        r["id"] = id
-        r["method"] = self.method
-        if self.params is not None:
-            r["params"] = self.params
-        else:
-            r["params"] = dict()
-        return r
+        return {
+            "jsonrpc": "2.0",
+            "id": id,
+            "method": self.method,
+            "params": self.params if self.params is not None else dict()
+        }
 
 
 class Notification:
@@ -181,6 +194,10 @@ class Notification:
     def didChangeConfiguration(cls, params: dict):
         return Notification("workspace/didChangeConfiguration", params)
 
+    @classmethod
+    def cancelRequest(cls, params: dict):
+        return Notification("$/cancelRequest", params)
+
     @classmethod
     def exit(cls):
         return Notification("exit", None)
@@ -189,17 +206,16 @@ class Notification:
         return self.method + " " + str(self.params)
 
     def to_payload(self):
-        r = OrderedDict()  # type: OrderedDict[str, Any]
-        r["jsonrpc"] = "2.0"
-        r["method"] = self.method
-        if self.params is not None:
-            r["params"] = self.params
-        else:
-            r["params"] = dict()
-        return r
+        return {
+            "jsonrpc": "2.0",
+            "method": self.method,
+            "params": self.params if self.params is not None else dict()
+        }
 
 
 class Point(object):
+    __slots__ = ('row', 'col')
+
     def __init__(self, row: int, col: int) -> None:
         self.row = int(row)
         self.col = int(col)
@@ -212,13 +228,12 @@ class Point(object):
         return Point(point['line'], point['character'])
 
     def to_lsp(self) -> dict:
-        r = OrderedDict()  # type: OrderedDict[str, Any]
-        r['line'] = self.row
-        r['character'] = self.col
-        return r
+        return {'line': self.row, 'character': self.col}
 
 
 class Range(object):
+    __slots__ = ('start', 'end')
+
     def __init__(self, start: Point, end: Point) -> None:
         self.start = start
         self.end = end
@@ -231,31 +246,60 @@ class Range(object):
         return Range(Point.from_lsp(range['start']), Point.from_lsp(range['end']))
 
     def to_lsp(self) -> dict:
-        r = OrderedDict()  # type: OrderedDict[str, Any]
-        r['start'] = self.start.to_lsp()
-        r['end'] = self.end.to_lsp()
-        return r
+        return {'start': self.start.to_lsp(), 'end': self.end.to_lsp()}
+
+
+# fields of LSP diagnostics that Diagnostic keeps as attributes
+DIAGNOSTIC_PARSED_FIELDS = frozenset(('message', 'range', 'severity', 'source'))
+DIAGNOSTIC_SEVERITIES = (DiagnosticSeverity.Error, DiagnosticSeverity.Warning, DiagnosticSeverity.Information,
+                         DiagnosticSeverity.Hint)
 
 
 class Diagnostic(object):
-    def __init__(self, message, range, severity, source, lsp_diagnostic):
+    """
+    Projects can have a lot of diagnostics, so only the parsed fields are
+    kept, plus any other fields of the LSP diagnostic (e.g. code) that
+    to_lsp() needs to send it back to the server.
+    """
+    __slots__ = ('message', 'range', 'severity', 'source', '_lsp_fields', '_has_severity')
+
+    def __init__(self, message, range, severity, source, lsp_fields=None, has_severity=True):
         self.message = message
         self.range = range
         self.severity = severity
         self.source = source
-        self._lsp_diagnostic = lsp_diagnostic
+        self._lsp_fields = lsp_fields
+        self._has_severity = has_severity
 
     @classmethod
     def from_lsp(cls, lsp_diagnostic):
+        lsp_fields = dict((key, value) for key, value in lsp_diagnostic.items()
+                          if key not in DIAGNOSTIC_PARSED_FIELDS)
+        severity = lsp_diagnostic.get('severity')
+        has_severity = 'severity' in lsp_diagnostic
+        if severity not in DIAGNOSTIC_SEVERITIES:
+            # missing, null or unknown severities are shown as errors, and sent back as they came
+            if has_severity:
+                lsp_fields['severity'] = severity
+                has_severity = False
+            severity = DiagnosticSeverity.Error
         return Diagnostic(
             # crucial keys
             lsp_diagnostic['message'],
             Range.from_lsp(lsp_diagnostic['range']),
             # optional keys
-            lsp_diagnostic.get('severity', DiagnosticSeverity.Error),
+            severity,
             lsp_diagnostic.get('source'),
-            lsp_diagnostic
+            lsp_fields or None,
+            has_severity
         )
 
     def to_lsp(self):
-        return self._lsp_diagnostic
+        lsp_diagnostic = {'message': self.message, 'range': self.range.to_lsp()}
+        if self._has_severity:
+            lsp_diagnostic['severity'] = self.severity
+        if self.source is not None:
+            lsp_diagnostic['source'] = self.source
+        if self._lsp_fields:
+            lsp_diagnostic.update(self._lsp_fields)
+        return lsp_diagnostic
@@ -0,0 +1,86 @@
+from .protocol import Diagnostic
+
+try:
+    from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+    assert Any and Callable and Dict and Hashable and Iterable and List and Tuple
+except ImportError:
+    pass
+
+
+def diagnostic_key(diagnostic: Diagnostic) -> 'Tuple[int, int, int, int, str]':
+    """What a diagnostic's phantom shows and where, diagnostics with the same key share a phantom"""
+    start, end = diagnostic.range.start, diagnostic.range.end
+    return start.row, start.col, end.row, end.col, diagnostic.message
+
+
+def reuse_rendered(items: 'Iterable[Any]', rendered: 'Dict[Hashable, Any]', key: 'Callable[[Any], Hashable]',
+                   render: 'Callable[[Any], Any]') -> 'Dict[Hashable, Any]':
+    """
+    Renders the items by key, reusing what was rendered before for the same
+    key, so what didn't change keeps its identity and isn't redrawn.
+    """
+    renderings = {}  # type: Dict[Hashable, Any]
+    for item in items:
+        item_key = key(item)
+        if item_key not in renderings:
+            previous = rendered.get(item_key)
+            renderings[item_key] = previous if previous is not None else render(item)
+    return renderings
+
+
+class PanelBlocks(object):
+    """
+    The text of a panel as one block per file, in order, so updating the
+    blocks of some files gives the patches that bring the panel up to date
+    instead of its whole text.
+    """
+    def __init__(self) -> None:
+        self.keys = []  # type: List[str]
+        self.blocks = {}  # type: Dict[str, str]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.blocks[key] for key in self.keys)
+
+    def reset(self, blocks: 'List[Tuple[str, str]]') -> str:
+        """Replaces all blocks, returns the new text"""
+        self.keys = list(key for key, _ in blocks)
+        self.blocks = dict(blocks)
+        return self.text
+
+    def update(self, changed: 'Dict[str, str]') -> 'List[Tuple[int, int, str]]':
+        """
+        Replaces the blocks of the changed keys, an empty block removes its
+        key and blocks of new keys go at the end. Returns [begin, end, text]
+        patches ordered from the end of the text, so that applying them in
+        order keeps the offsets of the ones left valid.
+        """
+        offsets = {}  # type: Dict[str, int]
+        offset = 0
+        for key in self.keys:
+            offsets[key] = offset
+            offset += len(self.blocks[key])
+
+        patches = []  # type: List[Tuple[int, int, str]]
+        appended = []  # type: List[str]
+        for key, block in changed.items():
+            if key in self.blocks:
+                begin = offsets[key]
+                if block != self.blocks[key]:
+                    patches.append((begin, begin + len(self.blocks[key]), block))
+                if block:
+                    self.blocks[key] = block
+                else:
+                    del self.blocks[key]
+                    self.keys.remove(key)
+            elif block:
+                appended.append(block)
+                self.blocks[key] = block
+                self.keys.append(key)
+        if appended:
+            patches.append((offset, offset, "".join(appended)))
+        patches.sort(key=lambda patch: patch[0], reverse=True)
+        return patches
@@ -1,7 +1,20 @@
+from collections import deque
+import itertools
 import json
+import math
 import socket
+import threading
 import time
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None  # type: ignore
+try:
+    import ujson  # type: ignore
+except ImportError:
+    ujson = None  # type: ignore
 from .transports import TCPTransport, StdioTransport
+from .dispatch import PayloadDispatcher
 from .process import attach_logger
 from .logging import server_log
 
@@ -12,11 +25,15 @@ except ImportError:
     pass
 
 from .logging import debug, exception_log
-from .protocol import Request, Notification
+from .protocol import Request, Notification, ErrorCode
 from .types import Settings
 
 
 TCP_CONNECT_TIMEOUT = 5
+# how often messages that didn't fit in the transport's queue are retried, in milliseconds
+DEFERRED_SEND_DELAY = 100
+# tells clients apart for their whole lifetime, unlike id() which is reused once one is collected
+client_tokens = itertools.count(1)
 
 
 def ordereddict_to_dict(value: 'Dict[str, Any]'):
@@ -27,12 +44,79 @@ def ordereddict_to_dict(value: 'Dict[str, Any]'):
     return value
 
 
-def format_request(payload: 'Dict[str, Any]'):
+class JsonCodec(object):
+    """Converts payloads to and from UTF-8 encoded JSON using the standard library"""
+    name = "json"
+
+    def encode(self, payload: 'Any') -> bytes:
+        # the Content-Length is counted in bytes, so non-ASCII text need not be escaped
+        return json.dumps(payload, ensure_ascii=False, sort_keys=False).encode("UTF-8")
+
+    def decode(self, message) -> 'Any':
+        if not isinstance(message, str):
+            message = message.decode("UTF-8")
+        return json.loads(message)
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def encode(self, payload: 'Any') -> bytes:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            # e.g. integers outside of the 64 bit range
+            return super().encode(payload)
+
+    def decode(self, message) -> 'Any':
+        return orjson.loads(message)
+
+
+class UjsonCodec(JsonCodec):
+    name = "ujson"
+
+    def encode(self, payload: 'Any') -> bytes:
+        return ujson.dumps(payload, ensure_ascii=False).encode("UTF-8")
+
+    def decode(self, message) -> 'Any':
+        if isinstance(message, bytearray):
+            message = bytes(message)
+        return ujson.loads(message)
+
+
+def load_codec() -> JsonCodec:
+    """Returns the fastest codec that can be imported"""
+    if orjson:
+        return OrjsonCodec()
+    elif ujson:
+        return UjsonCodec()
+    return JsonCodec()
+
+
+default_codec = load_codec()
+
+
+def format_request(payload: 'Dict[str, Any]', codec: JsonCodec = default_codec) -> bytes:
     """Converts the request into json and adds the Content-Length header"""
-    content = json.dumps(payload, sort_keys=False)
-    content_length = len(content)
-    result = "Content-Length: {}\r\n\r\n{}".format(content_length, content)
-    return result
+    content = codec.encode(payload)
+    header = "Content-Length: {}\r\n\r\n".format(len(content)).encode("ASCII")
+    return b"".join((header, content))
+
+
+def document_uri(params: 'Optional[Dict[str, Any]]') -> 'Optional[str]':
+    if isinstance(params, dict):
+        text_document = params.get("textDocument")
+        if isinstance(text_document, dict):
+            return text_document.get("uri")
+    return None
+
+
+def is_full_text_change(notification: Notification) -> bool:
+    """A full-text didChange makes any unsent earlier change of the document obsolete"""
+    if notification.method != "textDocument/didChange" or not notification.params:
+        return False
+    changes = notification.params.get("contentChanges", [])
+    return bool(changes) and all("range" not in change for change in changes)
 
 
 def attach_tcp_client(tcp_port, process, settings: Settings):
@@ -76,13 +160,59 @@ def try_terminate_process(process):
         pass  # process can be terminated already
 
 
+def schedule_timer(function: 'Callable[[], None]', delay: int) -> None:
+    """Calls the function on a timer thread after delay milliseconds"""
+    timer = threading.Timer(delay / 1000, function)
+    timer.daemon = True
+    timer.start()
+
+
+class RequestHandle(object):
+    """Returned by Client.send_request, allows the request to be cancelled"""
+    def __init__(self, client: 'Client', request_id: int, method: str) -> None:
+        self.client = client
+        self.request_id = request_id
+        self.method = method
+
+    def cancel(self) -> None:
+        self.client.cancel_request(self.request_id)
+
+    def __repr__(self):
+        return "{} ({})".format(self.method, self.request_id)
+
+
+class PendingRequest(object):
+    """A request sent to the server that has not been answered yet"""
+    def __init__(self, method: str, handler: 'Optional[Callable]', error_handler: 'Optional[Callable]',
+                 deadline: 'Optional[float]') -> None:
+        self.method = method
+        self.handler = handler
+        self.error_handler = error_handler
+        self.deadline = deadline
+
+
 class Client(object):
-    def __init__(self, transport, settings):
+    def __init__(self, transport, settings, executor: 'Optional[Callable]' = None,
+                 schedule: 'Callable[[Callable[[], None], int], None]' = schedule_timer):
+        """
+        Without an executor, messages are decoded and handled on the transport's reader thread.
+        With one, they are decoded on a dispatcher thread and handled through the executor.
+        Requests that time out are expired by a timer set with schedule, and reported the same way.
+        """
         self.transport = transport
-        self.transport.start(self.receive_payload, self.on_transport_closed)
+        self.token = next(client_tokens)
+        self._executor = executor
+        self._schedule = schedule
+        self._expiry_lock = threading.Lock()
+        self._expiry_deadline = None  # type: Optional[float]
+        # messages the transport had no room for, sent in order once it has
+        self._deferred = deque()  # type: deque
+        self._deferred_lock = threading.Lock()
+        self.codec = default_codec
+        self.dispatcher = None  # type: Optional[PayloadDispatcher]
         self.request_id = 0
-        self._response_handlers = {}  # type: Dict[int, List[Callable]]
-        self._error_handlers = {}  # type: Dict[int, List[Callable]]
+        self._pending_requests = {}  # type: Dict[int, PendingRequest]
+        self.expired_request_count = 0
         self._request_handlers = {}  # type: Dict[str, List[Callable]]
         self._notification_handlers = {}  # type: Dict[str, List[Callable]]
         self.exiting = False
@@ -90,28 +220,106 @@ class Client(object):
         self._transport_fail_handler = None  # type: Optional[Callable]
         self._error_display_handler = lambda msg: debug(msg)
         self.settings = settings
+        # last, as a server that exits right away reports it from another thread
+        if executor:
+            self.dispatcher = PayloadDispatcher(
+                self.decode_payload, self.handle_payload, self.on_transport_closed, executor)
+            self.transport.start(self.dispatcher.put, self.dispatcher.close)
+        else:
+            self.transport.start(self.receive_payload, self.on_transport_closed)
 
-    def send_request(self, request: Request, handler: 'Callable', error_handler: 'Optional[Callable]' = None):
+    def send_request(self, request: Request, handler: 'Callable',
+                     error_handler: 'Optional[Callable]' = None) -> RequestHandle:
         self.request_id += 1
         debug(' >>> ' + request.method)
         if self.settings.log_payloads and request.params:
             debug(' --> ' + str(ordereddict_to_dict(request.params)))
-        if handler is not None:
-            self._response_handlers.setdefault(self.request_id, []).append(handler)
-        if error_handler is not None:
-            self._error_handlers.setdefault(self.request_id, []).append(error_handler)
-        self.send_payload(request.to_payload(self.request_id))
+        timeout = self.settings.request_timeouts.get(request.method)
+        deadline = time.time() + timeout if timeout else None
+        self._pending_requests[self.request_id] = PendingRequest(request.method, handler, error_handler, deadline)
+        if deadline is not None:
+            self._schedule_expiry(deadline)
+        self.send_payload(request.to_payload(self.request_id), document_uri(request.params))
+        return RequestHandle(self, self.request_id, request.method)
+
+    def cancel_request(self, request_id: int):
+        """Drops the handlers of a request and asks the server to stop working on it"""
+        if self._pending_requests.pop(request_id, None):
+            self.send_notification(Notification.cancelRequest({"id": request_id}))
+
+    @property
+    def pending_request_count(self) -> int:
+        return len(self._pending_requests)
+
+    def expire_requests(self, now: 'Optional[float]' = None):
+        """Cancels the requests that outlived their timeout and reports them to their error handler"""
+        if now is None:
+            now = time.time()
+        expired = list(
+            (request_id, pending) for request_id, pending in list(self._pending_requests.items())
+            if pending.deadline is not None and pending.deadline <= now)
+        for request_id, pending in expired:
+            if self._pending_requests.pop(request_id, None) is None:
+                continue  # answered, cancelled or expired by another thread meanwhile
+            self.expired_request_count += 1
+            self.send_notification(Notification.cancelRequest({"id": request_id}))
+            error = {
+                "code": ErrorCode.RequestTimedOut,
+                "message": "{} timed out".format(pending.method)
+            }
+            if pending.error_handler:
+                try:
+                    pending.error_handler(error)
+                except Exception as err:
+                    exception_log("Error handling timeout of " + pending.method, err)
+            else:
+                self._error_display_handler(error["message"])
+        deadlines = list(pending.deadline for pending in list(self._pending_requests.values())
+                         if pending.deadline is not None)
+        if deadlines:
+            self._schedule_expiry(min(deadlines))
+
+    def _schedule_expiry(self, deadline: float) -> None:
+        """
+        Makes sure requests are expired once the deadline passes, even if the
+        server never sends anything again. One timer is pending at a time,
+        for the earliest deadline.
+        """
+        with self._expiry_lock:
+            if self._expiry_deadline is not None and self._expiry_deadline <= deadline:
+                return
+            self._expiry_deadline = deadline
+        delay = max(0, math.ceil((deadline - time.time()) * 1000))
+        self._schedule(lambda: self._on_expiry_timer(deadline), delay)
+
+    def _on_expiry_timer(self, deadline: float) -> None:
+        with self._expiry_lock:
+            if self._expiry_deadline != deadline:
+                return  # an earlier deadline took over
+            self._expiry_deadline = None
+        if self._executor:
+            self._executor(self.expire_requests)
+        else:
+            self.expire_requests()
 
     def send_notification(self, notification: Notification):
         debug(' >>> ' + notification.method)
         if self.settings.log_payloads and notification.params:
             debug(' --> ' + str(ordereddict_to_dict(notification.params)))
-        self.send_payload(notification.to_payload())
+        self.send_payload(notification.to_payload(), document_uri(notification.params),
+                          is_full_text_change(notification))
+
+    def is_congested(self) -> bool:
+        """True while the server is not reading messages as fast as they are sent"""
+        return bool(self._deferred) or self.transport.is_congested()
 
     def exit(self):
         self.exiting = True
         self.send_notification(Notification.exit())
         self.transport.end()
+        if self.dispatcher:
+            # in case the transport was already gone and never reported closing
+            self.dispatcher.close()
 
     def set_crash_handler(self, handler: 'Callable'):
         self._crash_handler = handler
@@ -128,25 +336,52 @@ class Client(object):
         if self._crash_handler is not None:
             self._crash_handler()
 
-    def send_payload(self, payload):
+    def send_payload(self, payload, uri: 'Optional[str]' = None, supersedable: bool = False):
         try:
-            message = format_request(payload)
-            self.transport.send(message)
+            message = format_request(payload, self.codec)
+            with self._deferred_lock:
+                if not self._deferred and self.transport.send(message, uri, supersedable):
+                    return
+                # sending never waits for the server, the message is sent once its queue has room
+                self._deferred.append((message, uri, supersedable))
+                first = len(self._deferred) == 1
+            if first:
+                debug("server is not reading, deferring messages")
+                self._schedule(self.send_deferred, DEFERRED_SEND_DELAY)
         except Exception as err:
             self._error_display_handler("Failure sending LSP server message, exiting")
             exception_log("Failure writing payload", err)
             self.handle_transport_failure()
 
+    def send_deferred(self) -> None:
+        """Hands the deferred messages to the transport, as many as it has room for"""
+        try:
+            with self._deferred_lock:
+                while self._deferred and self.transport.send(*self._deferred[0]):
+                    self._deferred.popleft()
+                retry = bool(self._deferred) and not self.exiting
+        except Exception as err:
+            exception_log("Failure writing payload", err)
+            self.handle_transport_failure()
+            return
+        if retry:
+            self._schedule(self.send_deferred, DEFERRED_SEND_DELAY)
+
     def receive_payload(self, message):
-        payload = None
+        payload = self.decode_payload(message)
+        if payload is not None:
+            self.handle_payload(payload)
+
+    def decode_payload(self, message) -> 'Optional[Dict[str, Any]]':
         try:
-            payload = json.loads(message)
+            return self.codec.decode(message)
             # limit = min(len(message), 200)
             # debug("got json: ", message[0:limit], "...")
-        except IOError as err:
-            exception_log("got a non-JSON payload: " + message, err)
-            return
+        except ValueError as err:
+            exception_log("got a non-JSON payload: " + str(message), err)
+            return None
 
+    def handle_payload(self, payload: 'Dict[str, Any]'):
         try:
             if "method" in payload:
                 if "id" in payload:
@@ -161,6 +396,7 @@ class Client(object):
             exception_log("Error handling server payload", err)
 
     def on_transport_closed(self):
+        self._pending_requests.clear()
         self._error_display_handler("Communication to server closed, exiting")
         # Differentiate between normal exit and server crash?
         if not self.exiting:
@@ -168,22 +404,23 @@ class Client(object):
 
     def response_handler(self, response):
         handler_id = int(response.get("id"))  # dotty sends strings back :(
+        pending = self._pending_requests.pop(handler_id, None)
         if 'result' in response and 'error' not in response:
             result = response['result']
             if self.settings.log_payloads:
                 debug(' <-- ' + str(result))
-            if handler_id in self._response_handlers:
-                for handler in self._response_handlers[handler_id]:
-                    handler(result)
+            if pending and pending.handler:
+                pending.handler(result)
             else:
                 debug("No handler found for id " + str(response.get("id")))
         elif 'error' in response and 'result' not in response:
             error = response['error']
             if self.settings.log_payloads:
                 debug(' <-- ' + str(error))
-            if handler_id in self._error_handlers:
-                for handler in self._error_handlers[handler_id]:
-                    handler(error)
+            if pending and pending.error_handler:
+                pending.error_handler(error)
+            elif error.get("code") == ErrorCode.RequestCancelled:
+                debug("Request cancelled", handler_id)
             else:
                 self._error_display_handler(error.get("message"))
         else:
@@ -1,44 +1,60 @@
 from .types import ClientConfig, ClientStates
 from .protocol import Request, Notification
-from .transports import start_tcp_transport, StdioTransport
+from .transports import Transport, connect_tcp, start_tcp_transport, StdioTransport
 from .rpc import Client
 from .process import start_server
 from .url import filename_to_uri
-# from .logging import debug
+from .logging import debug, server_log
+from . import event_loop
 import os
 from .protocol import CompletionItemKind, SymbolKind
+from .protocol import TextDocumentSyncKindNone
 try:
-    from typing import Callable, Dict, Any
-    assert Callable and Dict and Any
+    from typing import Callable, Dict, Any, List, Optional, Tuple
+    assert Callable and Dict and Any and List and Optional and Tuple
 except ImportError:
     pass
 
 
+def start_transport(config: ClientConfig, process, settings) -> 'Optional[Transport]':
+    """Connects to the server with the engine selected in its configuration"""
+    if config.transport_engine == "asyncio":
+        if event_loop.is_available():
+            log = server_log if settings.log_stderr else None
+            if config.tcp_port:
+                if process:
+                    event_loop.attach_logger(process.stdout, log)
+                    event_loop.attach_logger(process.stderr, log)
+                return event_loop.AsyncioTCPTransport(connect_tcp(config.tcp_port))
+            event_loop.attach_logger(process.stderr, log)
+            return event_loop.AsyncioStdioTransport(process)
+        debug("asyncio engine not available for", config.name, ", using threads")
+    if config.tcp_port:
+        return start_tcp_transport(config.tcp_port)
+    return StdioTransport(process)
+
+
 def create_session(config: ClientConfig, project_path: str, env: dict, settings,
-                   on_created=None, on_ended=None, bootstrap_client=None) -> 'Session':
+                   on_created=None, on_ended=None, bootstrap_client=None, executor=None) -> 'Session':
 
     if config.binary_args:
 
         process = start_server(config.binary_args, project_path, env)
         if process:
-            if config.tcp_port:
-                transport = start_tcp_transport(config.tcp_port)
-                if transport:
-                    session = Session(config, project_path, Client(transport, settings), on_created, on_ended)
-                else:
-                    # try to terminate the process
-                    try:
-                        process.terminate()
-                    except Exception as e:
-                        pass
+            transport = start_transport(config, process, settings)
+            if transport:
+                session = Session(config, project_path, Client(transport, settings, executor), on_created, on_ended)
             else:
-                transport = StdioTransport(process)
-                session = Session(config, project_path, Client(transport, settings), on_created, on_ended)
+                # try to terminate the process
+                try:
+                    process.terminate()
+                except Exception as e:
+                    pass
     else:
         if config.tcp_port:
-            transport = start_tcp_transport(config.tcp_port)
+            transport = start_transport(config, None, settings)
 
-            session = Session(config, project_path, Client(transport, settings),
+            session = Session(config, project_path, Client(transport, settings, executor),
                               on_created, on_ended)
 
         if bootstrap_client:
@@ -157,6 +173,15 @@ class Session(object):
     def get_capability(self, capability):
         return self.capabilities.get(capability)
 
+    def get_text_document_sync_kind(self) -> int:
+        # textDocumentSync is either a TextDocumentSyncKind or TextDocumentSyncOptions
+        text_document_sync = self.capabilities.get("textDocumentSync")
+        if isinstance(text_document_sync, dict):
+            return text_document_sync.get("change", TextDocumentSyncKindNone)
+        elif isinstance(text_document_sync, int):
+            return text_document_sync
+        return TextDocumentSyncKindNone
+
     def initialize(self):
         params = get_initialize_params(self.project_path, self.config)
         self.client.send_request(
@@ -184,3 +209,153 @@ class Session(object):
         self.capabilities = dict()
         if self._on_ended:
             self._on_ended()
+
+
+class PooledSession(object):
+    """A session and the windows sharing it"""
+    def __init__(self) -> None:
+        self.session = None  # type: Optional[Session]
+        self.window_ids = []  # type: List[int]
+        self.waiting = []  # type: List[Tuple[int, Callable[[Session], None]]]
+
+
+class SessionPool(object):
+    """
+    Sessions keyed by config name and project path, so windows open on the
+    same project share one server. A session is ended only when the last
+    window using it releases it.
+    """
+    def __init__(self) -> None:
+        self._entries = {}  # type: Dict[Tuple[str, str], PooledSession]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, config_name: str, project_path: str) -> 'Optional[Session]':
+        entry = self._entries.get((config_name, project_path))
+        return entry.session if entry else None
+
+    def window_ids(self, session: Session) -> 'List[int]':
+        entry = self._entries.get((session.config.name, session.project_path))
+        if entry and entry.session is session:
+            return list(entry.window_ids)
+        return []
+
+    def acquire(self, config_name: str, project_path: str, window_id: int,
+                start: 'Callable[[Callable[[Session], None], Callable[[], None]], Session]',
+                on_ready: 'Callable[[Session], None]',
+                on_ended: 'Callable[[Session, List[int]], None]') -> Session:
+        """
+        Adds a window to the session for the config and project, which is
+        started with start(on_created, on_ended) if there is none yet.
+        on_ready is called once the session is initialized, right away if it
+        already is, and on_ended with the windows still using it once it ends.
+        A session that is stopping is not shared, a new one replaces it.
+        """
+        key = (config_name, project_path)
+        entry = self._entries.get(key)
+        if entry and entry.session and entry.session.state != ClientStates.STOPPING:
+            if window_id not in entry.window_ids:
+                entry.window_ids.append(window_id)
+            if entry.session.state == ClientStates.READY:
+                on_ready(entry.session)
+            else:
+                entry.waiting.append((window_id, on_ready))
+            return entry.session
+
+        entry = PooledSession()
+        entry.window_ids.append(window_id)
+        entry.waiting.append((window_id, on_ready))
+        self._entries[key] = entry
+        try:
+            session = start(lambda session: self._handle_created(entry, session),
+                            lambda: self._handle_ended(key, entry, on_ended))
+        except Exception:
+            del self._entries[key]
+            raise
+        entry.session = session
+        return session
+
+    def release(self, session: Session, window_id: int) -> bool:
+        """
+        Removes a window from its session, returns True if no other window
+        uses the session, so it should be ended.
+        """
+        key = (session.config.name, session.project_path)
+        entry = self._entries.get(key)
+        if not entry or entry.session is not session:
+            return True
+        entry.waiting = list(waiting for waiting in entry.waiting if waiting[0] != window_id)
+        others = list(other_id for other_id in entry.window_ids if other_id != window_id)
+        if others:
+            entry.window_ids = others
+            return False
+        # no new windows can join a session that is ending
+        del self._entries[key]
+        return True
+
+    def _handle_created(self, entry: PooledSession, session: Session) -> None:
+        entry.session = session
+        waiting, entry.waiting = entry.waiting, []
+        for _, on_ready in waiting:
+            on_ready(session)
+
+    def _handle_ended(self, key: 'Tuple[str, str]', entry: PooledSession,
+                      on_ended: 'Callable[[Session, List[int]], None]') -> None:
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        if entry.session:
+            on_ended(entry.session, list(entry.window_ids))
+
+
+class SessionIndex(object):
+    """
+    The session found for each view id and scope name at the cursor, as
+    views embedding other languages are served by one session per scope,
+    with what it was found for: the view's syntax, the config revision, the
+    window and the file size limit of the config. None is kept for files
+    too large for their server. An entry is used while all of these still
+    hold, the view is checked against the size limit every time, since it
+    can grow or shrink.
+    """
+    def __init__(self) -> None:
+        self._entries = {}  # type: Dict[int, Tuple[Optional[str], int, int, Dict[str, Tuple[int, Optional[Session]]]]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, view_id: int, scope: str, syntax: 'Optional[str]', revision: int, window_id: 'Optional[int]',
+            size: int) -> 'Tuple[bool, Optional[Session]]':
+        """Whether the index knows the session of the view at the scope, and the session"""
+        entry = self._entries.get(view_id)
+        if not entry or entry[:3] != (syntax, revision, window_id):
+            return False, None
+        found = entry[3].get(scope)
+        if not found:
+            return False, None
+        max_file_size, session = found
+        if size > max_file_size:
+            return True, None
+        if session is None or session.state != ClientStates.READY:
+            # a file that was too large may fit now, a session may be ready now
+            return False, None
+        return True, session
+
+    def put(self, view_id: int, scope: str, syntax: 'Optional[str]', revision: int, window_id: int,
+            max_file_size: int, session: 'Optional[Session]') -> None:
+        entry = self._entries.get(view_id)
+        if not entry or entry[:3] != (syntax, revision, window_id):
+            entry = self._entries[view_id] = (syntax, revision, window_id, {})
+        entry[3][scope] = (max_file_size, session)
+
+    def forget(self, view_id: int) -> None:
+        self._entries.pop(view_id, None)
+
+    def forget_sessions(self, sessions: 'List[Session]') -> None:
+        for view_id, entry in list(self._entries.items()):
+            by_scope = entry[3]
+            for scope, found in list(by_scope.items()):
+                if found[1] in sessions:
+                    del by_scope[scope]
+            if not by_scope:
+                del self._entries[view_id]
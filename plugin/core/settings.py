@@ -1,5 +1,6 @@
 import sublime
 from .types import Settings, ClientConfig
+from .syntaxes import SyntaxMatcher
 
 PLUGIN_NAME = 'SublimeCodeIntel'
 
@@ -42,6 +43,14 @@ def read_str_setting(settings_obj: sublime.Settings, key: str, default: str) ->
         return default
 
 
+def read_array_setting(settings_obj: sublime.Settings, key: str, default: list) -> list:
+    val = settings_obj.get(key)
+    if isinstance(val, list):
+        return val
+    else:
+        return default
+
+
 def update_settings(settings: Settings, settings_obj: sublime.Settings):
     settings.show_status_messages = read_bool_setting(settings_obj, "show_status_messages", True)
     settings.show_view_status = read_bool_setting(settings_obj, "show_view_status", True)
@@ -66,6 +75,13 @@ def update_settings(settings: Settings, settings_obj: sublime.Settings):
     settings.log_server = read_bool_setting(settings_obj, "log_server", True)
     settings.log_stderr = read_bool_setting(settings_obj, "log_stderr", False)
     settings.log_payloads = read_bool_setting(settings_obj, "log_payloads", False)
+    settings.request_timeouts = read_dict_setting(settings_obj, "request_timeouts", {})
+    settings.handler_executor = read_str_setting(settings_obj, "handler_executor", "async")
+    settings.warm_start_clients = read_array_setting(settings_obj, "warm_start_clients", [])
+    settings.max_file_size = read_int_setting(settings_obj, "max_file_size", 1000000)
+    settings.diagnostics_delay_ms = read_int_setting(settings_obj, "diagnostics_delay_ms", 100)
+    settings.max_completion_items = read_int_setting(settings_obj, "max_completion_items", 200)
+    settings.response_cache_sizes = read_dict_setting(settings_obj, "response_cache_sizes", {})
 
 
 class ClientConfigs(object):
@@ -76,6 +92,10 @@ class ClientConfigs(object):
         self.defaults = []  # type: List[ClientConfig]
         self.all = []  # type: List[ClientConfig]
         self._external_configs = []  # type: List[ClientConfig]
+        # bumped whenever the set of configs changes
+        self.revision = 0
+        self.supported_syntaxes = SyntaxMatcher(self.all)
+        self.supportable_syntaxes = SyntaxMatcher(self.defaults)
 
     def update(self, settings_obj: sublime.Settings):
         self._default_settings = read_dict_setting(settings_obj, "default_clients", {})
@@ -87,12 +107,17 @@ class ClientConfigs(object):
             if config.name in self._global_settings:
                 config.apply_settings(self._global_settings[config.name])
         self.all.extend(self._external_configs)
+        self.supported_syntaxes = SyntaxMatcher(self.all)
+        self.supportable_syntaxes = SyntaxMatcher(self.defaults)
+        self.revision += 1
 
     def add_external_config(self, config: ClientConfig):
         if config.name in self._global_settings:
             config.apply_settings(self._global_settings[config.name])
         self._external_configs.append(config)
         self.all.append(config)
+        self.supported_syntaxes = SyntaxMatcher(self.all)
+        self.revision += 1
 
     def _set_enabled(self, config_name: str, is_enabled: bool):
         if _settings_obj:
@@ -138,7 +163,9 @@ def read_client_config(name, client_config):
         client_config.get("enabled", True),
         client_config.get("initializationOptions", dict()),
         client_config.get("settings", dict()),
-        client_config.get("env", dict())
+        client_config.get("env", dict()),
+        client_config.get("transport_engine", "threads"),
+        client_config.get("max_file_size", None)
     )
 
 
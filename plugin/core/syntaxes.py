@@ -0,0 +1,42 @@
+import re
+from .types import ClientConfig
+
+assert ClientConfig
+
+try:
+    from typing import Dict, Iterable, Optional, Pattern
+    assert Dict and Iterable and Optional and Pattern
+except ImportError:
+    pass
+
+
+class SyntaxMatcher(object):
+    """
+    Tells whether a syntax file belongs to one of the given configs, by
+    matching their syntaxes as whole words regardless of case.
+
+    The pattern is compiled once for all configs and results are cached
+    per syntax, as Sublime asks for every view it creates.
+    """
+    def __init__(self, configs: 'Iterable[ClientConfig]') -> None:
+        syntaxes = []
+        # a config without syntaxes has always matched any syntax
+        self._matches_all = False
+        for config in configs:
+            config_syntaxes = list(config.syntaxes)
+            if not config_syntaxes:
+                self._matches_all = True
+            syntaxes.extend(config_syntaxes)
+        self._pattern = None  # type: Optional[Pattern]
+        if syntaxes:
+            self._pattern = re.compile(r'|'.join(r'\b%s\b' % re.escape(s) for s in syntaxes), re.IGNORECASE)
+        self._results = {}  # type: Dict[str, bool]
+
+    def matches(self, syntax: 'Optional[str]') -> bool:
+        if not syntax:
+            return False
+        result = self._results.get(syntax)
+        if result is None:
+            result = self._matches_all or bool(self._pattern and self._pattern.search(syntax))
+            self._results[syntax] = result
+        return result
@@ -0,0 +1,62 @@
+from .cache import LRUCache, ResponseCache, MISSING
+import unittest
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.put("c", 3)
+        self.assertEqual(2, len(cache))
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_put_existing_key(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("a", 10)
+        cache.put("c", 3)
+        self.assertEqual(10, cache.get("a"))
+        self.assertNotIn("b", cache)
+
+    def test_discard_if(self):
+        cache = LRUCache(10)
+        for i in range(5):
+            cache.put(i, i)
+        cache.discard_if(lambda key: key % 2 == 0)
+        self.assertEqual(2, len(cache))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def test_versions(self):
+        cache = ResponseCache()
+        self.assertIs(MISSING, cache.get("textDocument/hover", "pyls", "file:///a.py", 1, (3, 7)))
+        cache.put("textDocument/hover", "pyls", "file:///a.py", 1, (3, 7), None, 10)
+        self.assertIsNone(cache.get("textDocument/hover", "pyls", "file:///a.py", 1, (3, 7)))
+        self.assertIs(MISSING, cache.get("textDocument/hover", "pyls", "file:///a.py", 2, (3, 7)))
+        self.assertIs(MISSING, cache.get("textDocument/hover", "other", "file:///a.py", 1, (3, 7)))
+        self.assertIs(MISSING, cache.get("textDocument/definition", "pyls", "file:///a.py", 1, (3, 7)))
+
+    def test_size_limit(self):
+        cache = ResponseCache()
+        for position in range(3):
+            cache.put("textDocument/hover", "pyls", "file:///a.py", 1, position, position, 2)
+        self.assertIs(MISSING, cache.get("textDocument/hover", "pyls", "file:///a.py", 1, 0))
+        self.assertEqual(2, cache.get("textDocument/hover", "pyls", "file:///a.py", 1, 2))
+
+    def test_invalidate(self):
+        cache = ResponseCache()
+        cache.put("textDocument/hover", "pyls", "file:///a.py", 1, 0, "a", 10)
+        cache.put("textDocument/hover", "pyls", "file:///b.py", 1, 0, "b", 10)
+        cache.invalidate("file:///a.py")
+        self.assertIs(MISSING, cache.get("textDocument/hover", "pyls", "file:///a.py", 1, 0))
+        self.assertEqual("b", cache.get("textDocument/hover", "pyls", "file:///b.py", 1, 0))
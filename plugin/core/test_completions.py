@@ -0,0 +1,99 @@
+from .completions import CompletionCache, CompletionItemIndex
+import unittest
+try:
+    from typing import List
+    assert List
+except ImportError:
+    pass
+
+
+def format_completion(item):
+    return item["label"], item.get("insertText", item["label"])
+
+
+def create_cache(labels, is_incomplete=False):
+    items = list({"label": label} for label in labels)
+    return CompletionCache(10, items, format_completion, is_incomplete)
+
+
+class CompletionCacheTests(unittest.TestCase):
+
+    def test_filter_ranks_matches(self):
+        cache = create_cache(["toString", "getTime", "Time", "setTimeout"])
+        self.assertEqual(["toString", "getTime", "Time", "setTimeout"], [c[0] for c in cache.filter("")])
+        self.assertEqual(["toString", "Time", "getTime", "setTimeout"], [c[0] for c in cache.filter("t")])
+        self.assertEqual(["Time", "getTime", "setTimeout", "toString"], [c[0] for c in cache.filter("ti")])
+        self.assertEqual(["setTimeout"], [c[0] for c in cache.filter("tio")])
+
+    def test_filter_after_backspace(self):
+        cache = create_cache(["alpha", "beta"])
+        self.assertEqual([0], cache.matches("al"))
+        self.assertEqual([0, 1], cache.matches("a"))
+        self.assertEqual([], cache.matches("x"))
+        self.assertEqual([0, 1], cache.matches(""))
+
+    def test_filter_text(self):
+        items = [{"label": "foo(bar)", "filterText": "foo"}, {"label": "bar"}]
+        cache = CompletionCache(0, items, format_completion)
+        self.assertEqual([("bar", "bar")], cache.filter("ba"))
+        self.assertEqual([("foo(bar)", "foo(bar)")], cache.filter("fo"))
+
+    def test_filter_limit(self):
+        cache = create_cache(["item{}".format(i) for i in range(10)])
+        self.assertEqual(["item0", "item1"], [c[0] for c in cache.filter("i", 2)])
+        self.assertEqual(["item3"], [c[0] for c in cache.filter("it3", 2)])
+
+    def test_preselect(self):
+        items = [{"label": "first"}, {"label": "fresh", "preselect": True}]  # type: List[dict]
+        cache = CompletionCache(0, items, format_completion)
+        self.assertEqual([1, 0], cache.matches(""))
+        self.assertEqual([1, 0], cache.matches("f"))
+        self.assertEqual([0], cache.matches("fi"))
+
+    def test_formats_only_returned_items(self):
+        formatted = []
+
+        def format_item(item):
+            formatted.append(item["label"])
+            return format_completion(item)
+
+        items = list({"label": "item{}".format(i)} for i in range(10))
+        cache = CompletionCache(0, items, format_item)
+        cache.filter("", 3)
+        self.assertEqual(["item0", "item1", "item2"], formatted)
+        cache.filter("", 4)
+        self.assertEqual(["item0", "item1", "item2", "item3"], formatted)
+        # only the items newly among the first for a changed prefix are formatted
+        cache.filter("item9", 3)
+        self.assertEqual(["item0", "item1", "item2", "item3", "item9"], formatted)
+        self.assertEqual([("item9", "item9")], cache.completions(cache.matches("item9", 3)))
+        self.assertEqual(5, len(formatted))
+
+
+class CompletionItemIndexTests(unittest.TestCase):
+
+    def test_find_by_inserted_text(self):
+        plain = {"label": "print"}
+        snippet = {"label": "range(n)", "insertText": "range"}
+        edit = {"label": "len", "textEdit": {"newText": "len", "range": {}}}
+        index = CompletionItemIndex([plain, snippet, edit], 60)
+        self.assertIs(plain, index.find("print"))
+        self.assertIs(snippet, index.find("range"))
+        self.assertIs(snippet, index.find("range(n)"))
+        self.assertIs(edit, index.find("len"))
+        self.assertIsNone(index.find("pri"))
+
+    def test_expires(self):
+        index = CompletionItemIndex([], 60, now=1000)
+        self.assertFalse(index.is_expired(now=1059))
+        self.assertTrue(index.is_expired(now=1060))
+
+    def test_resolve(self):
+        item = {"label": "range"}
+        index = CompletionItemIndex([item], 60)
+        self.assertIsNone(index.get_resolved(item))
+        self.assertTrue(index.request_resolve(item))
+        self.assertFalse(index.request_resolve(item))
+        resolved = {"label": "range", "insertText": "range(${1:n})", "insertTextFormat": 2}
+        index.set_resolved(item, resolved)
+        self.assertIs(resolved, index.get_resolved(item))
@@ -0,0 +1,127 @@
+from .diagnostics_store import DiagnosticsStore, FileDiagnostics, MAX_INDEXED_ROWS
+from .protocol import Diagnostic, DiagnosticSeverity, Point, Range
+import threading
+import unittest
+
+
+def diagnostic(start_row: int, end_row: int, severity: int = DiagnosticSeverity.Error,
+               message: str = "message") -> Diagnostic:
+    diagnostic_range = Range(Point(start_row, 0), Point(end_row, 4))
+    return Diagnostic(message, diagnostic_range, severity, "test")
+
+
+class FileDiagnosticsTests(unittest.TestCase):
+
+    def test_line_diagnostics(self):
+        single = diagnostic(3, 3)
+        multi = diagnostic(5, 7)
+        wide = diagnostic(10, 10 + MAX_INDEXED_ROWS)
+        file_diagnostics = FileDiagnostics()
+        file_diagnostics.update("linter", [single, multi, wide])
+        self.assertEqual([single], file_diagnostics.line_diagnostics(3))
+        self.assertEqual([multi], file_diagnostics.line_diagnostics(6))
+        self.assertEqual([wide], file_diagnostics.line_diagnostics(10 + MAX_INDEXED_ROWS))
+        self.assertEqual([], file_diagnostics.line_diagnostics(4))
+        self.assertEqual([], file_diagnostics.line_diagnostics(11 + MAX_INDEXED_ROWS))
+
+    def test_rows_diagnostics(self):
+        single = diagnostic(3, 3)
+        multi = diagnostic(5, 7)
+        wide = diagnostic(10, 10 + MAX_INDEXED_ROWS)
+        file_diagnostics = FileDiagnostics()
+        file_diagnostics.update("linter", [wide, multi, single])
+        self.assertEqual([single, multi], file_diagnostics.rows_diagnostics(0, 6))
+        self.assertEqual([multi], file_diagnostics.rows_diagnostics(7, 9))
+        self.assertEqual([wide], file_diagnostics.rows_diagnostics(20, 30))
+        self.assertEqual([single, multi, wide], file_diagnostics.rows_diagnostics(0, 1000000))
+        self.assertEqual([], file_diagnostics.rows_diagnostics(11 + MAX_INDEXED_ROWS, 1000000))
+
+    def test_update_replaces_source(self):
+        old = diagnostic(1, 1)
+        other = diagnostic(1, 1, DiagnosticSeverity.Warning)
+        new = diagnostic(2, 2)
+        file_diagnostics = FileDiagnostics()
+        file_diagnostics.update("linter", [old])
+        file_diagnostics.update("compiler", [other])
+        delta = file_diagnostics.update("linter", [new])
+        self.assertEqual(0, delta[DiagnosticSeverity.Error])
+        self.assertEqual([other], file_diagnostics.line_diagnostics(1))
+        self.assertEqual([new], file_diagnostics.line_diagnostics(2))
+        self.assertEqual(1, file_diagnostics.counts[DiagnosticSeverity.Error])
+        self.assertEqual(1, file_diagnostics.counts[DiagnosticSeverity.Warning])
+        self.assertEqual([other, new], sorted(file_diagnostics, key=lambda d: d.range.start.row))
+
+        file_diagnostics.update("linter", [])
+        file_diagnostics.update("compiler", [])
+        self.assertFalse(file_diagnostics)
+        self.assertEqual([], file_diagnostics.line_diagnostics(1))
+
+    def test_counts_unknown_severities_as_errors(self):
+        lsp_range = {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 1}}
+        diagnostics = list(Diagnostic.from_lsp({"message": "m", "range": lsp_range, "severity": severity})
+                           for severity in (None, 7))
+        file_diagnostics = FileDiagnostics()
+        file_diagnostics.update("linter", diagnostics)
+        self.assertEqual(2, file_diagnostics.counts[DiagnosticSeverity.Error])
+
+    def test_update_leaves_read_sources_as_they_were(self):
+        file_diagnostics = FileDiagnostics()
+        file_diagnostics.update("linter", [diagnostic(1, 1)])
+        by_source = file_diagnostics.by_source
+        file_diagnostics.update("other", [diagnostic(2, 2)])
+        file_diagnostics.update("linter", [])
+        self.assertEqual(["linter"], list(by_source))
+        self.assertEqual(["other"], list(file_diagnostics.by_source))
+
+
+class DiagnosticsStoreTests(unittest.TestCase):
+
+    def test_counts_by_window(self):
+        store = DiagnosticsStore()
+        store.update(1, "/a.py", "linter", [diagnostic(1, 1), diagnostic(2, 2, DiagnosticSeverity.Warning)])
+        store.update(1, "/b.py", "linter", [diagnostic(1, 1)])
+        store.update(2, "/a.py", "linter", [diagnostic(1, 1)])
+        self.assertEqual(2, store.count(1, DiagnosticSeverity.Error))
+        self.assertEqual(1, store.count(1, DiagnosticSeverity.Warning))
+        self.assertEqual(1, store.count(2, DiagnosticSeverity.Error))
+        self.assertEqual(0, store.count(3, DiagnosticSeverity.Error))
+
+        store.update(1, "/a.py", "linter", [diagnostic(1, 1, DiagnosticSeverity.Hint)])
+        self.assertEqual(1, store.count(1, DiagnosticSeverity.Error))
+        self.assertEqual(0, store.count(1, DiagnosticSeverity.Warning))
+        self.assertEqual(1, store.count(1, DiagnosticSeverity.Hint))
+
+    def test_files_without_diagnostics_are_removed(self):
+        store = DiagnosticsStore()
+        store.update(1, "/a.py", "linter", [diagnostic(1, 1)])
+        self.assertIsNotNone(store.get_file(1, "/a.py"))
+        store.update(1, "/a.py", "linter", [])
+        self.assertIsNone(store.get_file(1, "/a.py"))
+        self.assertEqual({}, store.get_files(1))
+        store.update(1, "/b.py", "linter", [])
+        self.assertEqual({}, store.get_files(1))
+
+    def test_reads_while_updated_from_other_threads(self):
+        store = DiagnosticsStore()
+        errors = []
+
+        def update(source):
+            try:
+                for i in range(300):
+                    diagnostics = list(diagnostic(row, row + i % 3) for row in range(i % 20))
+                    store.update(1, "/{}.py".format(i % 5), source, diagnostics)
+            except Exception as err:
+                errors.append(err)
+
+        writers = list(threading.Thread(target=update, args=(source,)) for source in ("linter", "compiler"))
+        for writer in writers:
+            writer.start()
+        while any(writer.is_alive() for writer in writers):
+            for file_diagnostics in (store.get_files(1) or {}).values():
+                file_diagnostics.rows_diagnostics(0, 30)
+                list(file_diagnostics)
+        for writer in writers:
+            writer.join()
+        self.assertEqual([], errors)
+        expected = sum(len(list(file_diagnostics)) for file_diagnostics in (store.get_files(1) or {}).values())
+        self.assertEqual(expected, store.count(1, DiagnosticSeverity.Error))
@@ -0,0 +1,59 @@
+from .diff import text_change, common_prefix_length, common_suffix_length
+import unittest
+
+
+def apply_change(text, change):
+    lines = text.split('\n')
+    start = change['range']['start']
+    end = change['range']['end']
+    begin = sum(len(line) + 1 for line in lines[:start['line']]) + start['character']
+    stop = sum(len(line) + 1 for line in lines[:end['line']]) + end['character']
+    return text[:begin] + change['text'] + text[stop:]
+
+
+class CommonLengthTests(unittest.TestCase):
+
+    def test_prefix(self):
+        self.assertEqual(0, common_prefix_length("abc", "xbc"))
+        self.assertEqual(2, common_prefix_length("abc", "abx"))
+        self.assertEqual(3, common_prefix_length("abc", "abcdef"))
+
+    def test_suffix_respects_limit(self):
+        self.assertEqual(2, common_suffix_length("xbc", "ybc", 0))
+        self.assertEqual(1, common_suffix_length("aa", "aaa", 1))
+
+
+class TextChangeTests(unittest.TestCase):
+
+    def test_no_change(self):
+        self.assertIsNone(text_change("same", "same"))
+
+    def test_insertion(self):
+        change = text_change("hello\nworld\n", "hello\nbig world\n")
+        assert change is not None
+        self.assertEqual({'line': 1, 'character': 0}, change['range']['start'])
+        self.assertEqual({'line': 1, 'character': 0}, change['range']['end'])
+        self.assertEqual(0, change['rangeLength'])
+        self.assertEqual("big ", change['text'])
+
+    def test_deletion(self):
+        change = text_change("one\ntwo\nthree", "one\nthree")
+        assert change is not None
+        self.assertEqual("", change['text'])
+        self.assertEqual(4, change['rangeLength'])
+        self.assertEqual("one\nthree", apply_change("one\ntwo\nthree", change))
+
+    def test_repeated_characters(self):
+        old = "aaaa\naaaa"
+        new = "aaaa\naaaaa"
+        self.assertEqual(new, apply_change(old, text_change(old, new)))
+
+    def test_round_trips(self):
+        pairs = [
+            ("", "new file"),
+            ("def f():\n    pass\n", "def g(x):\n    return x\n"),
+            ("a\nb\nc\n", "a\nc\n"),
+            ("x = 1\n", ""),
+        ]
+        for old, new in pairs:
+            self.assertEqual(new, apply_change(old, text_change(old, new)))
@@ -0,0 +1,88 @@
+from .dispatch import Coalescer, PayloadDispatcher, WorkerPool, run_inline
+import json
+import threading
+import unittest
+try:
+    from typing import Any, List
+    assert Any and List
+except ImportError:
+    pass
+
+
+class PayloadDispatcherTests(unittest.TestCase):
+
+    def test_decodes_and_handles_in_order(self):
+        handled = []  # type: List[Any]
+        closed = threading.Event()
+        dispatcher = PayloadDispatcher(json.loads, handled.append, closed.set, run_inline)
+        dispatcher.put('{"id": 1}')
+        dispatcher.put('{"id": 2}')
+        dispatcher.close()
+        self.assertTrue(closed.wait(5))
+        self.assertEqual([{"id": 1}, {"id": 2}], handled)
+        self.assertEqual(0, dispatcher.queue_depth)
+        self.assertEqual(0, dispatcher.pending_handlers)
+        self.assertGreaterEqual(dispatcher.max_pending_handlers, 1)
+
+    def test_skips_undecodable_messages(self):
+        handled = []  # type: List[Any]
+        closed = threading.Event()
+        dispatcher = PayloadDispatcher(lambda message: None, handled.append, closed.set, run_inline)
+        dispatcher.put('garbage')
+        dispatcher.close()
+        self.assertTrue(closed.wait(5))
+        self.assertEqual([], handled)
+
+    def test_closes_once(self):
+        closed = []  # type: List[Any]
+        dispatcher = PayloadDispatcher(json.loads, lambda payload: None, lambda: closed.append(True), run_inline)
+        self.assertTrue(dispatcher._thread.daemon)
+        dispatcher.close()
+        dispatcher.close()
+        dispatcher._thread.join(5)
+        self.assertFalse(dispatcher._thread.is_alive())
+        self.assertEqual([True], closed)
+
+    def test_worker_pool_executor(self):
+        pool = WorkerPool()
+        done = threading.Event()
+        closed = threading.Event()
+        dispatcher = PayloadDispatcher(json.loads, lambda payload: done.set(), closed.set, pool)
+        dispatcher.put('{}')
+        dispatcher.close()
+        self.assertTrue(done.wait(5))
+        self.assertTrue(closed.wait(5))
+        pool.stop()
+
+
+class CoalescerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.flushed = []  # type: List[Any]
+        self.scheduled = []  # type: List[Any]
+
+    def schedule(self, function, delay):
+        self.scheduled.append((function, delay))
+
+    def test_keeps_latest_value_per_key(self):
+        coalescer = Coalescer(self.flushed.append, self.schedule, 100)
+        coalescer.put("a", 1)
+        coalescer.put("b", 2)
+        coalescer.put("a", 3)
+        self.assertEqual(1, len(self.scheduled))
+        self.assertEqual(100, self.scheduled[0][1])
+        self.assertEqual([], self.flushed)
+
+        self.scheduled[0][0]()
+        self.assertEqual([[3, 2]], self.flushed)
+        self.assertEqual(1, coalescer.coalesced_count)
+
+        coalescer.put("a", 4)
+        self.assertEqual(2, len(self.scheduled))
+
+    def test_no_delay_flushes_right_away(self):
+        coalescer = Coalescer(self.flushed.append, self.schedule, 0)
+        coalescer.put("a", 1)
+        coalescer.put("a", 2)
+        self.assertEqual([[1], [2]], self.flushed)
+        self.assertEqual([], self.scheduled)
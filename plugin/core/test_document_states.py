@@ -0,0 +1,48 @@
+from .document_states import DocumentStates
+import unittest
+
+
+class DocumentStatesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.states = DocumentStates()
+        self.session = object()
+
+    def test_windows_sharing_a_session(self):
+        state, opened = self.states.open(self.session, "/a.py", 1)
+        self.assertTrue(opened)
+        state.inc_version()
+        other_state, opened = self.states.open(self.session, "/a.py", 2)
+        self.assertFalse(opened)
+        self.assertIs(state, other_state)
+        self.assertTrue(self.states.is_open(self.session, "/a.py", 2))
+        # the first window closing it leaves the document open for the other one
+        self.assertIsNone(self.states.close(self.session, "/a.py", 1))
+        self.assertFalse(self.states.is_open(self.session, "/a.py", 1))
+        self.assertIs(state, self.states.get(self.session, "/a.py"))
+        self.assertEqual(1, state.version)
+        self.assertIs(state, self.states.close(self.session, "/a.py", 2))
+        self.assertIsNone(self.states.get(self.session, "/a.py"))
+
+    def test_reopening_in_the_same_window(self):
+        self.states.open(self.session, "/a.py", 1)
+        _, opened = self.states.open(self.session, "/a.py", 1)
+        self.assertFalse(opened)
+        self.assertIsNone(self.states.close(self.session, "/a.py", 2))
+        self.assertIsNotNone(self.states.close(self.session, "/a.py", 1))
+
+    def test_sessions_are_separate(self):
+        other_session = object()
+        self.states.open(self.session, "/a.py", 1)
+        _, opened = self.states.open(other_session, "/a.py", 1)
+        self.assertTrue(opened)
+        self.assertEqual(1, len(self.states.forget_session(other_session)))
+        self.assertIsNotNone(self.states.get(self.session, "/a.py"))
+
+    def test_close_window(self):
+        self.states.open(self.session, "/a.py", 1)
+        self.states.open(self.session, "/b.py", 1)
+        self.states.open(self.session, "/b.py", 2)
+        closed = self.states.close_window(1)
+        self.assertEqual(["/a.py"], list(state.path for _, state in closed))
+        self.assertEqual(1, len(self.states))
@@ -0,0 +1,69 @@
+from .event_loop import is_available, attach_logger, AsyncioStdioTransport
+from .test_transports import frame
+from threading import Event
+import subprocess
+import sys
+import unittest
+
+# echoes its stdin, and reports on stderr when it's done
+ECHO_SERVER = """
+import sys
+while True:
+    data = sys.stdin.buffer.read1(65536)
+    if not data:
+        break
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+sys.stderr.write("bye\\n")
+"""
+
+
+@unittest.skipUnless(is_available(), "asyncio engine not available")
+class AsyncioStdioTransportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.process = subprocess.Popen([sys.executable, "-c", ECHO_SERVER], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.received = []
+        self.all_received = Event()
+        self.closed = Event()
+        self.expected = 0
+
+    def tearDown(self):
+        self.process.wait(5)
+
+    def on_receive(self, content):
+        self.received.append(bytes(content))
+        if len(self.received) == self.expected:
+            self.all_received.set()
+
+    def test_round_trip(self):
+        logged = []
+        logged_event = Event()
+
+        def server_log(line):
+            logged.append(line)
+            logged_event.set()
+
+        attach_logger(self.process.stderr, server_log)
+        transport = AsyncioStdioTransport(self.process)
+        transport.start(self.on_receive, self.closed.set)
+        contents = [b'{"id": 1}', b'x' * 200000, b'{"id": 2}']
+        self.expected = len(contents)
+        for content in contents:
+            transport.send(frame(content))
+        self.assertTrue(self.all_received.wait(5))
+        self.assertEqual(contents, self.received)
+
+        transport.end()
+        self.assertTrue(self.closed.is_set())
+        self.assertTrue(logged_event.wait(5))
+        self.assertEqual(["bye"], logged)
+
+    def test_server_exit_closes_transport(self):
+        attach_logger(self.process.stderr)
+        transport = AsyncioStdioTransport(self.process)
+        transport.start(self.on_receive, self.closed.set)
+        self.process.kill()
+        self.assertTrue(self.closed.wait(5))
+        self.assertFalse(transport.running)
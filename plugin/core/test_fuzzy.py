@@ -0,0 +1,51 @@
+from .fuzzy import FuzzyMatcher, match_score, word_starts
+import unittest
+
+
+def positions(mask: int) -> 'list':
+    return [position for position in range(mask.bit_length()) if mask >> position & 1]
+
+
+class WordStartsTests(unittest.TestCase):
+
+    def test_word_starts(self):
+        self.assertEqual([0], positions(word_starts("value")))
+        self.assertEqual([0, 3, 7], positions(word_starts("getTimeOut")))
+        self.assertEqual([0, 4, 9], positions(word_starts("get_time_ms")))
+        self.assertEqual([1, 4], positions(word_starts("$hex2")))
+        self.assertEqual([0, 4], positions(word_starts("HTTPServer")))
+
+
+class MatchScoreTests(unittest.TestCase):
+
+    def score(self, query, text):
+        return match_score(query, text.lower(), word_starts(text))
+
+    def test_no_match(self):
+        self.assertIsNone(self.score("xyz", "getTime"))
+        self.assertIsNone(self.score("emit", "getTime"))
+
+    def test_word_starts_are_preferred(self):
+        self.assertGreater(self.score("gti", "get_time"), self.score("gti", "gettime"))
+        self.assertGreater(self.score("gt", "getTime"), self.score("gt", "gate"))
+
+    def test_prefix_beats_inner_match(self):
+        self.assertGreater(self.score("ti", "timer"), self.score("ti", "setTimer"))
+        self.assertGreater(self.score("set", "setTimer"), self.score("set", "reset"))
+
+
+class FuzzyMatcherTests(unittest.TestCase):
+
+    def test_scores(self):
+        matcher = FuzzyMatcher(["getTime", "get_time", "gate", "other"])
+        self.assertEqual(4, len(matcher))
+        scored = matcher.scores("GT", range(4))
+        self.assertEqual([0, 1, 2], [index for _, index in scored])
+        self.assertEqual(scored[0][0], scored[1][0])
+        self.assertGreater(scored[0][0], scored[2][0])
+        self.assertEqual([(0, 3)], matcher.scores("", [3]))
+
+    def test_falls_back_when_word_start_skips_too_far(self):
+        # the "a" at the word start leaves nothing for the "b"
+        matcher = FuzzyMatcher(["xab_a"])
+        self.assertEqual(1, len(matcher.scores("ab", range(1))))
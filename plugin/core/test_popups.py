@@ -0,0 +1,24 @@
+from .popups import render_cached, rendered_html
+import unittest
+
+
+class RenderCachedTests(unittest.TestCase):
+
+    def setUp(self):
+        rendered_html.clear()
+        self.rendered = []
+
+    def render(self, content):
+        self.rendered.append(content)
+        return "<p>{}</p>".format(content)
+
+    def test_renders_once(self):
+        self.assertEqual("<p>hello</p>", render_cached(self.render, "hello"))
+        self.assertEqual("<p>hello</p>", render_cached(self.render, "hello"))
+        self.assertEqual(["hello"], self.rendered)
+
+    def test_variants(self):
+        render_cached(self.render, "hello", ("hover", "Monokai.sublime-color-scheme"))
+        render_cached(self.render, "hello", ("hover", "Breakers.sublime-color-scheme"))
+        render_cached(self.render, "hello", ("hover", "Monokai.sublime-color-scheme"))
+        self.assertEqual(["hello", "hello"], self.rendered)
@@ -18,6 +18,13 @@ LSP_FULL_DIAGNOSTIC = {
     'source': 'pyls'
 }
 
+LSP_DIAGNOSTIC_WITH_CODE = {
+    'message': 'message',
+    'range': LSP_RANGE,
+    'code': 'E501',
+    'relatedInformation': []
+}
+
 
 class PointTests(unittest.TestCase):
 
@@ -61,6 +68,24 @@ class DiagnosticTests(unittest.TestCase):
         self.assertEqual(diag.source, 'pyls')
         self.assertEqual(diag.to_lsp(), LSP_FULL_DIAGNOSTIC)
 
+    def test_other_fields_conversion(self):
+        diag = Diagnostic.from_lsp(LSP_DIAGNOSTIC_WITH_CODE)
+        self.assertEqual(diag.severity, DiagnosticSeverity.Error)
+        self.assertEqual(diag.to_lsp(), LSP_DIAGNOSTIC_WITH_CODE)
+
+    def test_unknown_severity_conversion(self):
+        for severity in (None, 0, 5, "error"):
+            lsp_diagnostic = dict(LSP_MINIMAL_DIAGNOSTIC, severity=severity)
+            diag = Diagnostic.from_lsp(lsp_diagnostic)
+            self.assertEqual(diag.severity, DiagnosticSeverity.Error)
+            self.assertEqual(diag.to_lsp(), lsp_diagnostic)
+
+    def test_compact(self):
+        diag = Diagnostic.from_lsp(LSP_FULL_DIAGNOSTIC)
+        self.assertFalse(hasattr(diag, '__dict__'))
+        self.assertFalse(hasattr(diag.range, '__dict__'))
+        self.assertFalse(hasattr(diag.range.start, '__dict__'))
+
 
 class RequestTests(unittest.TestCase):
 
@@ -0,0 +1,77 @@
+from .rendering import PanelBlocks, diagnostic_key, reuse_rendered
+from .protocol import Diagnostic, Point, Range
+import unittest
+
+
+def diagnostic(row: int, message: str = "message") -> Diagnostic:
+    return Diagnostic(message, Range(Point(row, 0), Point(row, 4)), 1, "test")
+
+
+def apply_patches(text, patches):
+    for begin, end, characters in patches:
+        text = text[:begin] + characters + text[end:]
+    return text
+
+
+class ReuseRenderedTests(unittest.TestCase):
+
+    def render(self, diagnostic):
+        self.rendered_count += 1
+        return object()
+
+    def setUp(self):
+        self.rendered_count = 0
+
+    def test_reuses_what_did_not_change(self):
+        first = reuse_rendered([diagnostic(1), diagnostic(2)], {}, diagnostic_key, self.render)
+        self.assertEqual(2, self.rendered_count)
+        second = reuse_rendered([diagnostic(1), diagnostic(2, "changed"), diagnostic(3)], first,
+                                diagnostic_key, self.render)
+        self.assertEqual(4, self.rendered_count)
+        self.assertIs(first[diagnostic_key(diagnostic(1))], second[diagnostic_key(diagnostic(1))])
+        self.assertNotIn(diagnostic_key(diagnostic(2)), second)
+
+    def test_same_key_rendered_once(self):
+        # e.g. the same diagnostic from two sources
+        rendered = reuse_rendered([diagnostic(1), diagnostic(1)], {}, diagnostic_key, self.render)
+        self.assertEqual(1, len(rendered))
+        self.assertEqual(1, self.rendered_count)
+
+    def test_key_covers_range_and_message(self):
+        self.assertEqual(diagnostic_key(diagnostic(1)), diagnostic_key(diagnostic(1)))
+        self.assertNotEqual(diagnostic_key(diagnostic(1)), diagnostic_key(diagnostic(1, "other")))
+        moved = Diagnostic("message", Range(Point(1, 1), Point(1, 4)), 1, "test")
+        self.assertNotEqual(diagnostic_key(diagnostic(1)), diagnostic_key(moved))
+
+
+class PanelBlocksTests(unittest.TestCase):
+
+    def setUp(self):
+        self.blocks = PanelBlocks()
+        self.text = self.blocks.reset([("a", "a1\n"), ("b", "b1\nb2\n"), ("c", "c1\n")])
+
+    def update(self, changed):
+        self.text = apply_patches(self.text, self.blocks.update(changed))
+        self.assertEqual(self.blocks.text, self.text)
+
+    def test_reset(self):
+        self.assertEqual("a1\nb1\nb2\nc1\n", self.text)
+        self.assertEqual(3, len(self.blocks))
+
+    def test_replaces_blocks(self):
+        self.update({"a": "a1\na2\n", "c": "c2\n"})
+        self.assertEqual("a1\na2\nb1\nb2\nc2\n", self.text)
+
+    def test_removes_empty_blocks(self):
+        self.update({"b": ""})
+        self.assertEqual("a1\nc1\n", self.text)
+        self.assertEqual(["a", "c"], self.blocks.keys)
+
+    def test_appends_new_blocks(self):
+        self.update({"d": "d1\n", "a": ""})
+        self.assertEqual("b1\nb2\nc1\nd1\n", self.text)
+        self.assertEqual(["b", "c", "d"], self.blocks.keys)
+
+    def test_patches_ordered_from_the_end(self):
+        patches = self.blocks.update({"a": "A\n", "c": "C\n", "b": "b1\nb2\n"})
+        self.assertEqual([9, 0], list(patch[0] for patch in patches))
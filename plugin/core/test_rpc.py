@@ -1,8 +1,10 @@
-from .rpc import (format_request, Client)
+from .rpc import (format_request, Client, JsonCodec, load_codec, is_full_text_change, document_uri)
 from .transports import Transport
-from .protocol import (Request, Notification)
+from .dispatch import run_inline
+from .protocol import (Request, Notification, ErrorCode)
 import unittest
 import json
+import time
 try:
     from typing import Any, List, Dict, Tuple, Callable, Optional
     assert Any and List and Dict and Tuple and Callable and Optional
@@ -14,6 +16,7 @@ class TestSettings(object):
 
     def __init__(self):
         self.log_payloads = False
+        self.request_timeouts = {"slow": 5}
 
 
 def return_result(message):
@@ -25,6 +28,10 @@ def return_result(message):
     #     return '{"id": ' + str(request_id) + ', "result": {}}'
 
 
+def payload_of(message: bytes) -> 'Dict[str, Any]':
+    return json.loads(message.split(b"\r\n\r\n", 1)[1].decode("UTF-8"))
+
+
 def return_error(message):
     return '{"id": 1, "error": {"message": "oops"}}'
 
@@ -42,30 +49,70 @@ def notify_pong(message):
 
 class TestTransport(Transport):
     def __init__(self, responder=None):
-        self.messages = []  # type: List[str]
+        self.messages = []  # type: List[bytes]
         self.responder = responder
+        self.full = False
 
     def start(self, on_receive, on_closed):
         self.on_receive = on_receive
         self.on_closed = on_closed
         self.has_started = True
 
-    def send(self, message):
+    def send(self, message, uri=None, supersedable=False):
+        if self.full:
+            return False
         self.messages.append(message)
         if self.responder:
             self.on_receive(self.responder(message))
+        return True
 
     def receive(self, message):
         self.on_receive(message)
 
+    def end(self):
+        pass
+
     def close(self):
         self.on_closed()
 
 
 class FormatTests(unittest.TestCase):
 
-    def test_converts_payload_to_string(self):
-        self.assertEqual("Content-Length: 2\r\n\r\n{}", format_request(dict()))
+    def test_converts_payload_to_bytes(self):
+        self.assertEqual(b"Content-Length: 2\r\n\r\n{}", format_request(dict()))
+
+    def test_content_length_counts_bytes(self):
+        message = format_request({"text": "\u00e9\u6f22"}, JsonCodec())
+        header, content = message.split(b"\r\n\r\n", 1)
+        self.assertEqual("Content-Length: {}".format(len(content)).encode("ASCII"), header)
+
+
+class SupersedeTests(unittest.TestCase):
+
+    def test_full_text_change(self):
+        params = {"textDocument": {"uri": "file:///a"}, "contentChanges": [{"text": "all"}]}
+        self.assertTrue(is_full_text_change(Notification.didChange(params)))
+        self.assertEqual("file:///a", document_uri(params))
+
+    def test_incremental_change(self):
+        params = {
+            "textDocument": {"uri": "file:///a"},
+            "contentChanges": [{"range": {}, "text": "some"}]
+        }
+        self.assertFalse(is_full_text_change(Notification.didChange(params)))
+        self.assertFalse(is_full_text_change(Notification.didSave({"textDocument": {"uri": "file:///a"}})))
+
+
+class CodecTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        payload = {"id": 1, "result": {"items": [{"label": "caf\u00e9", "kind": 3}]}}
+        for codec in (JsonCodec(), load_codec()):
+            encoded = codec.encode(payload)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(payload, codec.decode(encoded))
+            self.assertEqual(payload, codec.decode(bytearray(encoded)))
+            self.assertEqual(payload, codec.decode(encoded.decode("UTF-8")))
 
 
 class ClientTest(unittest.TestCase):
@@ -76,6 +123,11 @@ class ClientTest(unittest.TestCase):
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
 
+    def test_clients_have_distinct_tokens(self):
+        # a restarted client may get the id() of the one it replaces, never its token
+        tokens = set(Client(TestTransport(), TestSettings()).token for _ in range(3))
+        self.assertEqual(3, len(tokens))
+
     def test_client_request_response(self):
         transport = TestTransport(return_result)
         settings = TestSettings()
@@ -166,3 +218,107 @@ class ClientTest(unittest.TestCase):
         req = Request.initialize(dict())
         client.send_request(req, lambda resp: raise_error('handler failed'))
         # exception would fail test if not handled in client
+
+    def test_cancel_request(self):
+        transport = TestTransport()
+        settings = TestSettings()
+        client = Client(transport, settings)
+        req = Request.initialize(dict())
+        responses = []
+        handle = client.send_request(req, lambda resp: responses.append(resp))
+        self.assertEqual(1, handle.request_id)
+        handle.cancel()
+        cancel = payload_of(transport.messages[-1])
+        self.assertEqual("$/cancelRequest", cancel["method"])
+        self.assertEqual({"id": 1}, cancel["params"])
+        transport.receive('{"id": 1, "result": {}}')
+        self.assertEqual(len(responses), 0)
+
+    def test_cancelled_error_is_not_displayed(self):
+        transport = TestTransport()
+        settings = TestSettings()
+        client = Client(transport, settings)
+        errors = []
+        client.set_error_display_handler(lambda err: errors.append(err))
+        handle = client.send_request(Request.initialize(dict()), lambda resp: None)
+        handle.cancel()
+        transport.receive('{"id": 1, "error": {"code": -32800, "message": "cancelled"}}')
+        self.assertEqual(len(errors), 0)
+
+    def test_pending_request_removed_on_response(self):
+        transport = TestTransport(return_result)
+        client = Client(transport, TestSettings())
+        client.send_request(Request.initialize(dict()), lambda resp: None)
+        self.assertEqual(0, client.pending_request_count)
+
+    def test_request_timeout(self):
+        transport = TestTransport()
+        client = Client(transport, TestSettings())
+        errors = []
+        handle = client.send_request(Request("slow", None), lambda resp: None, lambda err: errors.append(err))
+        client.send_request(Request.initialize(dict()), lambda resp: None)
+        self.assertEqual(2, client.pending_request_count)
+        client.expire_requests(time.time() + 10)
+        self.assertEqual(1, client.pending_request_count)
+        self.assertEqual(1, client.expired_request_count)
+        self.assertEqual(1, len(errors))
+        self.assertEqual({"id": handle.request_id}, payload_of(transport.messages[-1])["params"])
+        self.assertEqual(ErrorCode.RequestTimedOut, errors[0]["code"])
+
+    def test_request_timeout_reported_once(self):
+        client = Client(TestTransport(), TestSettings())
+        now = time.time() + 10
+        errors = []  # type: List[Dict[str, Any]]
+
+        def expire_again(error):
+            # e.g. the timer expiring requests on another thread at the same time
+            errors.append(error)
+            client.expire_requests(now)
+
+        client.send_request(Request("slow", None), lambda resp: None, expire_again)
+        client.send_request(Request("slow", None), lambda resp: None, expire_again)
+        client.expire_requests(now)
+        self.assertEqual(2, client.expired_request_count)
+        self.assertEqual(2, len(errors))
+
+    def test_exit_closes_dispatcher(self):
+        client = Client(TestTransport(), TestSettings(), executor=run_inline)
+        dispatcher = client.dispatcher
+        assert dispatcher is not None
+        client.exit()
+        dispatcher._thread.join(5)
+        self.assertFalse(dispatcher._thread.is_alive())
+
+    def test_defers_messages_while_transport_is_full(self):
+        transport = TestTransport()
+        timers = []  # type: List[Tuple[Callable, int]]
+        client = Client(transport, TestSettings(), schedule=lambda f, delay: timers.append((f, delay)))
+        transport.full = True
+        client.send_notification(Notification("first", {}))
+        client.send_notification(Notification("second", {}))
+        self.assertEqual([], transport.messages)
+        self.assertTrue(client.is_congested())
+        self.assertEqual(1, len(timers))
+        timers.pop()[0]()
+        self.assertEqual(1, len(timers))
+        transport.full = False
+        client.send_notification(Notification("third", {}))
+        self.assertEqual([], transport.messages)
+        timers.pop()[0]()
+        self.assertEqual(["first", "second", "third"], list(payload_of(m)["method"] for m in transport.messages))
+        self.assertFalse(client.is_congested())
+        self.assertEqual([], timers)
+
+    def test_request_timeout_without_traffic(self):
+        timers = []  # type: List[Tuple[Callable, int]]
+        client = Client(TestTransport(), TestSettings(), schedule=lambda f, delay: timers.append((f, delay)))
+        errors = []  # type: List[Dict[str, Any]]
+        client.send_request(Request("slow", None), lambda resp: None, lambda err: errors.append(err))
+        client.send_request(Request("slow", None), lambda resp: None, lambda err: errors.append(err))
+        self.assertEqual(1, len(timers))
+        self.assertLessEqual(timers[0][1], 5000)
+        for pending in client._pending_requests.values():
+            pending.deadline = time.time() - 1
+        timers[0][0]()
+        self.assertEqual(0, client.pending_request_count)
+        self.assertEqual(2, len(errors))
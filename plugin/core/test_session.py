@@ -2,7 +2,7 @@
 # from .protocol import (Request, Notification)
 # from .clients import create_session, ClientConfig, ConfigState, ClientStates
 from .types import ClientConfig, ClientStates, Settings
-from .sessions import create_session
+from .sessions import create_session, SessionIndex, SessionPool
 from .protocol import Request, Notification
 
 import unittest
@@ -21,13 +21,16 @@ class TestClient():
             'initialize': {"capabilities": dict(testing=True)}
         }  # type: dict
 
-    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Callable'=None):
+    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Optional[Callable]' = None):
         response = self.responses.get(request.method)
         on_success(response)
 
     def send_notification(self, notification: Notification):
         pass
 
+    def exit(self):
+        pass
+
 
 def attach_test_client():
     return TestClient()
@@ -83,3 +86,158 @@ class SessionTest(unittest.TestCase):
         self.assertFalse(session.has_capability("testing"))
         self.assertIsNone(session.get_capability("testing"))
         ended_callback.assert_called_once()
+
+
+class DelayedTestClient(TestClient):
+    """Answers initialize when told to"""
+    def __init__(self):
+        super().__init__()
+        self.pending = []  # type: List[Callable]
+
+    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Optional[Callable]' = None):
+        response = self.responses.get(request.method)
+        self.pending.append(lambda: on_success(response))
+
+    def respond(self):
+        pending, self.pending = self.pending, []
+        for respond in pending:
+            respond()
+
+
+class SessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = SessionPool()
+        self.config = ClientConfig("test", [], None, ["source.test"], ["Test.sublime-syntax"], "test")
+        self.clients = []  # type: List[DelayedTestClient]
+        self.ended = unittest.mock.Mock()
+
+    def start(self, on_created, on_ended):
+        client = DelayedTestClient()
+        self.clients.append(client)
+        return create_session(self.config, "/project", dict(), Settings(), bootstrap_client=client,
+                              on_created=on_created, on_ended=on_ended)
+
+    def acquire(self, window_id, on_ready, project_path="/project"):
+        return self.pool.acquire("test", project_path, window_id, self.start, on_ready, self.ended)
+
+    def test_windows_share_session(self):
+        ready_1 = unittest.mock.Mock()
+        ready_2 = unittest.mock.Mock()
+        session = self.acquire(1, ready_1)
+        self.assertIs(session, self.acquire(2, ready_2))
+        self.assertEqual(1, len(self.clients))
+        ready_1.assert_not_called()
+
+        self.clients[0].respond()
+        ready_1.assert_called_once_with(session)
+        ready_2.assert_called_once_with(session)
+
+        # joining a ready session is ready right away
+        ready_3 = unittest.mock.Mock()
+        self.assertIs(session, self.acquire(3, ready_3))
+        ready_3.assert_called_once_with(session)
+        self.assertEqual([1, 2, 3], self.pool.window_ids(session))
+
+    def test_other_project_gets_own_session(self):
+        session = self.acquire(1, unittest.mock.Mock())
+        self.assertIsNot(session, self.acquire(1, unittest.mock.Mock(), "/other"))
+        self.assertEqual(2, len(self.pool))
+
+    def test_last_release_ends(self):
+        session = self.acquire(1, unittest.mock.Mock())
+        self.acquire(2, unittest.mock.Mock())
+        self.clients[0].respond()
+
+        self.assertFalse(self.pool.release(session, 1))
+        self.assertEqual([2], self.pool.window_ids(session))
+        self.assertTrue(self.pool.release(session, 2))
+        self.assertIsNone(self.pool.get("test", "/project"))
+
+        session.end()
+        self.clients[0].respond()
+        self.ended.assert_called_once_with(session, [2])
+
+    def test_released_window_is_not_notified(self):
+        ready_2 = unittest.mock.Mock()
+        session = self.acquire(1, unittest.mock.Mock())
+        self.acquire(2, ready_2)
+        self.pool.release(session, 2)
+        self.clients[0].respond()
+        ready_2.assert_not_called()
+
+    def test_stopping_session_is_replaced(self):
+        session = self.acquire(1, unittest.mock.Mock())
+        self.clients[0].respond()
+        session.state = ClientStates.STOPPING
+        replacement = self.acquire(1, unittest.mock.Mock())
+        self.assertIsNot(session, replacement)
+        self.assertIs(replacement, self.pool.get("test", "/project"))
+        # the stopping session is no longer pooled, so its last user ends it
+        self.assertTrue(self.pool.release(session, 1))
+
+
+class SessionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SessionIndex()
+        config = ClientConfig("test", [], None, ["source.test"], ["Test.sublime-syntax"], "test")
+        self.session = create_session(config, "/", dict(), Settings(), bootstrap_client=TestClient())
+
+    def test_found_for_same_syntax_revision_and_window(self):
+        self.index.put(1, "source.test", "Test.sublime-syntax", 1, 10, 100, self.session)
+        self.assertEqual((True, self.session), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 50))
+        self.assertEqual((False, None), self.index.get(1, "source.test", "Other.sublime-syntax", 1, 10, 50))
+        self.assertEqual((False, None), self.index.get(1, "source.test", "Test.sublime-syntax", 2, 10, 50))
+        # a tab moved to another window
+        self.assertEqual((False, None), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 11, 50))
+
+    def test_found_per_scope(self):
+        # e.g. the script and style sections of an HTML view, served by different sessions
+        other_session = create_session(ClientConfig("other", [], None, ["source.js"], ["Test.sublime-syntax"], "js"),
+                                       "/", dict(), Settings(), bootstrap_client=TestClient())
+        self.index.put(1, "source.test", "Test.sublime-syntax", 1, 10, 100, self.session)
+        self.assertEqual((False, None), self.index.get(1, "source.js", "Test.sublime-syntax", 1, 10, 50))
+        self.index.put(1, "source.js", "Test.sublime-syntax", 1, 10, 100, other_session)
+        self.assertEqual((True, self.session), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 50))
+        self.assertEqual((True, other_session), self.index.get(1, "source.js", "Test.sublime-syntax", 1, 10, 50))
+        self.index.forget_sessions([other_session])
+        self.assertEqual((True, self.session), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 50))
+
+    def test_checks_size_on_every_lookup(self):
+        self.index.put(1, "source.test", "Test.sublime-syntax", 1, 10, 100, self.session)
+        self.assertEqual((True, None), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 101))
+        self.assertEqual((True, self.session), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 100))
+
+    def test_too_large_file_is_looked_up_again_once_it_fits(self):
+        self.index.put(1, "source.test", "Test.sublime-syntax", 1, 10, 100, None)
+        self.assertEqual((True, None), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 200))
+        self.assertEqual((False, None), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 100))
+
+    def test_session_not_ready_is_looked_up_again(self):
+        self.index.put(1, "source.test", "Test.sublime-syntax", 1, 10, 100, self.session)
+        self.session.state = ClientStates.STOPPING
+        self.assertEqual((False, None), self.index.get(1, "source.test", "Test.sublime-syntax", 1, 10, 50))
+
+    def test_forget_sessions(self):
+        self.index.put(1, "source.test", "Test.sublime-syntax", 1, 10, 100, self.session)
+        self.index.put(2, "source.test", "Test.sublime-syntax", 1, 10, 100, None)
+        self.index.forget_sessions([self.session])
+        self.assertEqual(1, len(self.index))
+        self.index.forget(2)
+        self.assertEqual(0, len(self.index))
+
+
+class MaxFileSizeTest(unittest.TestCase):
+
+    def test_defaults_to_global_setting(self):
+        config = ClientConfig("test", [], None, ["source.test"])
+        self.assertEqual(1000000, config.get_max_file_size(Settings().max_file_size))
+
+    def test_set_per_client(self):
+        config = ClientConfig("test", [], None, ["source.test"], max_file_size=5000)
+        self.assertEqual(5000, config.get_max_file_size(1000000))
+        config.apply_settings({"max_file_size": 200})
+        self.assertEqual(200, config.get_max_file_size(1000000))
+        config.apply_settings({"max_file_size": None})
+        self.assertEqual(1000000, config.get_max_file_size(1000000))
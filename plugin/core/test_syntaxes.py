@@ -0,0 +1,37 @@
+from .syntaxes import SyntaxMatcher
+from .types import ClientConfig
+import unittest
+
+
+def config(name: str, *syntaxes: str) -> ClientConfig:
+    return ClientConfig(name, [], None, {name: {"scopes": ["source." + name], "syntaxes": list(syntaxes)}})
+
+
+class SyntaxMatcherTests(unittest.TestCase):
+
+    def test_matches_whole_words(self):
+        matcher = SyntaxMatcher([config("python", "Python"), config("go", "Go")])
+        self.assertTrue(matcher.matches("Packages/Python/Python.sublime-syntax"))
+        self.assertTrue(matcher.matches("Packages/go/go.sublime-syntax"))
+        self.assertFalse(matcher.matches("Packages/Gopher/Gopher.sublime-syntax"))
+        self.assertFalse(matcher.matches("Packages/Text/Plain text.tmLanguage"))
+
+    def test_escapes_syntaxes(self):
+        matcher = SyntaxMatcher([config("objc", "Objective.C")])
+        self.assertTrue(matcher.matches("Packages/Objective-C/Objective.C.sublime-syntax"))
+        self.assertFalse(matcher.matches("Packages/Objective-C/Objective-C.sublime-syntax"))
+
+    def test_no_configs(self):
+        matcher = SyntaxMatcher([])
+        self.assertFalse(matcher.matches("Packages/Python/Python.sublime-syntax"))
+        self.assertFalse(matcher.matches(None))
+
+    def test_config_without_syntaxes_matches_any(self):
+        matcher = SyntaxMatcher([config("python", "Python"), config("any")])
+        self.assertTrue(matcher.matches("Packages/Text/Plain text.tmLanguage"))
+
+    def test_results_are_cached(self):
+        matcher = SyntaxMatcher([config("python", "Python")])
+        self.assertTrue(matcher.matches("Packages/Python/Python.sublime-syntax"))
+        matcher._pattern = None
+        self.assertTrue(matcher.matches("Packages/Python/Python.sublime-syntax"))
@@ -0,0 +1,154 @@
+from .transports import FrameDecoder, OutboundQueue, TCPTransport
+import socket
+import unittest
+try:
+    from typing import List
+    assert List
+except ImportError:
+    pass
+
+
+def frame(content: bytes) -> bytes:
+    return b"Content-Length: " + str(len(content)).encode() + b"\r\n\r\n" + content
+
+
+class ChunkedReader(object):
+    def __init__(self, data: bytes, max_read: int) -> None:
+        self.data = memoryview(data)
+        self.pos = 0
+        self.max_read = max_read
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self.max_read, len(self.data) - self.pos)
+        buffer[:count] = self.data[self.pos:self.pos + count]
+        self.pos += count
+        return count
+
+
+class FrameDecoderTests(unittest.TestCase):
+
+    def test_single_message(self):
+        decoder = FrameDecoder()
+        decoder.feed(frame(b'{"id": 1}'))
+        self.assertEqual([b'{"id": 1}'], list(decoder.messages()))
+        self.assertEqual([], list(decoder.messages()))
+
+    def test_multiple_messages_in_one_read(self):
+        decoder = FrameDecoder()
+        decoder.feed(frame(b'{}') + frame(b'[]') + b"Content-Le")
+        self.assertEqual([b'{}', b'[]'], list(decoder.messages()))
+        decoder.feed(b"ngth: 4\r\n\r\nnu")
+        self.assertEqual([], list(decoder.messages()))
+        decoder.feed(b"ll")
+        self.assertEqual([b'null'], list(decoder.messages()))
+
+    def test_extra_headers(self):
+        decoder = FrameDecoder()
+        decoder.feed(b"Content-Type: application/vscode-jsonrpc\r\ncontent-length: 2\r\n\r\n{}")
+        self.assertEqual([b'{}'], list(decoder.messages()))
+
+    def test_byte_at_a_time(self):
+        contents = [b'{"a": "\xc3\xa9"}', b'x' * 1000, b'{}']
+        reader = ChunkedReader(b"".join(frame(c) for c in contents), 1)
+        decoder = FrameDecoder(chunk_size=16)
+        received = []  # type: List[bytearray]
+        while decoder.read_from(reader.readinto):
+            received.extend(decoder.messages())
+        self.assertEqual(contents, received)
+
+    def test_large_message_read_at_once(self):
+        content = b'x' * (1024 * 1024)
+        reader = ChunkedReader(frame(content), len(content) * 2)
+        decoder = FrameDecoder(chunk_size=1024)
+        decoder.read_from(reader.readinto)  # headers and the start of the content
+        self.assertEqual([], list(decoder.messages()))
+        decoder.read_from(reader.readinto)  # the rest of the content in a single read
+        self.assertEqual([content], list(decoder.messages()))
+
+
+class OutboundQueueTests(unittest.TestCase):
+
+    def test_takes_all_queued_frames(self):
+        queue = OutboundQueue()
+        for frame_content in (b'a', b'b', b'c'):
+            queue.put(frame_content)
+        self.assertEqual(([b'a', b'b', b'c'], False), queue.take_all())
+        self.assertEqual(0, len(queue))
+
+    def test_takes_at_most_a_batch(self):
+        queue = OutboundQueue()
+        queue.put(b'a')
+        queue.put(b'b')
+        queue.put(b'change 1', "file:///a", True)
+        queue.close()
+        self.assertEqual(([b'a', b'b'], False), queue.take_all(max_frames=2))
+        # what is left over can still be superseded
+        queue.put(b'change 2', "file:///a", True)
+        self.assertEqual(([b'change 2'], True), queue.take_all(max_frames=2))
+
+    def test_close_after_queued_frames(self):
+        queue = OutboundQueue()
+        queue.put(b'a')
+        queue.close()
+        self.assertEqual(([b'a'], True), queue.take_all())
+
+    def test_supersedes_unsent_full_text_change(self):
+        queue = OutboundQueue()
+        queue.put(b'other', "file:///b")
+        queue.put(b'change 1', "file:///a", True)
+        queue.put(b'request', "file:///b")
+        queue.put(b'change 2', "file:///a", True)
+        self.assertEqual(([b'other', b'change 2', b'request'], False), queue.take_all())
+        self.assertEqual(1, queue.superseded_count)
+
+    def test_does_not_supersede_across_document_messages(self):
+        queue = OutboundQueue()
+        queue.put(b'change 1', "file:///a", True)
+        queue.put(b'hover', "file:///a")
+        queue.put(b'change 2', "file:///a", True)
+        self.assertEqual(([b'change 1', b'hover', b'change 2'], False), queue.take_all())
+
+    def test_does_not_supersede_sent_frames(self):
+        queue = OutboundQueue()
+        queue.put(b'change 1', "file:///a", True)
+        queue.take_all()
+        queue.put(b'change 2', "file:///a", True)
+        self.assertEqual(([b'change 2'], False), queue.take_all())
+
+    def test_backpressure(self):
+        queue = OutboundQueue(max_bytes=4)
+        self.assertTrue(queue.put(b'abc'))
+        self.assertFalse(queue.congested)
+        self.assertFalse(queue.put(b'de', timeout=0.01))
+        self.assertTrue(queue.put(b'd'))
+        self.assertTrue(queue.congested)
+        queue.take_all()
+        self.assertFalse(queue.congested)
+
+    def test_oversized_frame_fits_empty_queue(self):
+        queue = OutboundQueue(max_bytes=4)
+        self.assertTrue(queue.put(b'too large', timeout=0.01))
+
+
+class TCPTransportTests(unittest.TestCase):
+
+    def test_end_writes_queued_frames_first(self):
+        client_socket, server_socket = socket.socketpair()
+        self.addCleanup(server_socket.close)
+        closed = []  # type: List[bool]
+        transport = TCPTransport(client_socket)
+        transport.start(lambda content: None, lambda: closed.append(True))
+        self.addCleanup(transport.close)
+        self.assertTrue(transport.send(frame(b'{"method": "exit"}')))
+        transport.end()
+        transport.write_thread.join(5)
+        self.assertFalse(transport.write_thread.is_alive())
+        self.assertEqual([True], closed)
+        received = b""
+        server_socket.settimeout(5)
+        while True:
+            data = server_socket.recv(1024)
+            if not data:
+                break
+            received += data
+        self.assertEqual(frame(b'{"method": "exit"}'), received)
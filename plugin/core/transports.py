@@ -1,11 +1,18 @@
 import re
-from queue import Queue
+from collections import deque
 from abc import ABCMeta, abstractmethod
 import threading
 import time
 import socket
+from socket import SHUT_RDWR
 from .logging import exception_log, debug
 
+try:
+    from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+    assert Any and Callable and Dict and Iterator and List and Optional and Tuple
+except ImportError:
+    pass
+
 CONTENT_LENGTH_RE = re.compile(br'Content-Length:\s*(\d+)', re.IGNORECASE)
 TCP_CONNECT_TIMEOUT = 5
 
@@ -24,23 +31,182 @@ class Transport(object, metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def send(self, message):
+    def send(self, message, uri=None, supersedable=False) -> bool:
+        """Queues the message without blocking, returns False if there is no room for it"""
         pass
 
-
-STATE_HEADERS = 0
-STATE_CONTENT = 1
-
-
-def start_tcp_transport(port):
+    def is_congested(self) -> bool:
+        return False
+
+
+MAX_QUEUED_BYTES = 32 * 1024 * 1024
+MAX_WRITE_BATCH = 64
+
+
+class OutboundQueue(object):
+    """
+    Frames waiting to be written to the server.
+
+    The queue is bounded by the size of its frames: put() waits for room
+    up to its timeout. Transports don't wait at all, as messages are sent
+    from Sublime's main thread too, and leave a full queue to the client.
+    A frame marked as supersedable (e.g. a full-text didChange) is
+    replaced by a newer supersedable frame for the same document, as long
+    as nothing else about that document was queued in between.
+    """
+    def __init__(self, max_bytes: int = MAX_QUEUED_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.superseded_count = 0
+        self._entries = deque()  # type: deque
+        self._last_entry_by_uri = {}  # type: Dict[str, List[Any]]
+        self._size = 0
+        self._closing = False
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def congested(self) -> bool:
+        return self._size >= self.max_bytes
+
+    def put(self, frame: bytes, uri: 'Optional[str]' = None, supersedable: bool = False,
+            timeout: 'Optional[float]' = None) -> bool:
+        """Queues a frame, returns False if there was no room for it within the timeout"""
+        with self._condition:
+            if supersedable and uri is not None:
+                entry = self._last_entry_by_uri.get(uri)
+                if entry and entry[2]:
+                    self._size += len(frame) - len(entry[0])
+                    entry[0] = frame
+                    self.superseded_count += 1
+                    return True
+            deadline = time.time() + timeout if timeout is not None else None
+            while self._entries and self._size + len(frame) > self.max_bytes and not self._closing:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            entry = [frame, uri, supersedable]
+            self._entries.append(entry)
+            if uri is not None:
+                self._last_entry_by_uri[uri] = entry
+            self._size += len(frame)
+            self._condition.notify_all()
+            return True
+
+    def close(self) -> None:
+        """Lets the writer finish the queued frames and then close"""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+
+    def take_all(self, block: bool = True, max_frames: int = MAX_WRITE_BATCH) -> 'Tuple[List[bytes], bool]':
+        """
+        Waits for frames and takes all of them, up to max_frames, so a backlog
+        is written at once without a single write growing without bound.
+        Returns the frames and whether the transport should close after writing them.
+        """
+        with self._condition:
+            while block and not self._entries and not self._closing:
+                self._condition.wait()
+            frames = []  # type: List[bytes]
+            while self._entries and len(frames) < max_frames:
+                entry = self._entries.popleft()
+                frame, uri = entry[0], entry[1]
+                frames.append(frame)
+                self._size -= len(frame)
+                if uri is not None and self._last_entry_by_uri.get(uri) is entry:
+                    del self._last_entry_by_uri[uri]
+            self._condition.notify_all()
+            return frames, self._closing and not self._entries
+
+
+READ_CHUNK_SIZE = 64 * 1024
+IDLE_BUFFER_SIZE = 1024 * 1024
+
+
+class FrameDecoder(object):
+    """
+    Splits a stream of LSP messages into their content.
+
+    Data is read straight into one growable buffer and complete messages
+    are found with read offsets, so no intermediate copies are made while
+    a large message is arriving.
+    """
+    def __init__(self, chunk_size: int = READ_CHUNK_SIZE) -> None:
+        self.chunk_size = chunk_size
+        self._buffer = bytearray(chunk_size)
+        self._start = 0  # first byte not consumed yet
+        self._end = 0  # end of the received data
+        self._content_length = -1  # -1 while reading headers
+
+    def _reserve(self, size: int) -> None:
+        if len(self._buffer) - self._end >= size:
+            return
+        pending = self._end - self._start
+        if self._start:
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, pending
+        missing = size - (len(self._buffer) - self._end)
+        if missing > 0:
+            self._buffer.extend(bytearray(missing))
+
+    def read_from(self, read_into: 'Callable[[memoryview], int]') -> int:
+        """
+        Reads once with read_into (e.g. socket.recv_into) and returns the number of bytes read.
+        The read is large enough to receive the rest of the current message at once.
+        """
+        size = self.chunk_size
+        if self._content_length > 0:
+            size = max(size, self._content_length - (self._end - self._start))
+        self._reserve(size)
+        with memoryview(self._buffer)[self._end:] as view:
+            count = read_into(view) or 0
+        self._end += count
+        return count
+
+    def feed(self, data: bytes) -> None:
+        self._reserve(len(data))
+        self._buffer[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def messages(self) -> 'Iterator[bytearray]':
+        """Yields the content of every complete message received so far"""
+        while True:
+            if self._content_length < 0:
+                headers_end = self._buffer.find(b"\r\n\r\n", self._start, self._end)
+                if headers_end < 0:
+                    break
+                match = CONTENT_LENGTH_RE.search(self._buffer, self._start, headers_end)
+                self._start = headers_end + 4
+                if match:
+                    self._content_length = int(match.group(1))
+                if self._content_length <= 0:
+                    self._content_length = -1
+                    continue
+            stop = self._start + self._content_length
+            if stop > self._end:
+                break
+            content = self._buffer[self._start:stop]
+            self._start = stop
+            self._content_length = -1
+            yield content
+        if self._start == self._end:
+            self._start = self._end = 0
+            if len(self._buffer) > IDLE_BUFFER_SIZE:
+                # don't hold on to the memory of a huge message
+                self._buffer = bytearray(self.chunk_size)
+
+
+def connect_tcp(port):
     host = "localhost"
     start_time = time.time()
     debug('connecting to {}:{}'.format(host, port))
 
     while time.time() - start_time < TCP_CONNECT_TIMEOUT:
         try:
-            sock = socket.create_connection((host, port))
-            return TCPTransport(sock)
+            return socket.create_connection((host, port))
         except ConnectionRefusedError:
             pass
 
@@ -48,193 +214,180 @@ def start_tcp_transport(port):
     raise Exception("Timeout connecting to socket")
 
 
+def start_tcp_transport(port):
+    return TCPTransport(connect_tcp(port))
+
+
 class TCPTransport(Transport):
     def __init__(self, socket):
         self.socket = socket
         self.running = None
+        self._close_lock = threading.Lock()
 
     def start(self, on_receive, on_closed):
         self.running = True
         self.on_receive = on_receive
         self.on_closed = on_closed
-        self.queue = Queue()
+        self.queue = OutboundQueue()
         self.read_thread = threading.Thread(target=self.read_socket)
         self.read_thread.start()
         self.write_thread = threading.Thread(target=self.write_socket)
         self.write_thread.start()
 
     def end(self):
-        self.close()
+        # the write thread closes the socket once the frames queued so far are written
+        self.queue.close()
 
     def close(self):
         self.running = False
-        self.queue.put(None)
-        socket = self.socket
+        self.queue.close()
+        with self._close_lock:
+            # the reader and the writer may both close, only one reports it
+            socket, self.socket = self.socket, None
         if socket:
+            try:
+                # wakes up the read thread and tells the server, close() alone does neither
+                socket.shutdown(SHUT_RDWR)
+            except OSError:
+                pass  # already disconnected
             socket.close()
-            self.socket = None
             self.on_closed()
 
     def read_socket(self):
-        remaining_data = b""
-        read_state = STATE_HEADERS
-        content_length = 0
+        decoder = FrameDecoder()
         socket = self.socket
         while self.running and socket:
             try:
                 if self.socket is not socket:
                     raise IOError("Closed socket")
-                received_data = socket.recv(4096)
+                received = decoder.read_from(socket.recv_into)
             except Exception as err:
                 if self.running:
                     self.close()
                     exception_log("Failure reading from socket", err)
                 break
 
-            if not received_data:
+            if not received:
                 debug("no data received, closing")
                 self.close()
                 break
 
-            data = remaining_data + received_data
-            remaining_data = b""
-
-            is_incomplete = False
-            while len(data) > 0 and not is_incomplete:
-                if read_state == STATE_HEADERS:
-                    headers, _sep, rest = data.partition(b"\r\n\r\n")
-                    if len(_sep) < 1:
-                        is_incomplete = True
-                        remaining_data = data
-                    else:
-                        for header in headers.split(b"\r\n"):
-                            match = CONTENT_LENGTH_RE.match(header)
-                            if match:
-                                content_length = int(match.group(1))
-                                read_state = STATE_CONTENT
-                        data = rest
-
-                if read_state == STATE_CONTENT:
-                    # read content bytes
-                    if len(data) >= content_length:
-                        content = data[:content_length]
-                        self.on_receive(content.decode("UTF-8"))
-                        data = data[content_length:]
-                        read_state = STATE_HEADERS
-                    else:
-                        is_incomplete = True
-                        remaining_data = data
+            for content in decoder.messages():
+                self.on_receive(content)
 
         debug("socket read thread ended.")
 
     def write_socket(self):
         socket = self.socket
         while self.running and socket:
-            message = self.queue.get()
-            if message is None:
-                self.close()
-                break
+            frames, closing = self.queue.take_all()
             try:
-                if self.socket is not socket:
-                    raise IOError("Closed socket")
-                debug('socket send')
-                socket.sendall(bytes(message, 'UTF-8'))
+                if frames:
+                    if self.socket is not socket:
+                        raise IOError("Closed socket")
+                    debug('socket send', len(frames))
+                    socket.sendall(b"".join(frames))
             except Exception as err:
                 if self.running:
                     self.close()
                     exception_log("Failure writing to stdin", err)
                 break
+            if closing:
+                self.close()
+                break
 
         debug("socket write thread ended.")
 
-    def send(self, message):
-        self.queue.put(message)
+    def send(self, message, uri=None, supersedable=False) -> bool:
+        return self.queue.put(message, uri, supersedable, timeout=0)
+
+    def is_congested(self) -> bool:
+        return self.queue.congested
 
 
 class StdioTransport(Transport):
     def __init__(self, process):
         self.process = process
         self.running = None
+        self._close_lock = threading.Lock()
 
     def start(self, on_receive, on_closed):
         self.running = True
         self.on_receive = on_receive
         self.on_closed = on_closed
-        self.queue = Queue()
+        self.queue = OutboundQueue()
         self.stdout_thread = threading.Thread(target=self.read_stdout)
         self.stdout_thread.start()
         self.stdin_thread = threading.Thread(target=self.write_stdin)
         self.stdin_thread.start()
 
     def end(self):
-        self.close()
+        # the stdin thread closes the streams once the frames queued so far are written
+        self.queue.close()
 
     def close(self):
         self.running = False
-        self.queue.put(None)
-        process = self.process
+        self.queue.close()
+        with self._close_lock:
+            process, self.process = self.process, None
         if process:
-            process.stdin.close()
+            try:
+                process.stdin.close()
+            except OSError:
+                pass  # the server is gone before what was buffered could be flushed
             process.stdout.close()
-            self.process = None
             self.on_closed()
 
     def read_stdout(self):
         """
         Reads JSON responses from process and dispatch them to response_handler
         """
+        decoder = FrameDecoder()
         process = self.process
+        # read from the unbuffered stream, the decoder does the buffering
+        stdout = getattr(process.stdout, 'raw', process.stdout)
         while self.running and process and process.poll() is None:
             try:
-                content_length = 0
-
-                while True:
-                    if self.process is not process:
-                        raise IOError("Closed process")
-                    header = process.stdout.readline()
-                    if not header:
-                        raise IOError("Closed stream")
-                    header = header.strip()
-                    if not header:
-                        # End of headers, break
-                        break
-                    match = CONTENT_LENGTH_RE.match(header)
-                    if match:
-                        content_length = int(match.group(1))
-
-                if not content_length:
-                    continue
-
-                content = process.stdout.read(content_length)
-
+                if self.process is not process:
+                    raise IOError("Closed process")
+                if not decoder.read_from(stdout.readinto):
+                    raise IOError("Closed stream")
+                messages = list(decoder.messages())
             except Exception as err:
                 if self.running:
                     self.close()
                     exception_log("Failure reading stdout", err)
                 break
 
-            self.on_receive(content.decode("UTF-8"))
+            for content in messages:
+                self.on_receive(content)
 
+        if self.running:
+            # the server exited, the stdin thread would wait for frames forever
+            self.close()
         debug("stdout thread ended.")
 
     def write_stdin(self):
         process = self.process
         while self.running and process and process.poll() is None:
-            message = self.queue.get()
-            if message is None:
-                self.close()
-                break
-            message = bytes(message, 'UTF-8')
+            frames, closing = self.queue.take_all()
             try:
-                process.stdin.write(message)
-                process.stdin.flush()
+                if frames:
+                    process.stdin.write(b"".join(frames))
+                    process.stdin.flush()
             except Exception as err:
                 if self.running:
                     self.close()
                     exception_log("Failure writing to stdin", err)
                 break
+            if closing:
+                self.close()
+                break
 
         debug("stdin thread ended.")
 
-    def send(self, message):
-        self.queue.put(message)
+    def send(self, message, uri=None, supersedable=False) -> bool:
+        return self.queue.put(message, uri, supersedable, timeout=0)
+
+    def is_congested(self) -> bool:
+        return self.queue.congested
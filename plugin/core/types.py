@@ -1,3 +1,10 @@
+try:
+    from typing import Dict, List
+    assert Dict and List
+except ImportError:
+    pass
+
+
 class Settings(object):
 
     def __init__(self):
@@ -26,6 +33,13 @@ class Settings(object):
         self.log_server = True
         self.log_stderr = False
         self.log_payloads = False
+        self.request_timeouts = {}  # type: Dict[str, float]
+        self.handler_executor = "async"
+        self.warm_start_clients = []  # type: List[str]
+        self.max_file_size = 1000000
+        self.diagnostics_delay_ms = 100
+        self.max_completion_items = 200
+        self.response_cache_sizes = {}  # type: Dict[str, int]
 
 
 class ClientStates(object):
@@ -45,7 +59,8 @@ class ConfigState(object):
 
 class ClientConfig(object):
     def __init__(self, name, binary_args, tcp_port, languages,
-                 enabled=True, init_options=dict(), settings=dict(), env=dict()):
+                 enabled=True, init_options=dict(), settings=dict(), env=dict(), transport_engine="threads",
+                 max_file_size=None):
         self.name = name
         self.binary_args = binary_args
         self.tcp_port = tcp_port
@@ -54,6 +69,8 @@ class ClientConfig(object):
         self.init_options = init_options
         self.settings = settings
         self.env = env
+        self.transport_engine = transport_engine
+        self.max_file_size = max_file_size
 
     @property
     def syntaxes(self):
@@ -82,10 +99,18 @@ class ClientConfig(object):
             self.settings = settings.get("settings", dict())
         if "env" in settings:
             self.env = settings.get("env", dict())
+        if "transport_engine" in settings:
+            self.transport_engine = settings.get("transport_engine", "threads")
+        if "max_file_size" in settings:
+            self.max_file_size = settings.get("max_file_size", None)
 
     def get_settings(self, window):
         return self.settings
 
+    def get_max_file_size(self, default: int) -> int:
+        """The size of the largest file sent to the server, the global max_file_size unless set for the client"""
+        return self.max_file_size if self.max_file_size is not None else default
+
     def get_language_id(self, view):
         scope_language_id = None
         scope_score = 0
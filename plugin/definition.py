@@ -3,7 +3,7 @@ import sublime
 from .core.clients import CodeIntelTextCommand
 from .core.clients import client_for_view
 from .core.protocol import Request, Point
-from .core.documents import get_document_position, get_position, is_at_word
+from .core.documents import get_document_position, get_position, is_at_word, send_cached_request
 from .core.url import uri_to_filename
 from .core.logging import debug
 
@@ -21,8 +21,9 @@ class CodeIntelSymbolDefinitionCommand(CodeIntelTextCommand):
             document_position = get_document_position(self.view, pos)
             if document_position:
                 request = Request.definition(document_position)
-                client.send_request(
-                    request, lambda response: self.handle_response(response, pos))
+                word = self.view.word(pos)
+                send_cached_request(
+                    client, self.view, request, (word.a, word.b), lambda response: self.handle_response(response, pos))
 
     def handle_response(self, response, position):
         window = sublime.active_window()
@@ -1,11 +1,12 @@
 import html
 import os
+import threading
 import sublime
 import sublime_plugin
 
 try:
-    from typing import Any, List, Dict, Tuple, Callable, Optional
-    assert Any and List and Dict and Tuple and Callable and Optional
+    from typing import Any, List, Dict, Tuple, Callable, Optional, Set
+    assert Any and List and Dict and Tuple and Callable and Optional and Set
 except ImportError:
     pass
 
@@ -13,9 +14,13 @@ from .core.settings import settings, PLUGIN_NAME
 from .core.protocol import Diagnostic, DiagnosticSeverity
 from .core.events import Events
 from .core.configurations import is_supported_syntax
-from .core.diagnostics import DiagnosticsUpdate, get_window_diagnostics, get_line_diagnostics
+from .core.diagnostics import (
+    DiagnosticsUpdate, get_window_diagnostics, get_window_diagnostics_count, get_line_diagnostics,
+    get_file_diagnostics_for_view
+)
 from .core.workspace import get_project_path
 from .core.panels import create_output_panel
+from .core.rendering import PanelBlocks, diagnostic_key, reuse_rendered
 from .core.views import range_to_region
 
 diagnostic_severity_names = {
@@ -120,35 +125,59 @@ def format_diagnostic(diagnostic: Diagnostic) -> str:
     return formatted
 
 
-phantom_sets_by_buffer = {}  # type: Dict[int, sublime.PhantomSet]
+# rows rendered beyond the visible ones, in screens above and below
+VIEWPORT_MARGIN = 1
+# Sublime has no scroll event, the visible region of the active view is polled
+VIEWPORT_POLL_DELAY = 200
 
 
-def update_diagnostics_phantoms(view: sublime.View, diagnostics: 'List[Diagnostic]'):
-    global phantom_sets_by_buffer
+class RenderedDiagnostics(object):
+    """
+    What was last rendered in a view, so the phantoms and regions that didn't
+    change are left alone and scrolling can be followed. Only used on the
+    main thread, diagnostics updates and viewport polling are both run there.
+    """
+    def __init__(self, view: sublime.View) -> None:
+        self.rows = (0, -1)
+        self.change_count = view.change_count()
+        self.phantom_set = sublime.PhantomSet(view, "code_intel_diagnostics")
+        self.phantoms = {}  # type: Dict[Any, sublime.Phantom]
+        self.regions = {}  # type: Dict[int, List[Tuple[int, int]]]
+        self.polling = False
 
-    buffer_id = view.buffer_id()
+
+rendered_by_view = {}  # type: Dict[int, RenderedDiagnostics]
+
+
+def visible_rows(view: sublime.View) -> 'Tuple[int, int]':
+    visible = view.visible_region()
+    return view.rowcol(visible.begin())[0], view.rowcol(visible.end())[0]
+
+
+def update_diagnostics_phantoms(view: sublime.View, rendered: RenderedDiagnostics,
+                                diagnostics: 'List[Diagnostic]'):
     if not settings.show_diagnostics_phantoms or view.is_dirty():
-        phantoms = None
-    else:
-        phantoms = list(
-            create_phantom(view, diagnostic) for diagnostic in diagnostics)
-    if phantoms:
-        phantom_set = phantom_sets_by_buffer.get(buffer_id)
-        if not phantom_set:
-            phantom_set = sublime.PhantomSet(view, "code_intel_diagnostics")
-            phantom_sets_by_buffer[buffer_id] = phantom_set
-        phantom_set.update(phantoms)
-    else:
-        phantom_sets_by_buffer.pop(buffer_id, None)
+        diagnostics = []
+    # the PhantomSet keeps the phantoms it already has when given the same objects
+    phantoms = reuse_rendered(diagnostics, rendered.phantoms, diagnostic_key,
+                              lambda diagnostic: create_phantom(view, diagnostic))
+    if phantoms or rendered.phantoms:
+        rendered.phantom_set.update(list(phantoms.values()))
+    rendered.phantoms = phantoms
 
 
-def update_diagnostics_regions(view: sublime.View, diagnostics: 'List[Diagnostic]', severity: int):
+def update_diagnostics_regions(view: sublime.View, rendered: RenderedDiagnostics,
+                               diagnostics: 'List[Diagnostic]', severity: int):
     region_name = "code_intel_" + format_severity(severity)
     if settings.show_diagnostics_phantoms and not view.is_dirty():
-        regions = None
+        regions = []  # type: List[sublime.Region]
     else:
         regions = list(range_to_region(diagnostic.range, view) for diagnostic in diagnostics
                        if diagnostic.severity == severity)
+    drawn = list((region.a, region.b) for region in regions)
+    if drawn == rendered.regions.get(severity, []):
+        return
+    rendered.regions[severity] = drawn
     if regions:
         scope_name = diagnostic_severity_scopes[severity]
         view.add_regions(
@@ -158,35 +187,78 @@ def update_diagnostics_regions(view: sublime.View, diagnostics: 'List[Diagnostic
         view.erase_regions(region_name)
 
 
-def update_diagnostics_in_view(view: sublime.View, diagnostics: 'List[Diagnostic]'):
-    if view and view.is_valid():
-        update_diagnostics_phantoms(view, diagnostics)
-        for severity in range(
-                DiagnosticSeverity.Error,
-                DiagnosticSeverity.Error + settings.show_diagnostics_severity_level):
-            update_diagnostics_regions(view, diagnostics, severity)
+def update_diagnostics_in_view(view: sublime.View):
+    """
+    Renders the diagnostics of the visible rows and a margin around them,
+    the rest is rendered when scrolled into view.
+    """
+    if not view or not view.is_valid():
+        return
+    file_diagnostics = get_file_diagnostics_for_view(view)
+    rendered = rendered_by_view.get(view.id())
+    if rendered is None:
+        if not file_diagnostics:
+            return
+        rendered = rendered_by_view[view.id()] = RenderedDiagnostics(view)
+    elif rendered.change_count != view.change_count():
+        # edits moved what was drawn, nothing can be kept
+        rendered.change_count = view.change_count()
+        rendered.phantoms = {}
+        rendered.regions = {}
+
+    diagnostics = []  # type: List[Diagnostic]
+    if file_diagnostics:
+        first_row, last_row = visible_rows(view)
+        margin = (last_row - first_row + 1) * VIEWPORT_MARGIN
+        rendered.rows = (max(0, first_row - margin), last_row + margin)
+        diagnostics = file_diagnostics.rows_diagnostics(*rendered.rows)
+    update_diagnostics_phantoms(view, rendered, diagnostics)
+    for severity in range(
+            DiagnosticSeverity.Error,
+            DiagnosticSeverity.Error + settings.show_diagnostics_severity_level):
+        update_diagnostics_regions(view, rendered, diagnostics, severity)
+
+    if not file_diagnostics:
+        del rendered_by_view[view.id()]
+    else:
+        watch_viewport(view)
 
 
-def update_diagnostics_in_status_bar(view: sublime.View):
-    errors = 0
-    warnings = 0
+def watch_viewport(view: sublime.View):
+    rendered = rendered_by_view.get(view.id())
+    window = view.window()
+    if rendered and not rendered.polling and window and window.active_view() == view:
+        rendered.polling = True
+        sublime.set_timeout(lambda: check_viewport(view), VIEWPORT_POLL_DELAY)
 
+
+def schedule_viewport_watch(view: sublime.View):
+    sublime.set_timeout(lambda: watch_viewport(view), 0)
+
+
+def check_viewport(view: sublime.View):
+    rendered = rendered_by_view.get(view.id())
+    if not rendered:
+        return
     window = view.window()
-    if window:
-        diagnostics_by_file = get_window_diagnostics(window)
+    if not view.is_valid() or not window or window.active_view() != view:
+        rendered.polling = False
+        return
+    first_row, last_row = visible_rows(view)
+    if first_row < rendered.rows[0] or last_row > rendered.rows[1]:
+        update_diagnostics_in_view(view)
+    sublime.set_timeout(lambda: check_viewport(view), VIEWPORT_POLL_DELAY)
 
-        if diagnostics_by_file:
-            for file_path, source_diagnostics in diagnostics_by_file.items():
 
-                if source_diagnostics:
-                    for origin, diagnostics in source_diagnostics.items():
-                        for diagnostic in diagnostics:
+def forget_rendered_diagnostics(view: sublime.View):
+    rendered_by_view.pop(view.id(), None)
 
-                            if diagnostic.severity == DiagnosticSeverity.Error:
-                                errors += 1
-                            if diagnostic.severity == DiagnosticSeverity.Warning:
-                                warnings += 1
 
+def update_diagnostics_in_status_bar(view: sublime.View):
+    window = view.window()
+    if window:
+        errors = get_window_diagnostics_count(window, DiagnosticSeverity.Error)
+        warnings = get_window_diagnostics_count(window, DiagnosticSeverity.Warning)
         count = 'E: {} W: {}'.format(errors, warnings)
         view.set_status('code_intel_errors_warning_count', count)
 
@@ -199,16 +271,23 @@ def update_count_in_status_bar(view):
 Events.subscribe("document.diagnostics",
                  lambda update: handle_diagnostics(update))
 Events.subscribe("view.on_activated_async", update_count_in_status_bar)
+Events.subscribe("view.on_activated_async", schedule_viewport_watch)
+Events.subscribe("view.on_close", forget_rendered_diagnostics)
 
 
-def handle_diagnostics(update: DiagnosticsUpdate):
-    window = update.window
-    view = window.find_open_file(update.file_path)
-    if view:
-        update_diagnostics_in_view(view, update.diagnostics)
-        if settings.show_diagnostics_count_in_view_status:
-            update_diagnostics_in_status_bar(view)
-    update_diagnostics_panel(window)
+def schedule_diagnostics_update(view: sublime.View):
+    sublime.set_timeout(lambda: update_diagnostics_in_view(view), 0)
+
+
+def handle_diagnostics(updates: 'List[DiagnosticsUpdate]'):
+    for update in updates:
+        window = update.window
+        view = window.find_open_file(update.file_path)
+        if view:
+            schedule_diagnostics_update(view)
+            if settings.show_diagnostics_count_in_view_status:
+                update_diagnostics_in_status_bar(view)
+        update_diagnostics_panel(window, update.file_path)
 
 
 class DiagnosticsCursorListener(sublime_plugin.ViewEventListener):
@@ -269,40 +348,111 @@ def ensure_diagnostics_panel(window: sublime.Window):
     return window.find_output_panel("diagnostics") or create_diagnostics_panel(window)
 
 
-def update_diagnostics_panel(window: sublime.Window):
-    assert window, "missing window!"
-    base_dir = get_project_path(window)
+PANEL_REDRAW_DELAY = 50  # milliseconds
+
+
+class DiagnosticsPanel(object):
+    """
+    The diagnostics panel of a window, kept as one rendered block per file.
+
+    Updates mark files as changed and schedule one redraw for a whole burst
+    of them, which only replaces the blocks of the changed files.
+    """
+    def __init__(self, window: sublime.Window) -> None:
+        self.window = window
+        self.blocks = PanelBlocks()
+        self.size = 0
+        self.panel_id = None  # type: Optional[int]
+        self.base_dir = None  # type: Optional[str]
+        self._changed = set()  # type: Set[str]
+        self._draw_scheduled = False
+        self._lock = threading.Lock()
+
+    def invalidate(self, file_path: str) -> None:
+        with self._lock:
+            self._changed.add(file_path)
+            if self._draw_scheduled:
+                return
+            self._draw_scheduled = True
+        sublime.set_timeout_async(self.draw, PANEL_REDRAW_DELAY)
+
+    def draw(self) -> None:
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            self._draw_scheduled = False
+
+        window = self.window
+        panel = ensure_diagnostics_panel(window)
+        if not panel or not window.is_valid():
+            return
 
-    panel = ensure_diagnostics_panel(window)
-    if not panel and not window.is_valid():
-        return
-    assert panel, "must have a panel now!"
+        diagnostics_by_file = get_window_diagnostics(window)
+        if diagnostics_by_file is None:
+            return
 
-    diagnostics_by_file = get_window_diagnostics(window)
-    if diagnostics_by_file is not None:
-        active_panel = window.active_panel()
-        is_active_panel = (active_panel == "output.diagnostics")
+        base_dir = get_project_path(window)
         panel.settings().set("result_base_dir", base_dir)
         panel.set_read_only(False)
+        # the panel may have been recreated or cleared behind our back
+        if (panel.id() != self.panel_id or panel.size() != self.size or base_dir != self.base_dir or
+                len(changed) > len(self.blocks) // 2):
+            self.render_all(panel, diagnostics_by_file, base_dir)
+        else:
+            self.render_changed(panel, diagnostics_by_file, changed)
+        panel.set_read_only(True)
+
+        active_panel = window.active_panel()
         if diagnostics_by_file:
-            to_render = []
-            for file_path, source_diagnostics in diagnostics_by_file.items():
-                try:
-                    relative_file_path = os.path.relpath(file_path, base_dir) if base_dir else file_path
-                except ValueError:
-                    relative_file_path = file_path
-                if source_diagnostics:
-                    to_render.append(format_diagnostics(relative_file_path, source_diagnostics))
-            panel.run_command("code_intel_update_panel", {"characters": "\n".join(to_render)})
             if settings.auto_show_diagnostics_panel and not active_panel:
-                window.run_command("show_panel",
-                                   {"panel": "output.diagnostics"})
+                window.run_command("show_panel", {"panel": "output.diagnostics"})
+        elif active_panel == "output.diagnostics":
+            window.run_command("hide_panel", {"panel": "output.diagnostics"})
+
+    def render_block(self, file_path: str, file_diagnostics) -> str:
+        try:
+            relative_file_path = os.path.relpath(file_path, self.base_dir) if self.base_dir else file_path
+        except ValueError:
+            relative_file_path = file_path
+        return format_diagnostics(relative_file_path, file_diagnostics.by_source) + "\n"
+
+    def render_all(self, panel: sublime.View, diagnostics_by_file: 'Dict[str, Any]', base_dir: 'Optional[str]'):
+        self.panel_id = panel.id()
+        self.base_dir = base_dir
+        characters = self.blocks.reset(list((file_path, self.render_block(file_path, file_diagnostics))
+                                            for file_path, file_diagnostics in diagnostics_by_file.items()))
+        if characters:
+            panel.run_command("code_intel_update_panel", {"characters": characters})
         else:
             panel.run_command("code_intel_clear_panel")
-            if is_active_panel:
-                window.run_command("hide_panel",
-                                   {"panel": "output.diagnostics"})
-        panel.set_read_only(True)
+        self.size = panel.size()
+
+    def render_changed(self, panel: sublime.View, diagnostics_by_file: 'Dict[str, Any]', changed: 'Set[str]'):
+        blocks = {}  # type: Dict[str, str]
+        for file_path in changed:
+            file_diagnostics = diagnostics_by_file.get(file_path)
+            blocks[file_path] = self.render_block(file_path, file_diagnostics) if file_diagnostics else ""
+        patches = self.blocks.update(blocks)
+        if patches:
+            panel.run_command("code_intel_patch_panel", {"patches": patches})
+        self.size = panel.size()
+
+
+diagnostics_panels = {}  # type: Dict[int, DiagnosticsPanel]
+
+
+def update_diagnostics_panel(window: sublime.Window, file_path: str):
+    assert window, "missing window!"
+    panel = diagnostics_panels.get(window.id())
+    if not panel:
+        panel = diagnostics_panels[window.id()] = DiagnosticsPanel(window)
+    panel.invalidate(file_path)
+
+
+def forget_diagnostics_panel(window_id: int):
+    diagnostics_panels.pop(window_id, None)
+
+
+Events.subscribe("window.on_close", forget_diagnostics_panel)
 
 
 def format_diagnostics(file_path, origin_diagnostics):
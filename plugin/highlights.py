@@ -3,14 +3,18 @@ import sublime_plugin
 from .core.configurations import is_supported_syntax
 from .core.protocol import Request, Range, DocumentHighlightKind
 from .core.clients import session_for_view, client_for_view
-from .core.documents import get_document_position
+from .core.rpc import RequestHandle
+from .core.documents import get_document_position, send_cached_request
 from .core.settings import settings
 from .core.views import range_to_region
 
 import sublime  # only for typing
+
+assert RequestHandle
+
 try:
-    from typing import List, Dict
-    assert List and Dict
+    from typing import List, Dict, Optional
+    assert List and Dict and Optional
 except ImportError:
     pass
 
@@ -37,11 +41,13 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
         self._initialized = False
         self._enabled = False
         self._stored_point = -1
+        self._request = None  # type: Optional[RequestHandle]
 
     def on_selection_modified_async(self) -> None:
         if not self._initialized:
             self._initialize()
         if self._enabled:
+            self._cancel_request()
             self._clear_regions()
             if settings.document_highlight_style:
                 self._queue()
@@ -61,6 +67,11 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
         if current_point == self._stored_point:
             self._on_document_highlight()
 
+    def _cancel_request(self) -> None:
+        if self._request:
+            self._request.cancel()
+            self._request = None
+
     def _clear_regions(self) -> None:
         for kind in settings.document_highlight_scopes.keys():
             self.view.erase_regions("code_intel_highlight_{}".format(kind))
@@ -78,10 +89,14 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
             if client:
                 params = get_document_position(self.view, point)
                 if params:
+                    self._cancel_request()
                     request = Request.documentHighlight(params)
-                    client.send_request(request, self._handle_response)
+                    word = self.view.word(point)
+                    self._request = send_cached_request(client, self.view, request, (word.a, word.b),
+                                                        self._handle_response)
 
     def _handle_response(self, response: list) -> None:
+        self._request = None
         if not response:
             return
         kind2regions = {}  # type: Dict[str, List[sublime.Region]]
@@ -1,3 +1,4 @@
+import html
 import mdpopups
 import sublime
 import sublime_plugin
@@ -6,9 +7,18 @@ import webbrowser
 from .core.configurations import is_supported_syntax
 from .core.diagnostics import get_point_diagnostics
 from .core.clients import CodeIntelTextCommand, session_for_view
+from .core.rpc import RequestHandle
 from .core.protocol import Request, DiagnosticSeverity
-from .core.documents import get_document_position
-from .core.popups import popup_css, popup_class
+from .core.documents import get_document_position, send_cached_request
+from .core.popups import popup_css, popup_class, render_cached
+
+assert RequestHandle
+
+try:
+    from typing import Optional
+    assert Optional
+except ImportError:
+    pass
 
 SUBLIME_WORD_MASK = 515
 NO_HOVER_SCOPES = 'comment'
@@ -30,6 +40,10 @@ class HoverHandler(sublime_plugin.ViewEventListener):
 
 
 class CodeIntelHoverCommand(CodeIntelTextCommand):
+    def __init__(self, view):
+        super().__init__(view)
+        self._request = None  # type: Optional[RequestHandle]
+
     def is_likely_at_symbol(self, point):
         word_at_sel = self.view.classify(point)
         return word_at_sel & SUBLIME_WORD_MASK and not self.view.match_selector(point, NO_HOVER_SCOPES)
@@ -37,11 +51,12 @@ class CodeIntelHoverCommand(CodeIntelTextCommand):
     def run(self, edit, point=None):
         if point is None:
             point = self.view.sel()[0].begin()
-        if self.is_likely_at_symbol(point):
-            self.request_symbol_hover(point)
         point_diagnostics = get_point_diagnostics(self.view, point)
         if point_diagnostics:
             self.show_hover(point, self.diagnostics_content(point_diagnostics))
+        # a cached hover is shown right away, over the diagnostics only one
+        if self.is_likely_at_symbol(point):
+            self.request_symbol_hover(point)
 
     def request_symbol_hover(self, point):
         session = session_for_view(self.view)
@@ -50,11 +65,19 @@ class CodeIntelHoverCommand(CodeIntelTextCommand):
                 document_position = get_document_position(self.view, point)
                 if document_position:
                     if session.client:
-                        session.client.send_request(
-                            Request.hover(document_position),
+                        self.cancel_request()
+                        word = self.view.word(point)
+                        self._request = send_cached_request(
+                            session.client, self.view, Request.hover(document_position), (word.a, word.b),
                             lambda response: self.handle_response(response, point))
 
+    def cancel_request(self):
+        if self._request:
+            self._request.cancel()
+            self._request = None
+
     def handle_response(self, response, point):
+        self._request = None
         all_content = ""
 
         point_diagnostics = get_point_diagnostics(self.view, point)
@@ -74,9 +97,13 @@ class CodeIntelHoverCommand(CodeIntelTextCommand):
         actions.append("<a href='{}'>{}</a>".format('rename', 'Rename'))
         return "<p>" + " | ".join(actions) + "</p>"
 
+    def format_diagnostic(self, diagnostic):
+        text = "[{}] {}".format(diagnostic.source, diagnostic.message) if diagnostic.source else diagnostic.message
+        return "<pre>{}</pre>".format(html.escape(text, quote=False))
+
     def diagnostics_content(self, diagnostics):
         formatted_errors = list(
-            "<pre>{}</pre>".format("[{}] {}".format(diagnostic.source, diagnostic.message) if diagnostic.source else "{}".format(diagnostic.message))
+            self.format_diagnostic(diagnostic)
             for diagnostic in diagnostics
             if diagnostic.severity == DiagnosticSeverity.Error)
         formatted = []
@@ -88,7 +115,7 @@ class CodeIntelHoverCommand(CodeIntelTextCommand):
             formatted.append("</div>")
 
         formatted_warnings = list(
-            "<pre>{}</pre>".format("[{}] {}".format(diagnostic.source, diagnostic.message) if diagnostic.source else "{}".format(diagnostic.message))
+            self.format_diagnostic(diagnostic)
             for diagnostic in diagnostics
             if diagnostic.severity == DiagnosticSeverity.Warning)
 
@@ -127,7 +154,8 @@ class CodeIntelHoverCommand(CodeIntelTextCommand):
             else:
                 formatted.append(value)
 
-        return mdpopups.md2html(self.view, "\n".join(formatted))
+        return render_cached(lambda markdown: mdpopups.md2html(self.view, markdown), "\n".join(formatted),
+                             ("hover", self.view.settings().get("color_scheme")))
 
     def show_hover(self, point, contents):
         mdpopups.show_popup(
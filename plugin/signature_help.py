@@ -6,20 +6,23 @@ import re
 import html
 
 try:
-    from typing import Any, List, Dict
-    assert Any and List and Dict
+    from typing import Any, List, Dict, Optional
+    assert Any and List and Dict and Optional
 except ImportError:
     pass
 
 
 from .core.clients import session_for_view, client_for_view
-from .core.documents import get_document_position, purge_did_change
+from .core.documents import get_document_position, purge_did_change, send_cached_request
 from .core.configurations import is_supported_syntax, config_for_scope
 from .core.protocol import Request
+from .core.rpc import RequestHandle
 from .core.logging import debug
-from .core.popups import popup_css, popup_class
+from .core.popups import popup_css, popup_class, render_cached
 from .core.settings import settings
 
+assert RequestHandle
+
 NO_SIGNATURE_HELP_SCOPES = 'comment'
 
 
@@ -34,6 +37,7 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
         self._signatures = []  # type: List[Any]
         self._active_signature = -1
         self._active_parameter = -1
+        self._request = None  # type: Optional[RequestHandle]
 
     @classmethod
     def is_applicable(cls, settings):
@@ -79,6 +83,7 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
                 # Peek behind to find the last non-whitespace character.
                 prev_char = self.view.substr(self.view.find_by_class(pos, False, ~0) - 1)
             if prev_char not in self._signature_help_triggers:
+                self.cancel_request()
                 self.view.hide_popup()
 
     def request_signature_help(self, point):
@@ -87,11 +92,18 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
             purge_did_change(self.view.buffer_id())
             document_position = get_document_position(self.view, point)
             if document_position:
-                client.send_request(
-                    Request.signatureHelp(document_position),
+                self.cancel_request()
+                self._request = send_cached_request(
+                    client, self.view, Request.signatureHelp(document_position), point,
                     lambda response: self.handle_response(response, point))
 
+    def cancel_request(self):
+        if self._request:
+            self._request.cancel()
+            self._request = None
+
     def handle_response(self, response, point):
+        self._request = None
         if response is not None:
             self._signatures = response.get("signatures", [])
             self._active_signature = response.get("activeSignature", -1)
@@ -140,9 +152,9 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
 
     def _show_popup(self, point: int) -> None:
         mdpopups.show_popup(self.view,
-                            self._build_popup_content(),
+                            self._build_popup_html(),
                             css=popup_css,
-                            md=True,
+                            md=False,
                             flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY,
                             location=point,
                             wrapper_class=popup_class,
@@ -153,11 +165,16 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
 
     def _update_popup(self) -> None:
         mdpopups.update_popup(self.view,
-                              self._build_popup_content(),
+                              self._build_popup_html(),
                               css=popup_css,
-                              md=True,
+                              md=False,
                               wrapper_class=popup_class)
 
+    def _build_popup_html(self) -> str:
+        # moving between parameters and overloads shows the same contents again
+        return render_cached(lambda markdown: mdpopups.md2html(self.view, markdown), self._build_popup_content(),
+                             ("signature_help", self.view.settings().get("color_scheme")))
+
     def _build_popup_content(self) -> str:
         if settings.highlight_active_signature_parameter:
             return self._build_popup_content_style_vscode()